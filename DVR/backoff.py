@@ -0,0 +1,28 @@
+"""Backoff exponencial com jitter para novas tentativas de conexão."""
+import random
+
+
+class Backoff:
+    """Calcula esperas crescentes entre tentativas: initial * factor^n, até maximum.
+    
+    O jitter sorteia a espera entre (1 - jitter) e 100% do valor, para que
+    vários streams que caíram juntos não tentem reconectar no mesmo instante.
+    """
+    
+    def __init__(self, initial: float = 0.5, maximum: float = 30.0, factor: float = 2.0, jitter: float = 0.5):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.attempts = 0
+    
+    def next_delay(self) -> float:
+        """Retorna espera antes da próxima tentativa e avança o contador."""
+        # Expoente limitado para não estourar float depois de muitas tentativas
+        delay = min(self.initial * (self.factor ** min(self.attempts, 32)), self.maximum)
+        self.attempts += 1
+        return delay * (1.0 - self.jitter * random.random())
+    
+    def reset(self) -> None:
+        """Volta à espera inicial (após uma conexão bem-sucedida)."""
+        self.attempts = 0
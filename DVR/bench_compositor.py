@@ -0,0 +1,174 @@
+"""Micro-benchmark do compositor: tempo e alocações por frame do DisplayManager.
+
+Usa streams sintéticos (sem rede) e mede, com tracemalloc, quanta memória o
+render_frame aloca por chamada em regime e durante o fade. O esperado é zero.
+
+Uso:
+    python bench_compositor.py [--frames N] [--width W --height H]
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+import numpy as np
+from frame_slots import FrameSlots
+from display_manager import DisplayManager
+from stream_watchdog import STREAM_LIVE
+from layouts import LAYOUT_2X2, LAYOUT_1_PLUS_5, cell_count
+
+
+class SyntheticStream:
+    """Stream falso que publica um frame fixo no anel de slots."""
+    
+    def __init__(self, width: int, height: int, value: int):
+        self.slots = FrameSlots()
+        self.frame = np.full((height, width, 3), value, dtype=np.uint8)
+        self.publish()
+    
+    def publish(self) -> None:
+        """Publica o mesmo frame de novo (nova sequência, como um frame novo)."""
+        index, _ = self.slots.acquire_write()
+        self.slots.publish(index, self.frame, time.time())
+    
+    def borrow_frame(self):
+        return self.slots.borrow()
+
+
+class SyntheticStreamManager:
+    """StreamManager mínimo para o DisplayManager, com streams sintéticos."""
+    
+    def __init__(self, count: int, width: int, height: int):
+        self.streams = {i: SyntheticStream(width, height, 16 * i % 256) for i in range(count)}
+    
+    def borrow_frame(self, camera_index: int):
+        stream = self.streams.get(camera_index)
+        return stream.borrow_frame() if stream else None
+    
+    def get_frame_seq(self, camera_index: int) -> int:
+        stream = self.streams.get(camera_index)
+        return stream.slots.seq if stream else 0
+    
+    def publish_all(self) -> None:
+        for stream in self.streams.values():
+            stream.publish()
+    
+    def set_demand(self, visible, upcoming) -> None:
+        pass
+    
+    def set_profile(self, camera_index: int, profile: str) -> None:
+        pass
+    
+    def set_output_size(self, camera_index: int, size) -> None:
+        pass
+    
+    def get_stream_count(self) -> int:
+        return len(self.streams)
+    
+    def get_stream_state(self, camera_index: int) -> str:
+        return STREAM_LIVE
+    
+    def get_activity_scores(self):
+        return {camera_index: 0.0 for camera_index in self.streams}
+
+
+class BenchConfig:
+    """Configuração fixa com dois grids: um 2x2 e outro no layout next_layout."""
+    
+    blend_mode = "float"
+    next_layout = LAYOUT_2X2
+    
+    def get_grids(self):
+        return [{"cameras": [0, 1, 2, 3], "display_time": 15},
+                {"cameras": [4, 5, 6, 7, 0, 1][:cell_count(self.next_layout)], "display_time": 15,
+                 "layout": self.next_layout}]
+    
+    def get_transition_duration(self) -> float:
+        return 1.0
+    
+    def get_prewarm_time(self) -> float:
+        return 3.0
+    
+    def get_blend_mode(self) -> str:
+        return self.blend_mode
+    
+    def get_grid_scheduler_config(self):
+        return {"mode": "fixed"}
+
+
+def measure(display_manager, config, frames: int, fresh: bool, animate: bool = False):
+    """Retorna (ms por frame, maior alocação em bytes feita por um render_frame).
+    
+    Com fresh=True todas as câmeras publicam frame novo antes de cada render
+    (pior caso); senão os frames não mudam e o cache de resize é reaproveitado.
+    Com animate=True o alpha do fade avança a cada frame (fade de 1 s a 25 fps).
+    """
+    stream_manager = display_manager.stream_manager
+    # Aquecimento: caminhos de código e buffers já inicializados
+    for _ in range(5):
+        stream_manager.publish_all()
+        display_manager.render_frame(config, wait_for_all=False)
+    
+    start = time.perf_counter()
+    for frame_number in range(frames):
+        if fresh:
+            stream_manager.publish_all()
+        if animate:
+            display_manager.transition_alpha = (frame_number % 25) / 25.0
+        display_manager.render_frame(config, wait_for_all=False)
+    elapsed = time.perf_counter() - start
+    
+    # Passada separada com tracemalloc (que deixa o render mais lento)
+    tracemalloc.start()
+    worst = 0
+    for frame_number in range(frames):
+        if fresh:
+            stream_manager.publish_all()
+        if animate:
+            display_manager.transition_alpha = (frame_number % 25) / 25.0
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        display_manager.render_frame(config, wait_for_all=False)
+        _, peak = tracemalloc.get_traced_memory()
+        worst = max(worst, peak - before)
+    tracemalloc.stop()
+    return elapsed * 1000.0 / frames, worst
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--width", type=int, default=704, help="Largura dos frames das câmeras")
+    parser.add_argument("--height", type=int, default=480, help="Altura dos frames das câmeras")
+    args = parser.parse_args()
+    
+    config = BenchConfig()
+    display_manager = DisplayManager(SyntheticStreamManager(8, args.width, args.height))
+    display_manager.reset(config)
+    
+    ok = True
+    # Células e frames de saída têm megabytes; objetos Python pequenos ficam abaixo do limite
+    limit = 4096
+    # (nome, em transição, frames novos, alpha animado, modo de mistura, layout do grid que entra)
+    cases = (("grid, frames novos", False, True, False, "float", LAYOUT_2X2),
+             ("grid, frames repetidos", False, False, False, "float", LAYOUT_2X2),
+             ("fade, frames novos", True, True, True, "float", LAYOUT_2X2),
+             ("fade, frames repetidos", True, False, True, "float", LAYOUT_2X2),
+             ("fade quant., novos", True, True, True, "quantized", LAYOUT_2X2),
+             ("fade quant., repetidos", True, False, True, "quantized", LAYOUT_2X2),
+             ("fade 1+5, frames novos", True, True, True, "float", LAYOUT_1_PLUS_5),
+             ("fade 1+5, repetidos", True, False, True, "float", LAYOUT_1_PLUS_5))
+    for label, in_transition, fresh, animate, blend_mode, next_layout in cases:
+        display_manager.in_transition = in_transition
+        display_manager.transition_alpha = 0.5
+        config.blend_mode = blend_mode
+        config.next_layout = next_layout
+        ms, allocated = measure(display_manager, config, args.frames, fresh, animate)
+        status = "OK" if allocated < limit else "FALHA"
+        ok = ok and allocated < limit
+        print(f"{label:23s}: {ms:7.2f} ms/frame, pico de {allocated:9d} bytes alocados por frame  [{status}]")
+    
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
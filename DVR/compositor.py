@@ -0,0 +1,266 @@
+"""Thread de composição: produz frames finais fora da thread do Tk."""
+import threading
+import time
+from typing import Optional, List, Tuple, Dict, Any, Set
+import numpy as np
+from frame_scheduler import FrameScheduler
+from layouts import Rect
+
+
+class FrameMailbox:
+    """Caixa de um slot com o último frame composto.
+    
+    O compositor deposita com publish() e a UI retira com take(). Usa três
+    buffers pré-alocados: um com o último frame publicado, um que a UI pode
+    estar exibindo e um livre para o compositor, então nenhum dos lados
+    espera pelo outro. Frames publicados e substituídos antes de serem
+    retirados são contados como descartados.
+    
+    Regiões sujas: cada publish informa os retângulos que mudaram desde o
+    publish anterior (None = frame inteiro). Cada buffer acumula o que mudou
+    desde a última vez que foi escrito e só essas regiões são copiadas; a UI
+    recebe em take() a união do que mudou desde o último take().
+    """
+    
+    # Acima disso, a lista de regiões vira "frame inteiro"
+    MAX_DIRTY_RECTS = 32
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffers: List[Optional[np.ndarray]] = [None, None, None]
+        self._latest = -1           # Buffer com o último frame publicado
+        self._reading = -1          # Buffer retirado pela UI (pode estar em uso)
+        self._latest_progress: Optional[float] = None
+        # Regiões desatualizadas de cada buffer e regiões ainda não entregues à UI (None = tudo)
+        self._stale: List[Optional[Set[Rect]]] = [None, None, None]
+        self._ui_dirty: Optional[Set[Rect]] = None
+        self.seq = 0
+        self._taken_seq = 0
+        self.published = 0
+        self.dropped = 0
+    
+    def _merge(self, pending: Optional[Set[Rect]], dirty: Optional[List[Rect]]) -> Optional[Set[Rect]]:
+        """Acumula regiões sujas (None = frame inteiro)."""
+        if pending is None or dirty is None:
+            return None
+        pending.update(dirty)
+        return pending if len(pending) <= self.MAX_DIRTY_RECTS else None
+    
+    def publish(self, frame: np.ndarray, progress: Optional[float] = None,
+                dirty: Optional[List[Rect]] = None) -> None:
+        """Copia para um buffer livre as regiões alteradas e o torna o mais recente.
+        
+        Args:
+            frame: Frame composto
+            progress: Progresso da barra (None = oculta)
+            dirty: Retângulos alterados desde o publish anterior; None = frame inteiro
+        """
+        with self._lock:
+            if dirty is not None and not dirty and self._latest >= 0:
+                # Imagem igual à anterior: só atualiza o progresso, sem copiar nada
+                self._publish_locked(self._latest, progress, dirty)
+                return
+            index = next(i for i in range(3) if i != self._latest and i != self._reading)
+            for i in range(3):
+                self._stale[i] = self._merge(self._stale[i], dirty)
+            stale, self._stale[index] = self._stale[index], set()
+        
+        buffer = self._buffers[index]
+        if buffer is None or buffer.shape != frame.shape:
+            buffer = np.empty_like(frame)
+            self._buffers[index] = buffer
+            stale = None
+        if stale is None:
+            np.copyto(buffer, frame)
+        else:
+            for x, y, width, height in stale:
+                np.copyto(buffer[y:y + height, x:x + width], frame[y:y + height, x:x + width])
+        
+        with self._lock:
+            self._publish_locked(index, progress, dirty)
+    
+    def _publish_locked(self, index: int, progress: Optional[float], dirty: Optional[List[Rect]]) -> None:
+        """Torna buffer o mais recente (com self._lock)."""
+        if self.seq > self._taken_seq:
+            # Frame anterior nunca chegou à tela
+            self.dropped += 1
+        self._ui_dirty = self._merge(self._ui_dirty, dirty)
+        self._latest = index
+        self._latest_progress = progress
+        self.seq += 1
+        self.published += 1
+    
+    def take(self) -> Optional[Tuple[np.ndarray, Optional[float], Optional[List[Rect]]]]:
+        """Retira o frame mais recente se houver um novo; senão retorna None.
+        
+        Retorna (frame, progresso, regiões alteradas desde o último take, ou
+        None para o frame inteiro). O array devolvido continua válido até a
+        próxima chamada de take().
+        """
+        with self._lock:
+            if self.seq == self._taken_seq or self._latest < 0:
+                return None
+            self._taken_seq = self.seq
+            self._reading = self._latest
+            dirty = list(self._ui_dirty) if self._ui_dirty is not None else None
+            self._ui_dirty = set()
+            return self._buffers[self._latest], self._latest_progress, dirty
+
+
+class Compositor:
+    """Compõe frames de exibição em thread própria, em prazos fixos de target_fps.
+    
+    Toda a lógica por frame (rotação automática, transições, demanda de
+    decodificação, compose_grid e fade) roda aqui, protegida por self.lock.
+    Quem altera o DisplayManager a partir da thread do Tk (teclas, cliques,
+    recarga de configuração) deve segurar o mesmo lock.
+    """
+    
+    def __init__(self, display_manager, config_manager, target_fps: float = 25.0):
+        self.display_manager = display_manager
+        self.config_manager = config_manager
+        self.target_fps = target_fps
+        self.scheduler = FrameScheduler(target_fps)
+        self.mailbox = FrameMailbox()
+        self.lock = threading.RLock()
+        self.auto_mode = True
+        self.wait_for_all_frames = True
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        
+        # Estatísticas de tempo de composição
+        self.frames_composed = 0
+        self.compose_time_avg = 0.0
+        self.compose_time_max = 0.0
+        self._fps_window_start = 0.0
+        self._fps_window_frames = 0
+        self.measured_fps = 0.0
+    
+    def start(self) -> None:
+        """Inicia thread de composição."""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def stop(self) -> None:
+        """Para thread de composição."""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
+    
+    def set_target_fps(self, target_fps: float) -> None:
+        """Altera a taxa de composição (aplicada a partir do próximo prazo)."""
+        self.target_fps = target_fps
+        self.scheduler.set_fps(target_fps)
+    
+    def next_frame_delay(self) -> float:
+        """Segundos até o próximo frame composto ficar pronto (prazo + tempo médio de composição).
+        
+        Antes de start() a grade de prazos ainda não anda (o primeiro prazo já
+        passou): a UI espera um intervalo de frame em vez de consultar sem parar.
+        """
+        if not self.running:
+            return self.scheduler.interval
+        return self.scheduler.time_until_next() + self.compose_time_avg
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas de tempo para ver se o compositor está atrasado."""
+        return {
+            "target_fps": self.target_fps,
+            "fps": self.measured_fps,
+            "compose_ms_avg": self.compose_time_avg * 1000.0,
+            "compose_ms_max": self.compose_time_max * 1000.0,
+            "frames": self.frames_composed,
+            "missed": self.scheduler.missed,
+            "jitter_ms_avg": self.scheduler.jitter_avg * 1000.0,
+            "jitter_ms_max": self.scheduler.jitter_max * 1000.0,
+            "published": self.mailbox.published,
+            "dropped": self.mailbox.dropped,
+        }
+    
+    def _run(self) -> None:
+        """Loop de composição: dorme até cada prazo do scheduler e compõe um frame."""
+        self.scheduler.set_fps(self.target_fps)
+        self._fps_window_start = time.monotonic()
+        
+        while self.running:
+            # Prazos perdidos (composição mais lenta que o intervalo) são descartados
+            self.scheduler.wait()
+            if not self.running:
+                break
+            
+            start = time.monotonic()
+            try:
+                self._tick()
+            except Exception as e:
+                print(f"Compositor: erro ao compor frame - {type(e).__name__}: {e}")
+            self._record_timing(start, time.monotonic() - start)
+    
+    def _record_timing(self, start: float, elapsed: float) -> None:
+        """Atualiza médias de tempo de composição e fps medido."""
+        self.frames_composed += 1
+        self.compose_time_avg += (elapsed - self.compose_time_avg) * 0.05
+        self.compose_time_max = max(self.compose_time_max, elapsed)
+        
+        self._fps_window_frames += 1
+        window = start - self._fps_window_start
+        if window >= 1.0:
+            self.measured_fps = self._fps_window_frames / window
+            self._fps_window_start = start
+            self._fps_window_frames = 0
+    
+    def _tick(self) -> None:
+        """Avança estado de rotação/transição e compõe um frame."""
+        display_manager = self.display_manager
+        config_manager = self.config_manager
+        
+        with self.lock:
+            # Atualiza transição se em progresso
+            if display_manager.in_transition:
+                transition_complete = display_manager.update_transition(config_manager)
+                if transition_complete:
+                    # Verifica se há troca manual de grid pendente
+                    if hasattr(display_manager, '_target_grid_index'):
+                        display_manager._apply_grid_switch(config_manager)
+                    else:
+                        # Rotação automática - finaliza transição e reseta timer
+                        display_manager.rotate_to_next_grid(config_manager)
+                        # Garante que a transição foi finalizada
+                        display_manager.in_transition = False
+                        display_manager.transition_alpha = 0.0
+            else:
+                # Verifica se deve rotacionar grid automaticamente (só se modo automático ativo)
+                if self.auto_mode:
+                    if display_manager.should_rotate(config_manager):
+                        display_manager.start_transition()
+            
+            # Ajusta decodificação: grid atual e próximo em tempo real, demais ocultos
+            display_manager.update_demand(config_manager, self.auto_mode)
+            
+            # Renderiza frame (aguarda todos os frames estarem prontos)
+            frame = display_manager.render_frame(config_manager, wait_for_all=self.wait_for_all_frames)
+            
+            # Se todos os frames estão prontos, pode desabilitar espera
+            if frame is not None and self.wait_for_all_frames:
+                self.wait_for_all_frames = False
+            
+            if frame is not None:
+                self.mailbox.publish(frame, self._grid_progress(), display_manager.dirty_rects)
+    
+    def _grid_progress(self) -> Optional[float]:
+        """Retorna progresso do grid atual (0.0 a 1.0) para a barra de 2px, ou None se oculta."""
+        display_manager = self.display_manager
+        if (not self.auto_mode or display_manager.in_transition
+                or display_manager.fullscreen_camera is not None):
+            return None
+        
+        remaining = display_manager.time_until_rotation(self.config_manager)
+        if remaining is None:
+            return None
+        
+        # Calcula progresso (0.0 a 1.0); o tempo do grid pode mudar com o agendamento por atividade
+        elapsed = time.time() - display_manager.current_grid_start_time
+        total = elapsed + remaining
+        return min(elapsed / total, 1.0) if total > 0 else 1.0
@@ -4,6 +4,12 @@ import os
 import sys
 from typing import Dict, List, Any
 
+# Faixa aceita para target_fps (fora dela o valor é limitado)
+MIN_TARGET_FPS = 1
+MAX_TARGET_FPS = 120
+# Menor meia-vida aceita para a nota de atividade (motion.decay_seconds divide o tempo decorrido)
+MIN_DECAY_SECONDS = 0.1
+
 
 class ConfigManager:
     """Gerencia carregamento e salvamento de configuração."""
@@ -120,6 +126,91 @@ class ConfigManager:
         """Retorna duração da transição em segundos."""
         return self.config.get("transition_duration", 1.0)
     
+    def get_prewarm_time(self) -> float:
+        """Retorna quantos segundos antes da rotação o próximo grid volta a decodificar."""
+        return self.config.get("prewarm_time", 3.0)
+    
+    def get_history_config(self) -> Dict[str, Any]:
+        """Retorna configuração do histórico de frames por câmera (desativado por padrão)."""
+        return self.config.get("history", {"seconds": 0})
+    
+    def get_decoder_config(self) -> Dict[str, Any]:
+        """Retorna opções do decoder (hw_accel, threads, transport), com padrões."""
+        decoder = {"hw_accel": "auto", "threads": 0, "transport": "tcp"}
+        decoder.update(self.config.get("decoder", {}))
+        return decoder
+    
+    def get_recording_config(self) -> Dict[str, Any]:
+        """Retorna opções de gravação em segmentos (enabled, path, format...), com padrões."""
+        recording = {"enabled": False, "path": "recordings", "format": "mkv", "segment_seconds": 60,
+                     "profile": "main", "max_gb": 50, "retention_days": 7}
+        recording.update(self.config.get("recording", {}))
+        return recording
+    
+    def get_motion_config(self) -> Dict[str, Any]:
+        """Retorna opções da detecção de movimento (enabled, rate, cpu_budget...), com padrões."""
+        motion = {"enabled": True, "rate": 5, "cpu_budget": 0.03, "threshold": 25,
+                  "min_area": 0.002, "decay_seconds": 10}
+        motion.update(self.config.get("motion", {}))
+        decay_seconds = motion["decay_seconds"]
+        if isinstance(decay_seconds, bool) or not isinstance(decay_seconds, (int, float)):
+            print(f"ConfigManager: motion.decay_seconds inválido ({decay_seconds!r}), usando 10")
+            motion["decay_seconds"] = 10
+        elif not decay_seconds >= MIN_DECAY_SECONDS:
+            # NaN também cai aqui
+            print(f"ConfigManager: motion.decay_seconds {decay_seconds} abaixo do mínimo, "
+                  f"usando {MIN_DECAY_SECONDS}")
+            motion["decay_seconds"] = MIN_DECAY_SECONDS
+        return motion
+    
+    def get_grid_scheduler_config(self) -> Dict[str, Any]:
+        """Retorna opções da rotação automática de grids (mode "fixed" ou "activity"), com padrões."""
+        scheduler = {"mode": "fixed", "active_threshold": 0.3, "quiet_threshold": 0.1,
+                     "min_dwell": 4, "max_dwell": 60}
+        scheduler.update(self.config.get("grid_scheduler", {}))
+        return scheduler
+    
+    def get_capture_mode(self) -> str:
+        """Retorna modo de captura ("thread" ou "process")."""
+        return self.config.get("capture_mode", "thread")
+    
+    def get_process_frame_size(self) -> List[int]:
+        """Retorna tamanho máximo [largura, altura] dos frames no modo de captura em processos."""
+        return self.config.get("process_frame_size", [1920, 1080])
+    
+    def get_blend_mode(self) -> str:
+        """Retorna modo de mistura do fade ("float" ou "quantized")."""
+        return self.config.get("blend_mode", "float")
+    
+    def get_display_backend(self) -> str:
+        """Retorna backend de exibição ("auto", "opengl" ou "tk")."""
+        return self.config.get("display_backend", "auto")
+    
+    def get_target_fps(self) -> float:
+        """Retorna taxa de frames da exibição, limitada a MIN_TARGET_FPS..MAX_TARGET_FPS."""
+        target_fps = self.config.get("target_fps", 25)
+        if isinstance(target_fps, bool) or not isinstance(target_fps, (int, float)):
+            print(f"ConfigManager: target_fps inválido ({target_fps!r}), usando 25")
+            return 25
+        if not MIN_TARGET_FPS <= target_fps <= MAX_TARGET_FPS:
+            # NaN também cai aqui (e vai para o mínimo)
+            limited = MAX_TARGET_FPS if target_fps > MAX_TARGET_FPS else MIN_TARGET_FPS
+            print(f"ConfigManager: target_fps {target_fps} fora da faixa, usando {limited}")
+            return limited
+        return target_fps
+    
+    def get_open_timeout_ms(self) -> int:
+        """Retorna timeout de abertura do stream RTSP em milissegundos."""
+        return self.config.get("open_timeout_ms", 5000)
+    
+    def get_read_timeout_ms(self) -> int:
+        """Retorna timeout de leitura de frame em milissegundos."""
+        return self.config.get("read_timeout_ms", 5000)
+    
+    def get_stale_threshold(self) -> float:
+        """Retorna após quantos segundos sem frame novo um stream conectado é reconectado."""
+        return self.config.get("stale_threshold", 10.0)
+    
     def get_window_mode(self) -> str:
         """Retorna modo da janela."""
         return self.config.get("window_mode", "fullscreen")
@@ -140,5 +231,6 @@ class ConfigManager:
                 {"cameras": [0, 1, 2, 3], "display_time": 15}
             ],
             "transition_duration": 1.0,
+            "target_fps": 25,
             "window_mode": "fullscreen"
         }
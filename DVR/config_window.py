@@ -2,7 +2,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import json
-from config_manager import ConfigManager
+from config_manager import ConfigManager, MIN_TARGET_FPS, MAX_TARGET_FPS, MIN_DECAY_SECONDS
+from layouts import LAYOUTS
 
 
 class ConfigWindow:
@@ -70,6 +71,16 @@ class ConfigWindow:
                                         values=["fullscreen", "windowed"], width=15, state="readonly")
         window_mode_combo.grid(row=1, column=1, sticky=tk.W, padx=5, pady=5)
         
+        ttk.Label(general_frame, text="FPS de Exibição:").grid(row=2, column=0, sticky=tk.W, pady=5)
+        self.fps_entry = ttk.Entry(general_frame, width=10)
+        self.fps_entry.insert(0, str(self.config_manager.get_target_fps()))
+        self.fps_entry.grid(row=2, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(general_frame, text="Decaimento da Atividade (segundos):").grid(row=3, column=0, sticky=tk.W, pady=5)
+        self.decay_entry = ttk.Entry(general_frame, width=10)
+        self.decay_entry.insert(0, str(self.config_manager.get_motion_config()["decay_seconds"]))
+        self.decay_entry.grid(row=3, column=1, sticky=tk.W, padx=5, pady=5)
+        
         # Botões
         btn_frame = ttk.Frame(main_frame)
         btn_frame.pack(fill=tk.X, pady=10)
@@ -92,7 +103,8 @@ class ConfigWindow:
         frame = ttk.Frame(self.dvr_container)
         frame.pack(fill=tk.X, pady=2)
         
-        entry_data = {}
+        # Mantém chaves extras do DVR (ex.: grid_subtype) que não têm campo na interface
+        entry_data = {"server": server or {}}
         
         ttk.Label(frame, text="IP:").grid(row=0, column=0, padx=2)
         ip_entry = ttk.Entry(frame, width=15)
@@ -158,7 +170,8 @@ class ConfigWindow:
         frame = ttk.Frame(self.grids_container)
         frame.pack(fill=tk.X, pady=2)
         
-        entry_data = {}
+        # Mantém chaves extras do grid (ex.: name, dynamic) que não têm campo na interface
+        entry_data = {"grid": grid or {}}
         
         ttk.Label(frame, text="Câmeras (índices separados por vírgula):").grid(row=0, column=0, padx=2)
         cameras_entry = ttk.Entry(frame, width=20)
@@ -173,8 +186,15 @@ class ConfigWindow:
         time_entry.grid(row=0, column=3, padx=2)
         entry_data["display_time"] = time_entry
         
+        ttk.Label(frame, text="Layout:").grid(row=0, column=4, padx=2)
+        layout_var = tk.StringVar(value=grid.get("layout", "auto") if grid else "auto")
+        layout_combo = ttk.Combobox(frame, textvariable=layout_var, values=["auto"] + list(LAYOUTS),
+                                    width=6, state="readonly")
+        layout_combo.grid(row=0, column=5, padx=2)
+        entry_data["layout"] = layout_var
+        
         btn_remove = ttk.Button(frame, text="Remover", command=lambda: self._remove_grid(index))
-        btn_remove.grid(row=0, column=4, padx=2)
+        btn_remove.grid(row=0, column=6, padx=2)
         
         entry_data["frame"] = frame
         self.grid_entries.append(entry_data)
@@ -201,13 +221,15 @@ class ConfigWindow:
                     channels_str = entry["channels"].get()
                     channels = [int(c.strip()) for c in channels_str.split(",") if c.strip()]
                     
-                    dvr_servers.append({
+                    server = dict(entry["server"])
+                    server.update({
                         "ip": entry["ip"].get(),
                         "port": int(entry["port"].get()),
                         "username": entry["username"].get(),
                         "password": entry["password"].get(),
                         "channels": channels
                     })
+                    dvr_servers.append(server)
                 except ValueError as e:
                     messagebox.showerror("Erro", f"Erro ao processar servidor DVR: {e}")
                     return
@@ -219,19 +241,50 @@ class ConfigWindow:
                     cameras_str = entry["cameras"].get()
                     cameras = [int(c.strip()) for c in cameras_str.split(",") if c.strip()]
                     
-                    grids.append({
+                    grid = dict(entry["grid"])
+                    grid.update({
                         "cameras": cameras,
                         "display_time": float(entry["display_time"].get())
                     })
+                    # "auto" = layout pelo número de câmeras
+                    if entry["layout"].get() == "auto":
+                        grid.pop("layout", None)
+                    else:
+                        grid["layout"] = entry["layout"].get()
+                    grids.append(grid)
                 except ValueError as e:
                     messagebox.showerror("Erro", f"Erro ao processar grid: {e}")
                     return
             
+            # Valida FPS antes de alterar qualquer chave (0 ou negativo quebraria o compositor)
+            try:
+                target_fps = float(self.fps_entry.get())
+            except ValueError:
+                target_fps = 0.0
+            if not MIN_TARGET_FPS <= target_fps <= MAX_TARGET_FPS:
+                messagebox.showerror("Erro", f"FPS de Exibição deve ser um número entre "
+                                     f"{MIN_TARGET_FPS} e {MAX_TARGET_FPS}.")
+                return
+            
+            # Meia-vida da nota de atividade: 0 quebraria o ranking das câmeras a cada frame
+            try:
+                decay_seconds = float(self.decay_entry.get())
+            except ValueError:
+                decay_seconds = 0.0
+            if not decay_seconds >= MIN_DECAY_SECONDS:
+                messagebox.showerror("Erro", f"Decaimento da Atividade deve ser um número "
+                                     f"maior ou igual a {MIN_DECAY_SECONDS}.")
+                return
+            motion = dict(self.config_manager.config.get("motion", {}))
+            motion["decay_seconds"] = decay_seconds
+            
             # Atualiza configuração
             self.config_manager.set("dvr_servers", dvr_servers)
             self.config_manager.set("grids", grids)
             self.config_manager.set("transition_duration", float(self.transition_entry.get()))
             self.config_manager.set("window_mode", self.window_mode_var.get())
+            self.config_manager.set("target_fps", target_fps)
+            self.config_manager.set("motion", motion)
             
             # Salva arquivo
             if self.config_manager.save():
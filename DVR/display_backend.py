@@ -0,0 +1,303 @@
+"""Backends de exibição: apresentam na janela os frames BGR compostos pelo DisplayManager."""
+import tkinter as tk
+from typing import Optional, Tuple, List, Dict
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+# Backend OpenGL é opcional (PyOpenGL + pyopengltk)
+try:
+    from OpenGL import GL
+    from pyopengltk import OpenGLFrame
+    OPENGL_AVAILABLE = True
+except ImportError:
+    GL = None
+    OpenGLFrame = tk.Frame
+    OPENGL_AVAILABLE = False
+
+
+class DisplayBackend:
+    """Interface de saída de vídeo.
+    
+    O backend fornece o widget Tk onde o vídeo aparece (usado também para
+    eventos de mouse) e recebe frames BGR prontos em present(). A barra de
+    progresso do grid (0.0 a 1.0, ou None para ocultar) é desenhada pelo
+    próprio backend. dirty lista os retângulos (x, y, largura, altura) do
+    frame que mudaram desde o present() anterior (None = frame inteiro,
+    lista vazia = só a barra de progresso mudou).
+    """
+    
+    name = "base"
+    
+    def __init__(self, root: tk.Tk):
+        self.root = root
+        self.widget: Optional[tk.Widget] = None
+    
+    def get_size(self) -> Tuple[int, int]:
+        """Retorna (largura, altura) da área de vídeo em pixels."""
+        return self.widget.winfo_width(), self.widget.winfo_height()
+    
+    def present(self, frame: np.ndarray, progress: Optional[float] = None,
+                dirty: Optional[List[Tuple[int, int, int, int]]] = None) -> None:
+        """Exibe frame BGR (normalmente já no tamanho da área de vídeo; escala se não estiver)."""
+        raise NotImplementedError
+    
+    def close(self) -> None:
+        """Libera recursos do backend."""
+        pass
+
+
+class TkDisplayBackend(DisplayBackend):
+    """Backend Tk/PIL (fallback sempre disponível).
+    
+    Uma atualização completa vai para a PhotoImage de fundo. Regiões sujas
+    vão para PhotoImages menores (uma por retângulo, reaproveitadas) sobre o
+    fundo, então uma câmera parada não custa conversão nem cópia.
+    """
+    
+    name = "tk"
+    
+    # Altura da barra de progresso em pixels
+    PROGRESS_BAR_HEIGHT = 2
+    
+    def __init__(self, root: tk.Tk):
+        super().__init__(root)
+        self.widget = tk.Canvas(root, bg='black', highlightthickness=0)
+        self.widget.pack(fill=tk.BOTH, expand=True)
+        
+        # Imagem e itens do canvas são criados uma vez e atualizados no lugar
+        self._photo: Optional[ImageTk.PhotoImage] = None
+        self._photo_size: Optional[Tuple[int, int]] = None
+        self._image_item = None
+        self._progress_item = self.widget.create_rectangle(0, 0, 0, 0, fill='white', outline='',
+                                                           state='hidden', tags='progress_bar')
+        self._progress_visible = False
+        # Ladrilhos por região do frame: retângulo -> (PhotoImage, item do canvas, tamanho)
+        self._tiles: Dict[Tuple[int, int, int, int], Tuple[ImageTk.PhotoImage, int, Tuple[int, int]]] = {}
+        self._frame_size: Optional[Tuple[int, int]] = None
+    
+    def present(self, frame: np.ndarray, progress: Optional[float] = None,
+                dirty: Optional[List[Tuple[int, int, int, int]]] = None) -> None:
+        canvas_width, canvas_height = self.get_size()
+        if canvas_width <= 1 or canvas_height <= 1:
+            return
+        
+        frame_size = (frame.shape[1], frame.shape[0])
+        if dirty is not None and self._photo_size == (canvas_width, canvas_height) and self._frame_size == frame_size:
+            for rect in dirty:
+                self._update_tile(frame, rect, canvas_width / frame_size[0], canvas_height / frame_size[1])
+            self._update_progress_bar(progress, canvas_width, canvas_height)
+            return
+        self._frame_size = frame_size
+        
+        # Atualização completa: ladrilhos antigos ficariam por cima do fundo novo
+        for _, item, _ in self._tiles.values():
+            self.widget.delete(item)
+        self._tiles.clear()
+        
+        # DisplayManager já compõe no tamanho do canvas; só escala se a janela
+        # mudou e o próximo frame ainda não chegou no tamanho novo
+        image = self._to_image(frame, (0, 0) + frame_size, (canvas_width, canvas_height))
+        
+        if self._photo_size != (canvas_width, canvas_height):
+            # Primeiro frame ou janela redimensionada: (re)cria a PhotoImage
+            self._photo = ImageTk.PhotoImage(image=image)
+            self._photo_size = (canvas_width, canvas_height)
+            if self._image_item is None:
+                self._image_item = self.widget.create_image(canvas_width // 2, canvas_height // 2,
+                                                            image=self._photo, anchor=tk.CENTER)
+            else:
+                self.widget.itemconfigure(self._image_item, image=self._photo)
+                self.widget.coords(self._image_item, canvas_width // 2, canvas_height // 2)
+            self.widget.tag_raise(self._progress_item)
+        else:
+            # Mesmo tamanho: só copia os pixels para a PhotoImage existente
+            self._photo.paste(image)
+        
+        self._update_progress_bar(progress, canvas_width, canvas_height)
+    
+    def _update_tile(self, frame: np.ndarray, rect: Tuple[int, int, int, int], scale_x: float, scale_y: float) -> None:
+        """Converte e envia só uma região do frame para o seu ladrilho."""
+        x, y, width, height = rect
+        # Bordas arredondadas da mesma forma para ladrilhos vizinhos se encostarem
+        left, top = round(x * scale_x), round(y * scale_y)
+        size = (round((x + width) * scale_x) - left, round((y + height) * scale_y) - top)
+        if size[0] <= 0 or size[1] <= 0:
+            return
+        
+        image = self._to_image(frame, rect, size)
+        
+        tile = self._tiles.get(rect)
+        if tile is not None and tile[2] == size:
+            tile[0].paste(image)
+            return
+        if tile is not None:
+            self.widget.delete(tile[1])
+        photo = ImageTk.PhotoImage(image=image)
+        item = self.widget.create_image(left, top, image=photo, anchor=tk.NW)
+        self._tiles[rect] = (photo, item, size)
+        self.widget.tag_raise(self._progress_item)
+    
+    @staticmethod
+    def _to_image(frame: np.ndarray, rect: Tuple[int, int, int, int], size: Tuple[int, int]) -> Image.Image:
+        """Converte uma região BGR do frame em imagem PIL RGB no tamanho size.
+        
+        A troca BGR->RGB é feita pelo decoder "raw" do PIL ao copiar os pixels
+        (lendo a região direto do frame, com o stride da linha inteira), então
+        cada pixel é convertido uma vez, sem cvtColor nem array intermediário.
+        """
+        x, y, width, height = rect
+        if size != (width, height):
+            # Janela em redimensionamento: escala em BGR e converte o resultado
+            frame = cv2.resize(frame[y:y + height, x:x + width], size)
+            x, y, width, height = 0, 0, size[0], size[1]
+        elif not frame.flags.c_contiguous:
+            frame = np.ascontiguousarray(frame)
+        
+        row = frame.shape[1] * 3
+        start = y * row + x * 3
+        end = (y + height - 1) * row + (x + width) * 3
+        return Image.frombuffer("RGB", (width, height), frame.reshape(-1)[start:end], "raw", "BGR", row, 1)
+    
+    def _update_progress_bar(self, progress: Optional[float], canvas_width: int, canvas_height: int) -> None:
+        """Move a barra de progresso (da esquerda para direita, na parte inferior)."""
+        if progress is None:
+            if self._progress_visible:
+                self.widget.itemconfigure(self._progress_item, state='hidden')
+                self._progress_visible = False
+            return
+        
+        bar_y = canvas_height - self.PROGRESS_BAR_HEIGHT
+        bar_width = int(canvas_width * progress)
+        self.widget.coords(self._progress_item, 0, bar_y, bar_width, canvas_height)
+        if not self._progress_visible:
+            self.widget.itemconfigure(self._progress_item, state='normal')
+            self._progress_visible = True
+
+
+class _GLVideoFrame(OpenGLFrame):
+    """Widget OpenGL com uma única textura reaproveitada para o vídeo."""
+    
+    gl_ready = False  # Contexto criado (initgl já rodou)
+    
+    def initgl(self):
+        """Chamado pelo pyopengltk quando o contexto é criado."""
+        GL.glClearColor(0.0, 0.0, 0.0, 1.0)
+        GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 1)
+        self.texture = GL.glGenTextures(1)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self.texture)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_LINEAR)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_LINEAR)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_S, GL.GL_CLAMP_TO_EDGE)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_T, GL.GL_CLAMP_TO_EDGE)
+        self.texture_size: Optional[Tuple[int, int]] = None
+        self.progress: Optional[float] = None
+        self.gl_ready = True
+    
+    def upload(self, frame: np.ndarray, dirty: Optional[List[Tuple[int, int, int, int]]] = None) -> None:
+        """Envia frame BGR para a textura (realoca só se o tamanho mudar).
+        
+        Com dirty, só os retângulos alterados são enviados: UNPACK_ROW_LENGTH e
+        SKIP_* apontam o driver para a região dentro do frame, sem cópia.
+        """
+        height, width = frame.shape[:2]
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self.texture)
+        if self.texture_size != (width, height):
+            GL.glTexImage2D(GL.GL_TEXTURE_2D, 0, GL.GL_RGB8, width, height, 0,
+                            GL.GL_BGR, GL.GL_UNSIGNED_BYTE, frame)
+            self.texture_size = (width, height)
+        elif dirty is None:
+            GL.glTexSubImage2D(GL.GL_TEXTURE_2D, 0, 0, 0, width, height,
+                               GL.GL_BGR, GL.GL_UNSIGNED_BYTE, frame)
+        elif dirty:
+            GL.glPixelStorei(GL.GL_UNPACK_ROW_LENGTH, width)
+            for x, y, rect_width, rect_height in dirty:
+                GL.glPixelStorei(GL.GL_UNPACK_SKIP_PIXELS, x)
+                GL.glPixelStorei(GL.GL_UNPACK_SKIP_ROWS, y)
+                GL.glTexSubImage2D(GL.GL_TEXTURE_2D, 0, x, y, rect_width, rect_height,
+                                   GL.GL_BGR, GL.GL_UNSIGNED_BYTE, frame)
+            GL.glPixelStorei(GL.GL_UNPACK_ROW_LENGTH, 0)
+            GL.glPixelStorei(GL.GL_UNPACK_SKIP_PIXELS, 0)
+            GL.glPixelStorei(GL.GL_UNPACK_SKIP_ROWS, 0)
+    
+    def redraw(self):
+        """Desenha a textura na janela inteira e a barra de progresso."""
+        width, height = self.winfo_width(), self.winfo_height()
+        GL.glViewport(0, 0, width, height)
+        GL.glClear(GL.GL_COLOR_BUFFER_BIT)
+        if self.texture_size is None:
+            return
+        
+        # Quad em tela cheia; v=0 é a primeira linha do frame (topo)
+        GL.glEnable(GL.GL_TEXTURE_2D)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self.texture)
+        GL.glColor3f(1.0, 1.0, 1.0)
+        GL.glBegin(GL.GL_QUADS)
+        GL.glTexCoord2f(0.0, 1.0)
+        GL.glVertex2f(-1.0, -1.0)
+        GL.glTexCoord2f(1.0, 1.0)
+        GL.glVertex2f(1.0, -1.0)
+        GL.glTexCoord2f(1.0, 0.0)
+        GL.glVertex2f(1.0, 1.0)
+        GL.glTexCoord2f(0.0, 0.0)
+        GL.glVertex2f(-1.0, 1.0)
+        GL.glEnd()
+        GL.glDisable(GL.GL_TEXTURE_2D)
+        
+        if self.progress is not None and height > 0:
+            # Barra de 2px na parte inferior
+            top = -1.0 + 2.0 * TkDisplayBackend.PROGRESS_BAR_HEIGHT / height
+            right = -1.0 + 2.0 * self.progress
+            GL.glBegin(GL.GL_QUADS)
+            GL.glVertex2f(-1.0, -1.0)
+            GL.glVertex2f(right, -1.0)
+            GL.glVertex2f(right, top)
+            GL.glVertex2f(-1.0, top)
+            GL.glEnd()
+
+
+class OpenGLDisplayBackend(DisplayBackend):
+    """Backend OpenGL: envia o frame BGR direto para uma textura reaproveitada.
+    
+    A GPU faz a conversão de cor e a escala para a janela, então a thread de
+    UI só copia o frame para a textura, sem cvtColor, resize ou PhotoImage.
+    """
+    
+    name = "opengl"
+    
+    def __init__(self, root: tk.Tk):
+        super().__init__(root)
+        self.widget = _GLVideoFrame(root, bg='black')
+        self.widget.pack(fill=tk.BOTH, expand=True)
+    
+    def present(self, frame: np.ndarray, progress: Optional[float] = None,
+                dirty: Optional[List[Tuple[int, int, int, int]]] = None) -> None:
+        if not self.widget.gl_ready:
+            # Contexto só existe depois que o widget é mapeado
+            return
+        self.widget.tkMakeCurrent()
+        self.widget.upload(frame, dirty)
+        self.widget.progress = progress
+        self.widget.redraw()
+        self.widget.tkSwapBuffers()
+
+
+def create_display_backend(name: str, root: tk.Tk) -> DisplayBackend:
+    """Cria backend de exibição pelo nome ("auto", "opengl" ou "tk").
+    
+    "auto" usa OpenGL quando PyOpenGL e pyopengltk estão instalados. Qualquer
+    falha ao criar o backend OpenGL volta para Tk.
+    """
+    if name in ("auto", "opengl"):
+        if OPENGL_AVAILABLE:
+            try:
+                backend = OpenGLDisplayBackend(root)
+                print("Display: backend OpenGL")
+                return backend
+            except Exception as e:
+                print(f"Display: falha ao iniciar OpenGL ({type(e).__name__}: {e}), usando Tk")
+        elif name == "opengl":
+            print("Display: PyOpenGL/pyopengltk não instalados, usando Tk")
+    
+    print("Display: backend Tk")
+    return TkDisplayBackend(root)
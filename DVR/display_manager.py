@@ -1,33 +1,174 @@
-"""Gerenciamento de exibição de grid 2x2 com transições fade."""
+"""Gerenciamento de exibição dos grids (layouts 2x2, 3x3, 4x4, 1+5) com transições fade."""
 import numpy as np
 import cv2
 import time
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Dict, Set, Any
+from stream_manager import PROFILE_MAIN, PROFILE_SUB
+from stream_watchdog import STREAM_LIVE, STREAM_STALE, STREAM_DISCONNECTED
+from grid_scheduler import FixedScheduler, create_grid_scheduler
+from layouts import (LAYOUTS, HOT_REFRESH_SECONDS, Rect, layout_rects, default_layout, grid_layout, cell_count,
+                     is_hot_grid, rank_hot_cameras, place_hot_cameras)
+
+# Modos de mistura do fade: alpha exato a cada frame ou alpha em passos (remistura só quando o passo muda)
+BLEND_FLOAT = "float"
+BLEND_QUANTIZED = "quantized"
+# Nome antigo de BLEND_QUANTIZED, aceito em configurações existentes
+BLEND_FIXED = "fixed"
+
+# Aviso desenhado sobre câmeras que não estão ao vivo: estado -> (texto, cor BGR)
+STATE_OVERLAYS = {
+    STREAM_STALE: ("IMAGEM CONGELADA", (0, 165, 255)),
+    STREAM_DISCONNECTED: ("SEM SINAL", (0, 0, 255)),
+}
 
 
 class DisplayManager:
-    """Gerencia composição de grid 2x2 e transições."""
+    """Gerencia composição dos grids e transições."""
+    
+    # Número de níveis de alpha do fade no modo BLEND_QUANTIZED
+    QUANTIZED_BLEND_STEPS = 16
     
     def __init__(self, stream_manager, target_width: int = 1920, target_height: int = 1080):
         self.stream_manager = stream_manager
         self.target_width = target_width
         self.target_height = target_height
-        self.cell_width = target_width // 2
-        self.cell_height = target_height // 2
         self.current_grid_index = 0
         self.current_grid_start_time = 0
         self.transition_start_time = 0
         self.in_transition = False
         self.transition_alpha = 0.0
-        self.current_grid_frames: List[Optional[np.ndarray]] = [None, None, None, None]
-        self.next_grid_frames: List[Optional[np.ndarray]] = [None, None, None, None]
+        self._last_demand: Optional[Tuple] = None
+        self.fullscreen_camera: Optional[int] = None  # Câmera ampliada (None = grid)
+        # Quando e para onde a rotação automática vai (trocado em reset() conforme a configuração)
+        self.scheduler: FixedScheduler = FixedScheduler()
+        # Seleção atual de cada grid dinâmico: índice do grid -> (instante da escolha, câmeras)
+        self._hot_cameras: Dict[int, Tuple[float, List[int]]] = {}
+        self._hot_frozen: Set[int] = set()  # Grids dinâmicos com seleção congelada na última reavaliação
+        # Retângulos (x, y, largura, altura) alterados pelo último render_frame em
+        # relação ao frame devolvido antes dele; None = frame inteiro
+        self.dirty_rects: Optional[List[Rect]] = None
+        self._grid_dirty: List[Rect] = []  # Células alteradas pelo último compose
+        self._build_canvases()
+    
+    def _build_canvases(self) -> None:
+        """Pré-aloca canvas de saída, canvas do grid que entra e as células de cada layout.
+        
+        Os retângulos das células de todos os layouts são calculados aqui, uma
+        vez por tamanho de saída, junto com as vistas (ROI) de cada célula em
+        cada canvas. compose_grid escreve direto nessas vistas e o fade mistura
+        célula a célula num terceiro canvas, sem alocar nada nem refazer contas
+        de layout por frame e sem apagar o conteúdo dos grids de origem.
+        """
+        self._canvas = np.zeros((self.target_height, self.target_width, 3), dtype=np.uint8)
+        self._next_canvas = np.zeros_like(self._canvas)
+        self._blend_canvas = np.zeros_like(self._canvas)
+        self._full_rect: Rect = (0, 0, self.target_width, self.target_height)
+        # Layout -> retângulos (x, y, largura, altura) das células, na ordem das câmeras do grid
+        self._layout_rects: Dict[str, List[Rect]] = {
+            layout: layout_rects(layout, self.target_width, self.target_height) for layout in LAYOUTS}
+        # Layout -> vistas das células no canvas de saída, no do próximo grid e no do fade
+        self._layout_cells: Dict[str, Tuple[List[np.ndarray], List[np.ndarray], List[np.ndarray]]] = {
+            layout: (self._cell_views(self._canvas, rects), self._cell_views(self._next_canvas, rects),
+                     self._cell_views(self._blend_canvas, rects))
+            for layout, rects in self._layout_rects.items()}
+        # Menor célula entre os layouts: tamanho dos frames das câmeras fora de cena
+        self._hidden_size = min(((width, height) for rects in self._layout_rects.values()
+                                 for _, _, width, height in rects), key=lambda size: size[0] * size[1])
+        # Cache de células redimensionadas: (câmera, largura, altura) -> (sequência, frame)
+        self._resize_cache: Dict[Tuple[int, int, int], Tuple[int, np.ndarray]] = {}
+        # Faixas de aviso já renderizadas: (estado, largura da célula) -> imagem
+        self._overlay_cache: Dict[Tuple[str, int], np.ndarray] = {}
+        self._invalidate_canvases()
+    
+    def resize_output(self, width: int, height: int) -> bool:
+        """Redimensiona a saída para o tamanho real da área de vídeo.
+        
+        Células passam a ter o tamanho que ocupam na tela, então cada câmera é
+        escalada uma única vez (câmera -> célula) e o backend não precisa
+        escalar o frame composto de novo. Retorna True se o tamanho mudou.
+        """
+        if width <= 1 or height <= 1 or (width, height) == (self.target_width, self.target_height):
+            return False
+        self.target_width = width
+        self.target_height = height
+        self._build_canvases()
+        # Decodificação passa a escalar para o novo tamanho de célula
+        self._last_demand = None
+        return True
+    
+    def _invalidate_canvases(self) -> None:
+        """Esquece o conteúdo dos canvas: próximo compose redesenha todas as células.
+        
+        Cada registro guarda (câmera, sequência, estado) do frame que está na
+        célula; o estado do watchdog entra no registro para que o aviso de
+        imagem congelada seja desenhado (e apagado) uma única vez. Os registros
+        valem para o layout desenhado no canvas; outro layout começa do zero.
+        """
+        self._canvas_layout: Optional[str] = None
+        self._canvas_records: List[Optional[Tuple[Optional[int], int, str]]] = []
+        self._next_canvas_layout: Optional[str] = None
+        self._next_canvas_records: List[Optional[Tuple[Optional[int], int, str]]] = []
+        # Fade: par de layouts misturado e (registro do grid atual, registro do próximo, alpha) de cada célula
+        self._blend_layouts: Optional[Tuple[str, str]] = None
+        self._blend_records: List[Optional[Tuple]] = []
+        self._single_record: Optional[Tuple[int, int, str]] = None
+        # Tipo do último frame devolvido ("grid", "blend" ou "single"); mudou = frame inteiro sujo
+        self._last_output: Optional[str] = None
+    
+    @staticmethod
+    def _cell_views(canvas: np.ndarray, rects: List[Rect]) -> List[np.ndarray]:
+        """Retorna vistas (sem cópia) de cada célula de um canvas."""
+        return [canvas[y:y + h, x:x + w] for x, y, w, h in rects]
     
     def get_current_grid(self, config_manager) -> List[int]:
         """Obtém lista de câmeras do grid atual."""
         grids = config_manager.get_grids()
         if not grids:
             return []
-        return grids[self.current_grid_index].get("cameras", [])
+        return self._grid_cameras(grids, self.current_grid_index)
+    
+    def _grid_cameras(self, grids: List[Dict[str, Any]], index: int) -> List[int]:
+        """Câmeras de um grid na ordem das células (grid dinâmico: a seleção atual)."""
+        grid = grids[index]
+        if is_hot_grid(grid):
+            entry = self._hot_cameras.get(index)
+            return entry[1] if entry is not None else []
+        return grid.get("cameras", [])
+    
+    def _scheduled_grids(self, config_manager) -> List[Dict[str, Any]]:
+        """Grids para o agendador, com as câmeras atuais dos grids dinâmicos."""
+        grids = config_manager.get_grids()
+        return [dict(grid, cameras=self._grid_cameras(grids, index)) if is_hot_grid(grid) else grid
+                for index, grid in enumerate(grids)]
+    
+    def _refresh_hot_grids(self, grids: List[Dict[str, Any]], frozen: Set[int]) -> None:
+        """Reavalia as câmeras dos grids dinâmicos a cada "refresh" segundos.
+        
+        Grids na tela durante o fade ou em pré-aquecimento (frozen) mantêm a
+        seleção, para que as câmeras que entram sejam as que já decodificam; o
+        grid que começa a pré-aquecer é reavaliado uma última vez antes disso.
+        """
+        now = time.time()
+        scores = last_motion_times = None
+        for index, grid in enumerate(grids):
+            if not is_hot_grid(grid):
+                continue
+            entry = self._hot_cameras.get(index)
+            if entry is not None:
+                if index in frozen:
+                    if index in self._hot_frozen or index == self.current_grid_index:
+                        continue
+                elif now - entry[0] < grid.get("refresh", HOT_REFRESH_SECONDS):
+                    continue
+            if scores is None:
+                scores = self.stream_manager.get_activity_scores()
+                last_motion_times = self.stream_manager.get_last_motion_times()
+            # Candidatas: as câmeras listadas no grid, ou todas
+            candidates = grid.get("cameras") or range(self.stream_manager.get_stream_count())
+            ranked = rank_hot_cameras(candidates, scores, last_motion_times)
+            cameras = place_hot_cameras(ranked, entry[1] if entry is not None else [], cell_count(grid_layout(grid)))
+            self._hot_cameras[index] = (now, cameras)
+        self._hot_frozen = frozen
     
     def should_rotate(self, config_manager) -> bool:
         """Verifica se deve rotacionar para próximo grid."""
@@ -35,15 +176,101 @@ class DisplayManager:
         if not grids or len(grids) <= 1:
             return False
         
-        # Não deve rotacionar se já está em transição
-        if self.in_transition:
+        # Não deve rotacionar se já está em transição ou com câmera ampliada
+        if self.in_transition or self.fullscreen_camera is not None:
             return False
         
-        current_grid = grids[self.current_grid_index]
-        display_time = current_grid.get("display_time", 15)
-        elapsed = time.time() - self.current_grid_start_time
+        return self.time_until_rotation(config_manager) <= 0.0
+    
+    def time_until_rotation(self, config_manager) -> Optional[float]:
+        """Retorna segundos até a próxima rotação automática (None se não houver rotação)."""
+        grids = config_manager.get_grids()
+        if not grids or len(grids) <= 1:
+            return None
+        return self.scheduler.time_until_rotation(self._scheduled_grids(config_manager), self.current_grid_index,
+                                                  self.current_grid_start_time, time.time())
+    
+    def get_next_grid_index(self, config_manager) -> Optional[int]:
+        """Retorna índice do grid que entra na próxima transição."""
+        grids = config_manager.get_grids()
+        if not grids:
+            return None
+        if hasattr(self, '_target_grid_index'):
+            return self._target_grid_index
+        return self.scheduler.next_grid(self._scheduled_grids(config_manager), self.current_grid_index)
+    
+    def update_demand(self, config_manager, auto_mode: bool = True) -> None:
+        """Informa ao StreamManager quais câmeras estão visíveis, próximas ou ocultas.
+        
+        As câmeras do próximo grid são promovidas para decodificação completa
+        prewarm_time segundos antes da rotação, para que o fade nunca mostre
+        frames antigos. Também é aqui que os grids dinâmicos são reavaliados.
+        """
+        grids = config_manager.get_grids()
+        if not grids:
+            return
+        
+        next_index = self.get_next_grid_index(config_manager)
+        prewarming = False
+        if not self.in_transition and auto_mode and next_index is not None:
+            remaining = self.time_until_rotation(config_manager)
+            prewarming = remaining is not None and remaining <= config_manager.get_prewarm_time()
+        if self.in_transition:
+            self._refresh_hot_grids(grids, {self.current_grid_index, next_index})
+        else:
+            self._refresh_hot_grids(grids, {next_index} if prewarming else set())
+        
+        visible = list(self.get_current_grid(config_manager))
+        if self.fullscreen_camera is not None:
+            visible.append(self.fullscreen_camera)
+        upcoming: List[int] = []
+        # Grids com células na tela ou pré-aquecendo (definem o tamanho de cada câmera)
+        shown = [self.current_grid_index]
+        
+        if self.in_transition and next_index is not None:
+            # Durante o fade os dois grids estão na tela
+            visible += self._grid_cameras(grids, next_index)
+            shown.append(next_index)
+        elif prewarming:
+            upcoming = list(self._grid_cameras(grids, next_index))
+            shown.append(next_index)
+        
+        cells = tuple((grid_layout(grids[index]), tuple(self._grid_cameras(grids, index))) for index in shown)
+        demand = (tuple(sorted(set(visible))), tuple(sorted(set(upcoming))), cells)
+        if demand != self._last_demand:
+            self._last_demand = demand
+            self.stream_manager.set_demand(visible, upcoming)
+            in_use = self._apply_output_sizes(cells)
+            # Descarta células em cache de câmeras que saíram de cena ou mudaram de tamanho
+            for key in [key for key in self._resize_cache if key not in in_use]:
+                del self._resize_cache[key]
+    
+    def _apply_output_sizes(self, cells: Tuple[Tuple[str, Tuple[int, ...]], ...]) -> Set[Tuple[int, int, int]]:
+        """Pede a cada stream frames já no tamanho da sua célula (resize na captura).
+        
+        Uma câmera presente nos dois grids do fade recebe a maior das duas
+        células; a câmera ampliada volta à resolução completa do decoder e as
+        câmeras fora de cena recebem a menor célula dos layouts. Retorna as
+        células em uso como (câmera, largura, altura).
+        
+        Args:
+            cells: (layout, câmeras) de cada grid na tela ou pré-aquecendo
+        """
+        in_use: Set[Tuple[int, int, int]] = set()
+        sizes: Dict[int, Tuple[int, int]] = {}
+        for layout, cameras in cells:
+            for camera_index, (_, _, width, height) in zip(cameras, self._layout_rects[layout]):
+                in_use.add((camera_index, width, height))
+                size = sizes.get(camera_index)
+                if size is None or width * height > size[0] * size[1]:
+                    sizes[camera_index] = (width, height)
+        if self.fullscreen_camera is not None:
+            in_use.add((self.fullscreen_camera, self.target_width, self.target_height))
         
-        return elapsed >= display_time
+        for camera_index in range(self.stream_manager.get_stream_count()):
+            size = None if camera_index == self.fullscreen_camera else sizes.get(camera_index, self._hidden_size)
+            self.stream_manager.set_output_size(camera_index, size)
+        return in_use
     
     def start_transition(self) -> None:
         """Inicia transição fade."""
@@ -73,60 +300,230 @@ class DisplayManager:
         if not grids:
             return
         
-        # Rotaciona para próximo grid
-        self.current_grid_index = (self.current_grid_index + 1) % len(grids)
-        # Reseta timer para começar contagem dos 15 segundos
+        # Rotaciona para o grid escolhido pelo agendador (o mesmo que foi pré-aquecido)
+        self.current_grid_index = self.scheduler.next_grid(self._scheduled_grids(config_manager),
+                                                           self.current_grid_index)
+        # Reseta timer do novo grid
         self.current_grid_start_time = time.time()
+        self.scheduler.grid_changed()
     
-    def compose_grid(self, camera_indices: List[int], wait_for_all: bool = True) -> Optional[np.ndarray]:
-        """Compõe grid 2x2 com frames das câmeras especificadas.
+    def camera_at(self, x: int, y: int, width: int, height: int, config_manager) -> Optional[int]:
+        """Retorna índice da câmera exibida na posição (x, y) de uma tela width x height."""
+        if width <= 0 or height <= 0:
+            return None
+        # Converte para coordenadas do canvas de saída
+        canvas_x = x * self.target_width // width
+        canvas_y = y * self.target_height // height
+        grids = config_manager.get_grids()
+        if not grids:
+            return None
+        cameras = self._grid_cameras(grids, self.current_grid_index)
+        rects = self._layout_rects[grid_layout(grids[self.current_grid_index])]
+        for cell, (cx, cy, cw, ch) in enumerate(rects):
+            if cx <= canvas_x < cx + cw and cy <= canvas_y < cy + ch:
+                return cameras[cell] if cell < len(cameras) else None
+        return None
+    
+    def enlarge_camera(self, camera_index: int) -> None:
+        """Amplia uma câmera para tela cheia usando o stream principal."""
+        if self.fullscreen_camera is not None and self.fullscreen_camera != camera_index:
+            self.stream_manager.set_profile(self.fullscreen_camera, PROFILE_SUB)
+        self.fullscreen_camera = camera_index
+        self.stream_manager.set_profile(camera_index, PROFILE_MAIN)
+        self._last_demand = None
+    
+    def restore_grid(self) -> None:
+        """Volta da câmera ampliada para o grid, retomando a contagem do grid atual."""
+        if self.fullscreen_camera is None:
+            return
+        self.stream_manager.set_profile(self.fullscreen_camera, PROFILE_SUB)
+        self.fullscreen_camera = None
+        self.current_grid_start_time = time.time()
+        self._last_demand = None
+    
+    def _resized_frame(self, camera_index: int, width: int, height: int) -> Optional[Tuple[int, np.ndarray]]:
+        """Retorna (sequência, frame redimensionado) da câmera, usando o cache.
+        
+        O resize só é refeito quando a câmera publicou um frame novo desde o
+        último uso nesse tamanho.
+        """
+        key = (camera_index, width, height)
+        entry = self._resize_cache.get(key)
+        if entry is not None and entry[0] == self.stream_manager.get_frame_seq(camera_index):
+            return entry
+        
+        # Empresta o frame sem cópia e redimensiona no buffer do cache
+        view = self.stream_manager.borrow_frame(camera_index)
+        if view is None:
+            return None
+        with view:
+            if view.frame.size == 0:
+                return None
+            buffer = entry[1] if entry is not None else np.empty((height, width, 3), dtype=np.uint8)
+            cv2.resize(view.frame, (width, height), dst=buffer)
+            entry = (view.seq, buffer)
+        self._resize_cache[key] = entry
+        return entry
+    
+    def _draw_cell(self, camera_index: Optional[int], roi: np.ndarray,
+                   records: List[Optional[Tuple[Optional[int], int, str]]], cell: int) -> bool:
+        """Desenha câmera na célula se o conteúdo mudou. Retorna False se não há frame."""
+        if camera_index is None:
+            # Placeholder preto se não houver câmera na célula
+            if records[cell] != (None, 0, STREAM_LIVE):
+                roi.fill(0)
+                records[cell] = (None, 0, STREAM_LIVE)
+            return True
+        
+        seq = self.stream_manager.get_frame_seq(camera_index)
+        state = self.stream_manager.get_stream_state(camera_index)
+        if seq > 0 and records[cell] == (camera_index, seq, state):
+            # Célula já mostra esse frame
+            return True
+        
+        height, width = roi.shape[:2]
+        view = self.stream_manager.borrow_frame(camera_index)
+        if view is not None:
+            with view:
+                if view.frame.shape[:2] == (height, width):
+                    # Frame já veio da captura no tamanho da célula: copia direto
+                    np.copyto(roi, view.frame)
+                    records[cell] = (camera_index, view.seq, state)
+                    self._draw_state_overlay(roi, state)
+                    return True
+        
+        resized = self._resized_frame(camera_index, width, height)
+        if resized is None:
+            records[cell] = None
+            return False
+        np.copyto(roi, resized[1])
+        records[cell] = (camera_index, resized[0], state)
+        self._draw_state_overlay(roi, state)
+        return True
+    
+    def _draw_state_overlay(self, roi: np.ndarray, state: str) -> None:
+        """Marca câmera que não está ao vivo: escurece, contorna e escreve o aviso.
+        
+        Só roda quando a célula é redesenhada; como uma câmera congelada não
+        publica frames novos, isso acontece uma vez por mudança de estado.
+        """
+        overlay = STATE_OVERLAYS.get(state)
+        if overlay is None:
+            return
+        color = overlay[1]
+        height, width = roi.shape[:2]
+        np.right_shift(roi, 1, out=roi)
+        cv2.rectangle(roi, (0, 0), (width - 1, height - 1), color, max(width // 160, 2))
+        
+        label = self._state_label(state, width)
+        label_height, label_width = min(label.shape[0], height), min(label.shape[1], width)
+        y = (height - label_height) // 2
+        x = (width - label_width) // 2
+        np.copyto(roi[y:y + label_height, x:x + label_width], label[:label_height, :label_width])
+    
+    def _state_label(self, state: str, width: int) -> np.ndarray:
+        """Retorna a faixa com o texto do aviso para células desta largura (em cache)."""
+        key = (state, width)
+        label = self._overlay_cache.get(key)
+        if label is None:
+            text, color = STATE_OVERLAYS[state]
+            scale = max(width / 800.0, 0.4)
+            thickness = max(int(scale * 2), 1)
+            (text_width, text_height), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+            padding = text_height // 2 + 2
+            label = np.zeros((text_height + baseline + 2 * padding, text_width + 2 * padding, 3), dtype=np.uint8)
+            label[:] = color
+            cv2.putText(label, text, (padding, padding + text_height), cv2.FONT_HERSHEY_SIMPLEX, scale,
+                        (255, 255, 255), thickness, cv2.LINE_AA)
+            self._overlay_cache[key] = label
+        return label
+    
+    def compose_single(self, camera_index: int) -> Optional[np.ndarray]:
+        """Compõe frame de uma única câmera em tela cheia (no canvas de saída)."""
+        seq = self.stream_manager.get_frame_seq(camera_index)
+        state = self.stream_manager.get_stream_state(camera_index)
+        if seq > 0 and self._single_record == (camera_index, seq, state):
+            self._set_output("single", [])
+            return self._canvas
+        
+        resized = self._resized_frame(camera_index, self.target_width, self.target_height)
+        if resized is None:
+            return None
+        np.copyto(self._canvas, resized[1])
+        self._draw_state_overlay(self._canvas, state)
+        # Canvas não mostra mais o grid: próximo compose_grid redesenha todas as células
+        self._canvas_layout = None
+        self._single_record = (camera_index, resized[0], state)
+        self._set_output("single", None)
+        return self._canvas
+    
+    def _set_output(self, kind: str, dirty: Optional[List[Rect]]) -> None:
+        """Registra tipo do frame devolvido e regiões alteradas (tudo, se o tipo mudou)."""
+        self.dirty_rects = dirty if kind == self._last_output else None
+        self._last_output = kind
+    
+    def compose_grid(self, camera_indices: List[int], wait_for_all: bool = True,
+                     out: Optional[np.ndarray] = None, layout: Optional[str] = None) -> Optional[np.ndarray]:
+        """Compõe grid no layout indicado com frames das câmeras especificadas.
+        
+        As células vêm da tabela de retângulos pré-calculada do layout. Cada
+        célula só é redesenhada quando a câmera publicou frame novo (sequência
+        diferente da registrada para a célula); o resize vem do cache por
+        câmera e tamanho. Tudo é escrito em buffers persistentes, e o array
+        devolvido é reutilizado no próximo render. Câmeras sem frame ficam
+        pretas e só são pintadas uma vez. Câmeras congeladas ou sem conexão
+        (segundo o watchdog do StreamManager) recebem um aviso.
         
         Args:
             camera_indices: Lista de índices das câmeras
             wait_for_all: Se True, só retorna grid quando todas as câmeras tiverem frames válidos
+            out: Canvas de destino (self._canvas ou self._next_canvas); padrão é o canvas de saída
+            layout: Layout (LAYOUTS); padrão é o menor que comporta as câmeras
         """
-        if len(camera_indices) < 4:
-            # Preenche com None se não houver 4 câmeras
-            camera_indices = camera_indices + [None] * (4 - len(camera_indices))
-        
-        frames = []
-        all_ready = True
-        
-        for idx in camera_indices[:4]:
-            if idx is not None:
-                frame = self.stream_manager.get_frame(idx)
-                if frame is not None and frame.size > 0:
-                    # Redimensiona para tamanho da célula
-                    resized = cv2.resize(frame, (self.cell_width, self.cell_height))
-                    frames.append(resized)
-                else:
-                    # Frame não disponível
-                    all_ready = False
-                    if wait_for_all:
-                        # Se esperando por todos, retorna None
-                        return None
-                    else:
-                        # Placeholder preto se não esperando
-                        frames.append(np.zeros((self.cell_height, self.cell_width, 3), dtype=np.uint8))
-            else:
-                # Placeholder preto se índice inválido
-                frames.append(np.zeros((self.cell_height, self.cell_width, 3), dtype=np.uint8))
-        
-        if not frames or len(frames) < 4:
-            return None
+        if layout is None:
+            layout = default_layout(len(camera_indices))
+        rects = self._layout_rects[layout]
+        if out is None or out is self._canvas:
+            if self._canvas_layout != layout:
+                self._canvas_layout = layout
+                self._canvas_records = [None] * len(rects)
+            canvas, cells, records = self._canvas, self._layout_cells[layout][0], self._canvas_records
+            self._single_record = None
+        else:
+            if self._next_canvas_layout != layout:
+                self._next_canvas_layout = layout
+                self._next_canvas_records = [None] * len(rects)
+            canvas, cells, records = self._next_canvas, self._layout_cells[layout][1], self._next_canvas_records
         
-        # Compõe grid 2x2
-        # Top row: frames[0] | frames[1]
-        # Bottom row: frames[2] | frames[3]
-        top_row = np.hstack([frames[0], frames[1]])
-        bottom_row = np.hstack([frames[2], frames[3]])
-        grid = np.vstack([top_row, bottom_row])
+        self._grid_dirty = []
+        for cell in range(len(rects)):
+            idx = camera_indices[cell] if cell < len(camera_indices) else None
+            previous = records[cell]
+            if not self._draw_cell(idx, cells[cell], records, cell):
+                # Frame não disponível
+                if wait_for_all:
+                    # Se esperando por todos, retorna None (células já desenhadas
+                    # não foram entregues: próximo frame sai inteiro)
+                    self._last_output = None
+                    return None
+                # Placeholder preto se não esperando (pintado só uma vez)
+                state = self.stream_manager.get_stream_state(idx)
+                if previous != (idx, 0, state):
+                    cells[cell].fill(0)
+                    self._draw_state_overlay(cells[cell], state)
+                    self._grid_dirty.append(rects[cell])
+                records[cell] = (idx, 0, state)
+            elif records[cell] != previous:
+                self._grid_dirty.append(rects[cell])
         
-        return grid
+        return canvas
     
     def render_frame(self, config_manager, wait_for_all: bool = True) -> Optional[np.ndarray]:
         """Renderiza frame atual com transição se necessário.
         
+        O frame devolvido é o canvas persistente do DisplayManager: é válido
+        até a próxima chamada e não deve ser guardado.
+        
         Args:
             config_manager: Gerenciador de configuração
             wait_for_all: Se True, só retorna quando todas as câmeras tiverem frames
@@ -135,35 +532,82 @@ class DisplayManager:
         if not grids:
             return None
         
-        # Determina qual grid usar na transição
-        if self.in_transition and hasattr(self, '_target_grid_index'):
-            # Transição para grid específico (tecla 1 ou 2)
-            next_index = self._target_grid_index
-        elif self.in_transition:
-            # Transição automática para próximo
-            next_index = (self.current_grid_index + 1) % len(grids)
-        else:
-            next_index = None
+        # Câmera ampliada: exibe só ela (mantém último frame enquanto troca de perfil)
+        if self.fullscreen_camera is not None:
+            return self.compose_single(self.fullscreen_camera)
+        
+        # Determina qual grid usar na transição (grid específico via tecla ou próximo)
+        next_index = self.get_next_grid_index(config_manager) if self.in_transition else None
         
-        current_cameras = self.get_current_grid(config_manager)
-        current_frame = self.compose_grid(current_cameras, wait_for_all=wait_for_all)
+        current_cameras = self._grid_cameras(grids, self.current_grid_index)
+        current_frame = self.compose_grid(current_cameras, wait_for_all=wait_for_all, out=self._canvas,
+                                          layout=grid_layout(grids[self.current_grid_index]))
         
         if current_frame is None:
             return None
+        current_dirty = self._grid_dirty
         
         # Se em transição, compõe com próximo grid
         if self.in_transition and next_index is not None:
-            next_cameras = grids[next_index].get("cameras", [])
-            next_frame = self.compose_grid(next_cameras, wait_for_all=wait_for_all)
+            next_cameras = self._grid_cameras(grids, next_index)
+            next_frame = self.compose_grid(next_cameras, wait_for_all=wait_for_all, out=self._next_canvas,
+                                           layout=grid_layout(grids[next_index]))
             
             if next_frame is not None:
-                # Aplica fade: current_frame fade out, next_frame fade in
-                alpha = self.transition_alpha
-                blended = cv2.addWeighted(current_frame, 1.0 - alpha, next_frame, alpha, 0)
+                blended = self._blend_grids(self.transition_alpha, config_manager.get_blend_mode())
+                self._set_output("blend", self._grid_dirty)
                 return blended
         
+        self._set_output("grid", current_dirty)
         return current_frame
     
+    def _blend_grids(self, alpha: float, blend_mode: str) -> np.ndarray:
+        """Mistura grid atual (fade out) e próximo (fade in) célula a célula no canvas de fade.
+        
+        Uma célula só é misturada de novo se algum dos dois frames ou o alpha
+        mudou desde a última mistura. Células com a mesma câmera e o mesmo
+        frame nos dois grids são copiadas, sem mistura. No modo BLEND_QUANTIZED
+        o alpha anda em QUANTIZED_BLEND_STEPS passos, então, com frames
+        repetidos, a maioria dos ticks do fade não precisa misturar nada; a
+        mistura em si é a mesma (cv2.addWeighted). Se os dois grids têm layouts diferentes,
+        as células não se correspondem e o frame inteiro é misturado de uma vez.
+        As regiões misturadas ficam em self._grid_dirty.
+        """
+        self._grid_dirty = []
+        if blend_mode in (BLEND_QUANTIZED, BLEND_FIXED):
+            alpha = round(alpha * self.QUANTIZED_BLEND_STEPS) / self.QUANTIZED_BLEND_STEPS
+        
+        layouts = (self._canvas_layout, self._next_canvas_layout)
+        if layouts != self._blend_layouts:
+            self._blend_layouts = layouts
+            self._blend_records = [None] * len(self._canvas_records)
+        
+        if layouts[0] != layouts[1]:
+            record = (tuple(self._canvas_records), tuple(self._next_canvas_records), alpha)
+            if self._blend_records[0] != record:
+                cv2.addWeighted(self._canvas, 1.0 - alpha, self._next_canvas, alpha, 0, dst=self._blend_canvas)
+                self._blend_records[0] = record
+                self._grid_dirty.append(self._full_rect)
+            return self._blend_canvas
+        
+        current_cells, next_cells, blend_cells = self._layout_cells[layouts[0]]
+        rects = self._layout_rects[layouts[0]]
+        for cell in range(len(rects)):
+            current_record = self._canvas_records[cell]
+            next_record = self._next_canvas_records[cell]
+            record = (current_record, next_record, alpha)
+            if current_record is not None and next_record is not None and self._blend_records[cell] == record:
+                continue
+            
+            if current_record is not None and current_record == next_record:
+                np.copyto(blend_cells[cell], current_cells[cell])
+            else:
+                cv2.addWeighted(current_cells[cell], 1.0 - alpha, next_cells[cell], alpha, 0, dst=blend_cells[cell])
+            self._blend_records[cell] = record
+            self._grid_dirty.append(rects[cell])
+        
+        return self._blend_canvas
+    
     def switch_to_grid(self, grid_index: int, config_manager) -> None:
         """Troca para um grid específico com fade."""
         grids = config_manager.get_grids()
@@ -180,15 +624,29 @@ class DisplayManager:
             self.current_grid_index = self._target_grid_index
             # Reseta timer para começar contagem dos 15 segundos
             self.current_grid_start_time = time.time()
+            self.scheduler.grid_changed()
             self.in_transition = False
             self.transition_alpha = 0.0
             delattr(self, '_target_grid_index')
     
     def reset(self, config_manager) -> None:
         """Reseta estado do display manager."""
+        self.restore_grid()
+        self.scheduler = create_grid_scheduler(config_manager, self.stream_manager.get_activity_scores)
         grids = config_manager.get_grids()
+        for index, grid in enumerate(grids):
+            if "layout" in grid and grid["layout"] not in LAYOUTS:
+                print(f"Grid {index + 1}: layout '{grid['layout']}' desconhecido, usando {grid_layout(grid)} "
+                      f"(disponíveis: {', '.join(LAYOUTS)})")
+        # Grids dinâmicos escolhem câmeras de novo (índices podem ter mudado)
+        self._hot_cameras.clear()
+        self._hot_frozen = set()
         if grids:
             self.current_grid_index = 0
             self.current_grid_start_time = time.time()
             self.in_transition = False
             self.transition_alpha = 0.0
+            self._last_demand = None
+        # Índices de câmera podem ter mudado (reload): descarta cache e conteúdo dos canvas
+        self._resize_cache.clear()
+        self._invalidate_canvases()
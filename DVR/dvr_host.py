@@ -0,0 +1,115 @@
+"""Estado de alcançabilidade de um DVR, compartilhado pelos seus canais."""
+import socket
+import threading
+import time
+from typing import Optional
+from backoff import Backoff
+
+
+class DVRHost:
+    """Testa se um DVR responde e coordena a (re)conexão dos seus canais.
+    
+    Um probe TCP barato na porta RTSP é feito antes de qualquer decoder ser
+    aberto. Enquanto o host está inalcançável, todos os canais falham na
+    hora (sem abrir VideoCapture) e esperam aqui; o probe segue com backoff
+    exponencial numa única thread do host. Quando o host volta, todos os
+    canais são acordados juntos. Um canal que perde a conexão chama
+    report_failure() para que o host seja testado de novo imediatamente.
+    """
+    
+    # Timeout do probe TCP (segundos)
+    PROBE_TIMEOUT = 2.0
+    
+    def __init__(self, ip: str, port: int = 554):
+        self.ip = ip
+        self.port = port
+        self.reachable: Optional[bool] = None  # None = ainda não testado
+        self.last_probe_time = 0.0
+        self.next_probe_time = 0.0
+        self.backoff = Backoff(initial=1.0, maximum=30.0)
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self._probe_requested = False
+    
+    def start(self) -> None:
+        """Inicia thread de probe do host."""
+        if self.running:
+            return
+        self.running = True
+        self.reachable = None
+        self.next_probe_time = 0.0
+        self.backoff.reset()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def stop(self) -> None:
+        """Para thread de probe e acorda canais em espera."""
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join(timeout=self.PROBE_TIMEOUT + 1.0)
+    
+    def wait_reachable(self, timeout: float) -> bool:
+        """Espera até timeout o host ficar alcançável; retorna True se está."""
+        with self.cond:
+            if self.reachable is not True and self.running:
+                self.cond.wait_for(lambda: self.reachable is True or not self.running, timeout)
+            return self.reachable is True
+    
+    def report_failure(self) -> None:
+        """Canal perdeu a conexão ou não conseguiu abrir: testa o host de novo."""
+        with self.cond:
+            if self.reachable:
+                self._probe_requested = True
+                self.cond.notify_all()
+    
+    def _probe_due(self) -> bool:
+        """Indica se é hora de testar o host."""
+        if self.reachable is None:
+            return True
+        if self.reachable is False:
+            return time.time() >= self.next_probe_time
+        return self._probe_requested
+    
+    def _probe_wait(self) -> Optional[float]:
+        """Tempo máximo de espera até o próximo probe (None = até ser acordado)."""
+        if self.reachable is False:
+            return max(self.next_probe_time - time.time(), 0.0)
+        return None
+    
+    def _probe(self) -> bool:
+        """Abre e fecha uma conexão TCP na porta RTSP."""
+        try:
+            with socket.create_connection((self.ip, self.port), timeout=self.PROBE_TIMEOUT):
+                return True
+        except OSError:
+            return False
+    
+    def _run(self) -> None:
+        """Loop de probe: testa quando necessário e publica o resultado aos canais."""
+        while True:
+            with self.cond:
+                while self.running and not self._probe_due():
+                    self.cond.wait(self._probe_wait())
+                if not self.running:
+                    return
+                self._probe_requested = False
+            
+            ok = self._probe()
+            
+            with self.cond:
+                self.last_probe_time = time.time()
+                if ok:
+                    if self.reachable is False:
+                        print(f"DVR {self.ip}: respondendo de novo, reconectando canais")
+                    self.reachable = True
+                    self.backoff.reset()
+                else:
+                    delay = self.backoff.next_delay()
+                    if self.reachable is not False:
+                        print(f"DVR {self.ip}:{self.port} inalcançável, canais aguardando")
+                    self.reachable = False
+                    self.next_probe_time = self.last_probe_time + delay
+                self.cond.notify_all()
@@ -0,0 +1,80 @@
+"""Histórico limitado de frames por câmera, consultável por timestamp."""
+import bisect
+import threading
+from collections import deque
+from typing import Optional, List, Tuple
+import cv2
+import numpy as np
+
+
+class FrameHistory:
+    """Guarda os últimos N segundos de frames de uma câmera.
+    
+    Frames ficam como arrays decodificados ("raw") ou JPEG ("jpeg", bem menor
+    em memória, com custo de codificação na thread de captura). A taxa de
+    amostragem é limitada por fps para não guardar todos os frames do stream.
+    """
+    
+    FORMAT_RAW = "raw"
+    FORMAT_JPEG = "jpeg"
+    
+    def __init__(self, seconds: float, fps: float = 5.0, fmt: str = FORMAT_RAW, jpeg_quality: int = 80):
+        self.seconds = seconds
+        self.min_interval = 1.0 / fps if fps > 0 else 0.0
+        self.format = fmt
+        self.jpeg_quality = jpeg_quality
+        self._timestamps: deque = deque()
+        self._frames: deque = deque()
+        self._lock = threading.Lock()
+    
+    def append(self, frame: np.ndarray, timestamp: float) -> None:
+        """Adiciona frame ao histórico (copia ou codifica, pois o buffer será reutilizado)."""
+        if self._timestamps and timestamp - self._timestamps[-1] < self.min_interval:
+            return
+        
+        if self.format == self.FORMAT_JPEG:
+            ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                return
+            item = encoded
+        else:
+            item = frame.copy()
+        
+        with self._lock:
+            self._timestamps.append(timestamp)
+            self._frames.append(item)
+            # Descarta frames mais antigos que a janela configurada
+            oldest_allowed = timestamp - self.seconds
+            while self._timestamps and self._timestamps[0] < oldest_allowed:
+                self._timestamps.popleft()
+                self._frames.popleft()
+    
+    def get(self, timestamp: float) -> Optional[Tuple[float, np.ndarray]]:
+        """Retorna (timestamp, frame) mais recente capturado até timestamp, ou None."""
+        with self._lock:
+            index = bisect.bisect_right(self._timestamps, timestamp) - 1
+            if index < 0:
+                return None
+            frame_timestamp = self._timestamps[index]
+            item = self._frames[index]
+        return frame_timestamp, self._decode(item)
+    
+    def get_range(self, start: float, end: float) -> List[Tuple[float, np.ndarray]]:
+        """Retorna lista de (timestamp, frame) capturados entre start e end."""
+        with self._lock:
+            first = bisect.bisect_left(self._timestamps, start)
+            last = bisect.bisect_right(self._timestamps, end)
+            items = [(self._timestamps[i], self._frames[i]) for i in range(first, last)]
+        return [(frame_timestamp, self._decode(item)) for frame_timestamp, item in items]
+    
+    def clear(self) -> None:
+        """Esvazia o histórico."""
+        with self._lock:
+            self._timestamps.clear()
+            self._frames.clear()
+    
+    def _decode(self, item: np.ndarray) -> np.ndarray:
+        """Converte item armazenado em frame BGR."""
+        if self.format == self.FORMAT_JPEG:
+            return cv2.imdecode(item, cv2.IMREAD_COLOR)
+        return item
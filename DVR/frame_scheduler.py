@@ -0,0 +1,69 @@
+"""Agendamento de frames por prazo (deadline) em relógio monotônico."""
+import time
+
+
+class FrameScheduler:
+    """Gera prazos de frame numa grade fixa: epoch + n * intervalo.
+    
+    Os prazos não acumulam deriva (cada um é calculado a partir do epoch, não
+    do anterior). Se o chamador chega atrasado mais de um intervalo, os prazos
+    perdidos são descartados explicitamente e contados em missed, em vez de
+    tentar recuperá-los em rajada. O Tk não expõe o vsync do monitor, então a
+    grade é alinhada ao epoch do relógio monotônico.
+    """
+    
+    def __init__(self, fps: float):
+        self.set_fps(fps)
+        self.frames = 0
+        self.missed = 0
+        self.jitter_avg = 0.0
+        self.jitter_max = 0.0
+    
+    # Faixa de taxas aceitas (evita intervalo zero ou negativo)
+    MIN_FPS = 1.0
+    MAX_FPS = 120.0
+    
+    def set_fps(self, fps: float) -> None:
+        """Define taxa de frames (limitada a MIN_FPS..MAX_FPS) e recomeça a grade a partir de agora."""
+        # Comparações escritas para que NaN também caia no mínimo
+        fps = self.MAX_FPS if fps > self.MAX_FPS else (fps if fps >= self.MIN_FPS else self.MIN_FPS)
+        self.fps = fps
+        self.interval = 1.0 / fps
+        self.epoch = time.monotonic()
+        self.frame_number = 0
+    
+    def next_deadline(self) -> float:
+        """Retorna instante (monotônico) do próximo prazo."""
+        return self.epoch + self.frame_number * self.interval
+    
+    def time_until_next(self) -> float:
+        """Retorna segundos até o próximo prazo (0 se já passou)."""
+        return max(self.next_deadline() - time.monotonic(), 0.0)
+    
+    def wait(self) -> float:
+        """Dorme até o próximo prazo e o consome; retorna o prazo atendido.
+        
+        Prazos que já passaram há mais de um intervalo são descartados.
+        """
+        now = time.monotonic()
+        deadline = self.next_deadline()
+        
+        if now - deadline >= self.interval:
+            # Atrasado: pula para o prazo mais recente e conta os perdidos
+            skipped = int((now - deadline) / self.interval)
+            self.frame_number += skipped
+            self.missed += skipped
+            deadline = self.next_deadline()
+        
+        delay = deadline - now
+        if delay > 0:
+            time.sleep(delay)
+        
+        # Jitter: distância entre o prazo e o instante em que acordamos
+        jitter = abs(time.monotonic() - deadline)
+        self.jitter_avg += (jitter - self.jitter_avg) * 0.05
+        self.jitter_max = max(self.jitter_max, jitter)
+        
+        self.frame_number += 1
+        self.frames += 1
+        return deadline
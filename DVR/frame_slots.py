@@ -0,0 +1,105 @@
+"""Troca de frames sem cópia entre a thread de captura e o renderizador."""
+import threading
+from typing import Optional, List, Tuple
+import numpy as np
+
+
+class FrameView:
+    """Empréstimo somente leitura de um frame publicado.
+    
+    Enquanto o empréstimo não for liberado, a thread de captura não escreve
+    no buffer correspondente. Use como context manager ou chame release().
+    """
+    
+    __slots__ = ("frame", "seq", "timestamp", "_slots", "_index")
+    
+    def __init__(self, frame: np.ndarray, seq: int, timestamp: float, slots: "FrameSlots", index: int):
+        self.frame = frame
+        self.seq = seq
+        self.timestamp = timestamp
+        self._slots = slots
+        self._index = index
+    
+    def release(self) -> None:
+        """Devolve o buffer para a thread de captura."""
+        if self._slots is not None:
+            self._slots.release(self._index)
+            self._slots = None
+    
+    def __enter__(self) -> "FrameView":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.release()
+
+
+class FrameSlots:
+    """Anel pequeno de buffers pré-alocados com publicação atômica do mais recente.
+    
+    A thread de captura decodifica direto no buffer devolvido por
+    acquire_write() e publica o índice com publish(). Leitores pegam o último
+    frame publicado com borrow(), sem copiar: o buffer emprestado fica
+    reservado até o release(). Só há um escritor por anel.
+    """
+    
+    def __init__(self, num_slots: int = 3):
+        self.num_slots = max(num_slots, 2)
+        self._buffers: List[Optional[np.ndarray]] = [None] * self.num_slots
+        self._pins: List[int] = [0] * self.num_slots
+        self._lock = threading.Lock()
+        self._next_index = 0
+        self.seq = 0
+        # (índice, sequência, timestamp) do último frame; trocado por atribuição única
+        self._latest: Tuple[int, int, float] = (-1, 0, 0.0)
+    
+    def acquire_write(self) -> Tuple[int, Optional[np.ndarray]]:
+        """Retorna (índice, buffer) livre para o próximo frame.
+        
+        O buffer é None no primeiro uso do slot; nesse caso o decoder aloca
+        e o array resultante passa a ser o buffer do slot em publish().
+        """
+        latest_index = self._latest[0]
+        with self._lock:
+            for offset in range(self.num_slots):
+                index = (self._next_index + offset) % self.num_slots
+                if index != latest_index and self._pins[index] == 0:
+                    self._next_index = (index + 1) % self.num_slots
+                    return index, self._buffers[index]
+            
+            # Todos os slots livres estão emprestados: usa um buffer novo e
+            # deixa o antigo só com quem o emprestou
+            index = (latest_index + 1) % self.num_slots
+            self._buffers[index] = None
+            return index, None
+    
+    def publish(self, index: int, frame: np.ndarray, timestamp: float) -> int:
+        """Publica frame escrito no slot; retorna o número de sequência."""
+        self._buffers[index] = frame
+        self.seq += 1
+        self._latest = (index, self.seq, timestamp)
+        return self.seq
+    
+    def borrow(self) -> Optional[FrameView]:
+        """Empresta o último frame publicado (somente leitura), ou None."""
+        with self._lock:
+            index, seq, timestamp = self._latest
+            if index < 0:
+                return None
+            frame = self._buffers[index]
+            if frame is None:
+                return None
+            self._pins[index] += 1
+        
+        view = frame.view()
+        view.flags.writeable = False
+        return FrameView(view, seq, timestamp, self, index)
+    
+    def release(self, index: int) -> None:
+        """Libera um slot emprestado."""
+        with self._lock:
+            if self._pins[index] > 0:
+                self._pins[index] -= 1
+    
+    def clear(self) -> None:
+        """Descarta o frame publicado (buffers emprestados continuam válidos)."""
+        self._latest = (-1, self.seq, 0.0)
@@ -0,0 +1,137 @@
+"""Agendamento da rotação automática de grids: tempo fixo ou guiado por atividade."""
+import time
+from typing import Optional, List, Dict, Any, Callable, Set
+
+# Modos de agendamento ("grid_scheduler.mode" na configuração)
+SCHEDULER_FIXED = "fixed"
+SCHEDULER_ACTIVITY = "activity"
+
+
+class FixedScheduler:
+    """Rotação em ordem, cada grid pelo seu display_time."""
+    
+    name = SCHEDULER_FIXED
+    
+    def dwell_time(self, grids: List[Dict[str, Any]], current_index: int) -> float:
+        """Tempo de exibição do grid atual (segundos)."""
+        return grids[current_index].get("display_time", 15)
+    
+    def time_until_rotation(self, grids: List[Dict[str, Any]], current_index: int,
+                            start_time: float, now: float) -> float:
+        """Segundos até a próxima rotação (0 = já deve rotacionar)."""
+        return max(self.dwell_time(grids, current_index) - (now - start_time), 0.0)
+    
+    def next_grid(self, grids: List[Dict[str, Any]], current_index: int) -> int:
+        """Índice do grid que entra na próxima rotação."""
+        return (current_index + 1) % len(grids)
+    
+    def grid_changed(self) -> None:
+        """Avisa que o grid atual mudou (rotação, tecla ou recarga)."""
+        pass
+
+
+class ActivityScheduler(FixedScheduler):
+    """Rotação guiada pelas notas de atividade das câmeras de cada grid.
+    
+    A atividade de um grid é a maior nota entre suas câmeras. Um grid entra
+    em "ativo" com atividade >= active_threshold e só sai abaixo de
+    quiet_threshold (histerese, para não alternar a cada oscilação da nota).
+    
+    - Grid atual ativo e nenhum outro: fica até acalmar (no máximo max_dwell).
+    - Outro grid ativo: ele fura a fila; o grid atual, se quieto, sai após
+      min_dwell, e se também ativo, após o seu display_time.
+    - Nenhum grid ativo: rotação em ordem pelo display_time, como no modo fixo.
+    
+    O próximo grid é decidido prewarm_time segundos antes da rotação e fica
+    fixo a partir daí, para que o pré-aquecimento decodifique o grid certo;
+    a rotação nunca acontece antes de o próximo grid ter tido prewarm_time
+    de pré-aquecimento.
+    """
+    
+    name = SCHEDULER_ACTIVITY
+    
+    # Intervalo mínimo entre leituras das notas de atividade (segundos)
+    UPDATE_INTERVAL = 0.2
+    
+    def __init__(self, activity_source: Callable[[], Dict[int, float]], prewarm_time: float,
+                 config: Dict[str, Any]):
+        self.activity_source = activity_source
+        self.prewarm_time = prewarm_time
+        self.active_threshold = config["active_threshold"]
+        self.quiet_threshold = config["quiet_threshold"]
+        self.min_dwell = config["min_dwell"]
+        self.max_dwell = config["max_dwell"]
+        self.activity: List[float] = []
+        self.active: Set[int] = set()
+        self.planned_next: Optional[int] = None
+        self.plan_time = 0.0
+        self._last_update = 0.0
+    
+    def _update(self, grids: List[Dict[str, Any]], now: float) -> None:
+        """Recalcula atividade de cada grid e aplica a histerese."""
+        if now - self._last_update < self.UPDATE_INTERVAL and len(self.activity) == len(grids):
+            return
+        self._last_update = now
+        scores = self.activity_source()
+        self.activity = [max((scores.get(camera, 0.0) for camera in grid.get("cameras", [])), default=0.0)
+                         for grid in grids]
+        for index, activity in enumerate(self.activity):
+            if activity >= self.active_threshold:
+                self.active.add(index)
+            elif activity < self.quiet_threshold:
+                self.active.discard(index)
+        self.active = {index for index in self.active if index < len(grids)}
+    
+    def dwell_time(self, grids: List[Dict[str, Any]], current_index: int) -> float:
+        display_time = grids[current_index].get("display_time", 15)
+        others_active = any(index != current_index for index in self.active)
+        if current_index in self.active:
+            return display_time if others_active else max(self.max_dwell, display_time)
+        if others_active:
+            return min(self.min_dwell, display_time)
+        return display_time
+    
+    def time_until_rotation(self, grids: List[Dict[str, Any]], current_index: int,
+                            start_time: float, now: float) -> float:
+        self._update(grids, now)
+        remaining = max(self.dwell_time(grids, current_index) - (now - start_time), 0.0)
+        
+        if self.planned_next is None:
+            if remaining <= self.prewarm_time:
+                self.planned_next = self._choose_next(grids, current_index)
+                self.plan_time = now
+        elif remaining > 2 * self.prewarm_time:
+            # Grid atual ganhou tempo (ficou ativo): a escolha é refeita mais perto da rotação
+            self.planned_next = None
+        
+        if self.planned_next is not None:
+            remaining = max(remaining, self.plan_time + self.prewarm_time - now)
+        return remaining
+    
+    def next_grid(self, grids: List[Dict[str, Any]], current_index: int) -> int:
+        if self.planned_next is not None and self.planned_next < len(grids):
+            return self.planned_next
+        self._update(grids, time.time())
+        return self._choose_next(grids, current_index)
+    
+    def _choose_next(self, grids: List[Dict[str, Any]], current_index: int) -> int:
+        """Grid ativo mais movimentado (empate: o mais próximo na ordem); senão o seguinte."""
+        count = len(grids)
+        candidates = [index for index in self.active if index != current_index]
+        if not candidates:
+            return (current_index + 1) % count
+        return max(candidates, key=lambda index: (self.activity[index], -((index - current_index) % count)))
+    
+    def grid_changed(self) -> None:
+        self.planned_next = None
+
+
+def create_grid_scheduler(config_manager, activity_source: Callable[[], Dict[int, float]]) -> FixedScheduler:
+    """Cria o agendador configurado ("fixed" ou "activity")."""
+    config = config_manager.get_grid_scheduler_config()
+    if config["mode"] == SCHEDULER_ACTIVITY:
+        if not config_manager.get_motion_config()["enabled"]:
+            print("Grids: agendamento por atividade requer detecção de movimento (motion.enabled); usando ordem fixa")
+            return FixedScheduler()
+        return ActivityScheduler(activity_source, config_manager.get_prewarm_time(), config)
+    return FixedScheduler()
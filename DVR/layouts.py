@@ -0,0 +1,103 @@
+"""Layouts de grid (2x2, 3x3, 4x4, 1+5) e o grid dinâmico de câmeras em movimento."""
+from typing import List, Tuple, Dict, Any, Iterable
+
+Rect = Tuple[int, int, int, int]  # (x, y, largura, altura)
+
+# Layouts disponíveis ("layout" na configuração do grid)
+LAYOUT_2X2 = "2x2"
+LAYOUT_3X3 = "3x3"
+LAYOUT_4X4 = "4x4"
+LAYOUT_1_PLUS_5 = "1+5"
+
+# Grid dinâmico preenchido com as câmeras mais movimentadas ("dynamic" na configuração do grid)
+DYNAMIC_HOT = "hot"
+# Segundos entre reavaliações das câmeras do grid dinâmico (padrão de "refresh")
+HOT_REFRESH_SECONDS = 5.0
+
+
+def _uniform(columns: int, rows: int) -> Tuple[int, int, Tuple[Tuple[int, int, int, int], ...]]:
+    """Layout de células iguais, em ordem de leitura."""
+    return columns, rows, tuple((column, row, 1, 1) for row in range(rows) for column in range(columns))
+
+
+# Nome -> (colunas, linhas, células como (coluna, linha, colunas ocupadas, linhas ocupadas)),
+# na ordem das câmeras do grid
+LAYOUTS: Dict[str, Tuple[int, int, Tuple[Tuple[int, int, int, int], ...]]] = {
+    LAYOUT_2X2: _uniform(2, 2),
+    LAYOUT_3X3: _uniform(3, 3),
+    LAYOUT_4X4: _uniform(4, 4),
+    # Uma câmera em destaque (2x2 células de um 3x3) e cinco pequenas em volta
+    LAYOUT_1_PLUS_5: (3, 3, ((0, 0, 2, 2), (2, 0, 1, 1), (2, 1, 1, 1), (0, 2, 1, 1), (1, 2, 1, 1), (2, 2, 1, 1))),
+}
+
+# Layouts escolhidos pelo número de câmeras em grids sem "layout", do menor para o maior
+_AUTO_LAYOUTS = (LAYOUT_2X2, LAYOUT_3X3, LAYOUT_4X4)
+
+
+def cell_count(layout: str) -> int:
+    """Número de células do layout."""
+    return len(LAYOUTS[layout][2])
+
+
+def layout_rects(layout: str, width: int, height: int) -> List[Rect]:
+    """Retângulos das células do layout numa saída width x height.
+    
+    As bordas caem em divisões inteiras da saída, então as células cobrem a
+    tela inteira sem frestas nem sobreposição (podendo diferir em 1 pixel).
+    """
+    columns, rows, cells = LAYOUTS[layout]
+    xs = [width * column // columns for column in range(columns + 1)]
+    ys = [height * row // rows for row in range(rows + 1)]
+    return [(xs[column], ys[row], xs[column + span_x] - xs[column], ys[row + span_y] - ys[row])
+            for column, row, span_x, span_y in cells]
+
+
+def default_layout(camera_count: int) -> str:
+    """Menor layout uniforme com célula para todas as câmeras (câmeras além de 16 ficam de fora)."""
+    for layout in _AUTO_LAYOUTS:
+        if camera_count <= cell_count(layout):
+            return layout
+    return _AUTO_LAYOUTS[-1]
+
+
+def is_hot_grid(grid: Dict[str, Any]) -> bool:
+    """Indica se o grid é o dinâmico de câmeras em movimento."""
+    return grid.get("dynamic") == DYNAMIC_HOT
+
+
+def grid_layout(grid: Dict[str, Any]) -> str:
+    """Layout do grid: o configurado, ou o padrão (1+5 no grid dinâmico, senão pelo número de câmeras)."""
+    layout = grid.get("layout")
+    if layout in LAYOUTS:
+        return layout
+    if is_hot_grid(grid):
+        return LAYOUT_1_PLUS_5
+    return default_layout(len(grid.get("cameras", [])))
+
+
+def rank_hot_cameras(candidates: Iterable[int], scores: Dict[int, float],
+                     last_motion_times: Dict[int, float]) -> List[int]:
+    """Ordena câmeras da mais para a menos movimentada (empate: movimento mais recente, depois índice)."""
+    return sorted(candidates, key=lambda camera: (-scores.get(camera, 0.0),
+                                                  -last_motion_times.get(camera, 0.0), camera))
+
+
+def place_hot_cameras(ranked: List[int], previous: List[int], count: int) -> List[int]:
+    """Distribui as count primeiras câmeras do ranking pelas células do grid dinâmico.
+    
+    A primeira célula (a grande no 1+5) fica com a câmera mais movimentada. As
+    demais que continuam escolhidas ficam na célula em que já estavam, para a
+    imagem não pular de lugar a cada reavaliação; as vagas são preenchidas na
+    ordem do ranking.
+    """
+    chosen = ranked[:count]
+    if not chosen:
+        return []
+    cells = [None] * len(chosen)
+    cells[0] = chosen[0]
+    for cell, camera in enumerate(previous[:len(chosen)]):
+        if cell > 0 and camera != chosen[0] and camera in chosen:
+            cells[cell] = camera
+    placed = set(cells)
+    newcomers = iter([camera for camera in chosen if camera not in placed])
+    return [camera if camera is not None else next(newcomers) for camera in cells]
@@ -1,15 +1,16 @@
 """Aplicação principal do DVR Camera Mosaic Viewer."""
+import multiprocessing
 import tkinter as tk
 from tkinter import messagebox
-import cv2
-import numpy as np
 import time
 import sys
 import os
-from PIL import Image, ImageTk
 from config_manager import ConfigManager
 from stream_manager import StreamManager
+from stream_watchdog import STREAM_LIVE
 from display_manager import DisplayManager
+from display_backend import create_display_backend
+from compositor import Compositor
 from config_window import ConfigWindow
 
 # Ajusta path para funcionar quando empacotado como .app
@@ -47,6 +48,9 @@ class CameraViewerApp:
         print(f"CameraViewerApp: {self.stream_manager.get_stream_count()} stream(s) criado(s)")
         
         self.display_manager = DisplayManager(self.stream_manager)
+        # Composição roda em thread própria; a thread do Tk só exibe o último frame pronto
+        self.compositor = Compositor(self.display_manager, self.config_manager,
+                                     target_fps=self.config_manager.get_target_fps())
         self.config_window = None
         
         # Configura janela
@@ -60,9 +64,8 @@ class CameraViewerApp:
         else:
             self.root.geometry("1920x1080")
         
-        # Canvas para exibição de vídeo
-        self.canvas = tk.Canvas(self.root, bg='black', highlightthickness=0)
-        self.canvas.pack(fill=tk.BOTH, expand=True)
+        # Backend de exibição de vídeo (OpenGL quando disponível, Tk como fallback)
+        self.display_backend = create_display_backend(self.config_manager.get_display_backend(), self.root)
         
         # Tela de loading
         self.loading_canvas = None
@@ -71,37 +74,40 @@ class CameraViewerApp:
         self.loading_animation_id = None
         self._show_loading_screen()
         
-        # Barra de progresso (2px de altura na parte inferior)
-        self.progress_bar_id = None
-        
         # Bind hotkeys
         self.root.bind('<Key-c>', self._open_config)
         self.root.bind('<Key-C>', self._open_config)
         self.root.bind('<Key-q>', self._quit_app)
         self.root.bind('<Key-Q>', self._quit_app)
-        self.root.bind('<Key-1>', lambda e: self._switch_to_grid(0))
-        self.root.bind('<Key-2>', lambda e: self._switch_to_grid(1))
-        self.root.bind('<Key-3>', lambda e: self._switch_to_grid(2))
-        self.root.bind('<Key-4>', lambda e: self._switch_to_grid(3))
+        for number in range(1, 10):
+            self.root.bind(f'<Key-{number}>', lambda e, index=number - 1: self._switch_to_grid(index))
         self.root.bind('<Key-a>', self._toggle_auto_mode)
         self.root.bind('<Key-A>', self._toggle_auto_mode)
         self.root.bind('<Key-f>', self._toggle_fullscreen)
         self.root.bind('<Key-F>', self._toggle_fullscreen)
+        self.root.bind('<Key-s>', self._print_stats)
+        self.root.bind('<Key-S>', self._print_stats)
+        self.root.bind('<Escape>', self._restore_grid)
+        self.display_backend.widget.bind('<Button-1>', self._on_canvas_click)
+        self.display_backend.widget.bind('<Configure>', self._on_video_resize)
+        self._resize_after_id = None
         self.root.focus_set()  # Garante que a janela receba eventos de teclado
         
-        # Modo automático ativado por padrão
-        self.auto_mode = True
-        
         # Variáveis de controle
         self.running = False
-        self.last_frame_time = 0
-        self.target_fps = 25
-        self.frame_interval = 1.0 / self.target_fps
-        self.wait_for_all_frames = True
         
         # Inicia carregamento assíncrono
         self.root.after(100, self._start_loading)
     
+    @property
+    def auto_mode(self) -> bool:
+        """Modo automático (rotação de grids), mantido pelo compositor."""
+        return self.compositor.auto_mode
+    
+    @auto_mode.setter
+    def auto_mode(self, value: bool) -> None:
+        self.compositor.auto_mode = value
+    
     def _show_loading_screen(self):
         """Mostra tela de loading."""
         self.loading_canvas = tk.Canvas(self.root, bg='black', highlightthickness=0)
@@ -226,10 +232,38 @@ class CameraViewerApp:
             )
     
     def _check_connections(self):
-        """Verifica conexões de forma assíncrona."""
+        """Verifica conexões de forma assíncrona.
+        
+        Cada stream conecta em paralelo na sua própria thread, com timeouts do
+        FFmpeg e backoff entre falhas. O loading termina quando todos
+        conectaram ou quando todos já tiveram ao menos uma tentativa concluída
+        (ou estão num DVR que não responde ao probe) e algum conectou; as
+        câmeras restantes continuam tentando em segundo plano.
+        """
         total_streams = self.stream_manager.get_stream_count()
-        connected_count = sum(1 for i in range(total_streams) 
-                            if self.stream_manager.streams[i].is_connected())
+        stats = self.stream_manager.get_connection_stats()
+        connected_count = sum(1 for s in stats.values() if s["connected"])
+        # Stream "resolvido": conectou, já falhou pelo menos uma vez ou o DVR inteiro está fora
+        resolved_count = sum(1 for s in stats.values()
+                             if s["connected"] or s["attempts"] > 0 or s["host_reachable"] is False)
+        
+        if total_streams > 0 and connected_count == total_streams:
+            self._print_connection_summary(stats)
+            self._finish_loading()
+            return
+        
+        if total_streams > 0 and resolved_count == total_streams:
+            if connected_count > 0:
+                failed_streams = [i for i, s in stats.items() if not s["connected"]]
+                print(f"DEBUG: Streams não conectados (seguem tentando): {failed_streams}")
+                self._print_connection_summary(stats)
+                self._finish_loading()
+                return
+            
+            # Nenhuma conectou ainda: mostra erro, mas continua verificando
+            self._show_connection_error()
+            self.root.after(1000, self._check_connections)
+            return
         
         progress = connected_count / total_streams if total_streams > 0 else 0
         
@@ -238,34 +272,15 @@ class CameraViewerApp:
             f"Conectando às câmeras... {connected_count}/{total_streams}",
             progress
         )
-        
-        # Log periódico para debug
-        if connected_count == 0 and total_streams > 0:
-            # Se nenhuma câmera conectou ainda, mostra mais detalhes
-            failed_streams = []
-            for i in range(total_streams):
-                if not self.stream_manager.streams[i].is_connected():
-                    failed_streams.append(i)
-            if len(failed_streams) > 0 and len(failed_streams) <= 4:
-                print(f"DEBUG: Streams não conectados: {failed_streams}")
-        
-        # Verifica se todos estão conectados
-        if connected_count == total_streams and total_streams > 0:
-            # Todos conectados, finaliza loading
-            self.root.after(500, self._finish_loading)  # Aguarda 0.5s para estabilizar
-        else:
-            # Continua verificando (com timeout máximo de 60 segundos)
-            elapsed = time.time() - self.loading_start_time if hasattr(self, 'loading_start_time') else 0
-            if elapsed < 60:  # Timeout de 60 segundos
-                self.root.after(500, self._check_connections)
-            else:
-                print(f"DEBUG: Timeout - Apenas {connected_count}/{total_streams} câmeras conectadas após 60s")
-                # Continua mesmo assim se pelo menos algumas conectaram
-                if connected_count > 0:
-                    self.root.after(500, self._finish_loading)
-                else:
-                    # Nenhuma conectou, mostra erro
-                    self._show_connection_error()
+        self.root.after(200, self._check_connections)
+    
+    def _print_connection_summary(self, stats):
+        """Mostra tempo até o primeiro frame de cada câmera."""
+        elapsed = time.time() - self.loading_start_time if hasattr(self, 'loading_start_time') else 0
+        times = [s["time_to_first_frame"] for s in stats.values() if s["time_to_first_frame"] is not None]
+        if times:
+            print(f"Conexão: {len(times)}/{len(stats)} câmeras em {elapsed:.2f}s "
+                  f"(primeiro frame: mín {min(times):.2f}s, máx {max(times):.2f}s)")
     
     def _finish_loading(self):
         """Finaliza carregamento e inicia exibição."""
@@ -274,19 +289,36 @@ class CameraViewerApp:
             self.loading_canvas.destroy()
             self.loading_canvas = None
         
-        # Inicializa display manager
-        self.display_manager.reset(self.config_manager)
-        
-        # Garante que o timer do grid atual está inicializado para modo automático
-        if self.auto_mode:
-            self.display_manager.current_grid_start_time = time.time()
+        # Inicializa display manager já no tamanho da área de vídeo
+        self.root.update_idletasks()
+        width, height = self.display_backend.get_size()
+        with self.compositor.lock:
+            self.display_manager.resize_output(width, height)
+            self.display_manager.reset(self.config_manager)
+            
+            # Garante que o timer do grid atual está inicializado para modo automático
+            if self.auto_mode:
+                self.display_manager.current_grid_start_time = time.time()
         
-        # Inicia loop de exibição
-        self.running = True
-        self._update_display()
+        # Inicia composição em thread própria (a exibição já está rodando desde run())
+        self.compositor.start()
         
         print("Aplicação pronta!")
     
+    def _on_video_resize(self, event):
+        """Área de vídeo mudou de tamanho: recompõe no tamanho novo (com debounce)."""
+        if self._resize_after_id is not None:
+            self.root.after_cancel(self._resize_after_id)
+        self._resize_after_id = self.root.after(100, self._apply_video_size)
+    
+    def _apply_video_size(self):
+        """Ajusta o DisplayManager ao tamanho atual da área de vídeo."""
+        self._resize_after_id = None
+        width, height = self.display_backend.get_size()
+        with self.compositor.lock:
+            if self.display_manager.resize_output(width, height):
+                print(f"Área de vídeo: {width}x{height}")
+    
     def _open_config(self, event=None):
         """Abre janela de configuração."""
         if self.config_window and self.config_window.window and self.config_window.window.winfo_exists():
@@ -328,129 +360,102 @@ class CameraViewerApp:
             print("Modo fullscreen ATIVADO")
     
     def _switch_to_grid(self, grid_index: int):
-        """Troca para grid específico com fade (teclas 1, 2, 3, 4)."""
+        """Troca para grid específico com fade (teclas 1 a 9)."""
         grids = self.config_manager.get_grids()
         if grid_index < len(grids):
             # Desativa modo automático quando troca manualmente
-            if self.auto_mode:
-                self.auto_mode = False
-                print("Modo automático desativado (pressione A para reativar)")
-            self.display_manager.switch_to_grid(grid_index, self.config_manager)
+            with self.compositor.lock:
+                if self.auto_mode:
+                    self.auto_mode = False
+                    print("Modo automático desativado (pressione A para reativar)")
+                self.display_manager.restore_grid()
+                self.display_manager.switch_to_grid(grid_index, self.config_manager)
             print(f"Trocando para grid {grid_index + 1}: {grids[grid_index].get('name', f'Grid {grid_index + 1}')}")
     
+    def _on_canvas_click(self, event):
+        """Amplia a câmera clicada (stream principal) ou volta ao grid."""
+        if self.display_manager.fullscreen_camera is not None:
+            self._restore_grid()
+            return
+        
+        width, height = self.display_backend.get_size()
+        with self.compositor.lock:
+            if self.display_manager.in_transition:
+                return
+            camera_index = self.display_manager.camera_at(event.x, event.y, width, height, self.config_manager)
+            if camera_index is not None:
+                self.display_manager.enlarge_camera(camera_index)
+        if camera_index is not None:
+            print(f"Câmera {camera_index} ampliada (clique ou ESC para voltar ao grid)")
+    
+    def _restore_grid(self, event=None):
+        """Volta da câmera ampliada para o grid (ESC)."""
+        if self.display_manager.fullscreen_camera is not None:
+            with self.compositor.lock:
+                self.display_manager.restore_grid()
+            print("Voltando ao grid")
+    
     def _toggle_auto_mode(self, event=None):
         """Ativa/desativa modo automático (tecla A)."""
-        self.auto_mode = not self.auto_mode
+        with self.compositor.lock:
+            self.auto_mode = not self.auto_mode
+            if self.auto_mode:
+                # Reseta timer do grid atual para começar contagem
+                self.display_manager.current_grid_start_time = time.time()
         if self.auto_mode:
             print("Modo automático ATIVADO - Rotação a cada 15s")
-            # Reseta timer do grid atual para começar contagem
-            self.display_manager.current_grid_start_time = time.time()
         else:
-            print("Modo automático DESATIVADO - Use teclas 1, 2, 3, 4 para trocar")
+            print("Modo automático DESATIVADO - Use teclas 1 a 9 para trocar")
     
     def _quit_app(self, event=None):
         """Sai da aplicação (tecla Q)."""
         print("Saindo da aplicação...")
         self.stop()
     
-    def _draw_progress_bar(self, canvas_width: int, canvas_height: int):
-        """Desenha barra de progresso de 2px na parte inferior."""
-        grids = self.config_manager.get_grids()
-        if not grids:
-            return
-        
-        current_grid = grids[self.display_manager.current_grid_index]
-        display_time = current_grid.get("display_time", 15)
-        elapsed = time.time() - self.display_manager.current_grid_start_time
-        
-        # Calcula progresso (0.0 a 1.0)
-        progress = min(elapsed / display_time, 1.0)
-        
-        # Desenha barra de progresso (2px de altura, da esquerda para direita)
-        bar_height = 2
-        bar_y = canvas_height - bar_height
-        bar_width = int(canvas_width * progress)
-        
-        # Cor da barra (branco)
-        self.canvas.create_rectangle(0, bar_y, bar_width, canvas_height, 
-                                   fill='white', outline='', tags='progress_bar')
+    def _print_stats(self, event=None):
+        """Mostra estatísticas de tempo do compositor (tecla S)."""
+        stats = self.compositor.get_stats()
+        print(f"Compositor: {stats['fps']:.1f}/{stats['target_fps']} fps, "
+              f"composição {stats['compose_ms_avg']:.1f} ms (máx {stats['compose_ms_max']:.1f} ms), "
+              f"jitter {stats['jitter_ms_avg']:.1f} ms (máx {stats['jitter_ms_max']:.1f} ms), "
+              f"{stats['missed']} prazos perdidos, {stats['dropped']}/{stats['published']} descartados")
+        
+        motion = self.stream_manager.motion
+        if motion.running:
+            print(f"Movimento: {1.0 / motion.interval:.1f} análises/s, {motion.cpu_load * 100:.1f}% de CPU")
+        
+        # Câmeras que não estão ao vivo (imagem congelada ou sem conexão)
+        connection_stats = self.stream_manager.get_connection_stats()
+        for camera_index in sorted(connection_stats):
+            state = self.stream_manager.get_stream_state(camera_index)
+            if state != STREAM_LIVE:
+                print(f"  Câmera {camera_index}: {state} ({connection_stats[camera_index]['fps']:.1f} fps medido)")
     
     def _on_config_saved(self):
         """Callback quando configuração é salva."""
-        # Recarrega streams
-        self.stream_manager.reload()
-        time.sleep(1)
-        
-        # Reseta display manager
-        self.display_manager.reset(self.config_manager)
+        with self.compositor.lock:
+            # Recarrega streams (só os canais alterados reconectam)
+            self.stream_manager.reload()
+            
+            # Reseta display manager
+            self.display_manager.reset(self.config_manager)
+            self.compositor.set_target_fps(self.config_manager.get_target_fps())
     
     def _update_display(self):
-        """Atualiza exibição de vídeo."""
+        """Exibe o último frame composto pelo compositor, se houver um novo."""
         if not self.running:
             return
         
-        current_time = time.time()
-        
-        # Controla FPS
-        if current_time - self.last_frame_time < self.frame_interval:
-            self.root.after(10, self._update_display)
-            return
-        
-        self.last_frame_time = current_time
-        
-        # Atualiza transição se em progresso
-        if self.display_manager.in_transition:
-            transition_complete = self.display_manager.update_transition(self.config_manager)
-            if transition_complete:
-                # Verifica se há troca manual de grid pendente
-                if hasattr(self.display_manager, '_target_grid_index'):
-                    self.display_manager._apply_grid_switch(self.config_manager)
-                else:
-                    # Rotação automática - finaliza transição e reseta timer
-                    self.display_manager.rotate_to_next_grid(self.config_manager)
-                    # Garante que a transição foi finalizada
-                    self.display_manager.in_transition = False
-                    self.display_manager.transition_alpha = 0.0
-        else:
-            # Verifica se deve rotacionar grid automaticamente (só se modo automático ativo)
-            if self.auto_mode:
-                if self.display_manager.should_rotate(self.config_manager):
-                    self.display_manager.start_transition()
-        
-        # Renderiza frame (aguarda todos os frames estarem prontos)
-        frame = self.display_manager.render_frame(self.config_manager, wait_for_all=self.wait_for_all_frames)
-        
-        # Se todos os frames estão prontos, pode desabilitar espera
-        if frame is not None and self.wait_for_all_frames:
-            self.wait_for_all_frames = False
+        latest = self.compositor.mailbox.take()
+        if latest is not None:
+            frame, progress, dirty = latest
+            # Backend recebe o frame BGR e cuida de cor, escala e barra de progresso;
+            # só as regiões alteradas (dirty) são reenviadas
+            self.display_backend.present(frame, progress, dirty)
         
-        if frame is not None:
-            # Converte BGR para RGB para Tkinter
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Redimensiona para tamanho do canvas
-            canvas_width = self.canvas.winfo_width()
-            canvas_height = self.canvas.winfo_height()
-            
-            if canvas_width > 1 and canvas_height > 1:
-                frame_resized = cv2.resize(frame_rgb, (canvas_width, canvas_height))
-                
-                # Converte para ImageTk
-                image = Image.fromarray(frame_resized)
-                photo = ImageTk.PhotoImage(image=image)
-                
-                # Atualiza canvas
-                self.canvas.delete("all")
-                self.canvas.create_image(canvas_width // 2, canvas_height // 2, 
-                                       image=photo, anchor=tk.CENTER)
-                self.canvas.image = photo  # Mantém referência
-                
-                # Desenha barra de progresso se modo automático ativo
-                if self.auto_mode and not self.display_manager.in_transition:
-                    self._draw_progress_bar(canvas_width, canvas_height)
-        
-        # Agenda próxima atualização
-        self.root.after(10, self._update_display)
+        # Agenda próxima atualização para quando o próximo frame estiver pronto
+        delay_ms = max(int(self.compositor.next_frame_delay() * 1000) + 1, 1)
+        self.root.after(delay_ms, self._update_display)
     
     def run(self):
         """Inicia aplicação."""
@@ -461,7 +466,9 @@ class CameraViewerApp:
     def stop(self):
         """Para aplicação."""
         self.running = False
+        self.compositor.stop()
         self.stream_manager.stop_all()
+        self.display_backend.close()
         self.root.quit()
 
 
@@ -478,4 +485,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Necessário para os processos de captura no executável empacotado
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,169 @@
+"""Detecção de movimento barata sobre cópias minúsculas dos frames, com nota de atividade por câmera."""
+import threading
+import time
+from typing import Optional, Dict, Any
+import cv2
+import numpy as np
+
+
+class _CameraMotion:
+    """Estado de análise de um stream: último frame reduzido e nota de atividade."""
+    
+    def __init__(self, width: int, height: int):
+        self.small = np.empty((height, width, 3), dtype=np.uint8)
+        self.gray = np.empty((height, width), dtype=np.uint8)
+        self.previous = np.empty((height, width), dtype=np.uint8)
+        self.diff = np.empty((height, width), dtype=np.uint8)
+        self.has_previous = False
+        self.seq = 0
+        self.score = 0.0
+        self.changed = 0.0            # Fração de pixels alterados na última comparação
+        self.last_motion_time = 0.0   # Último instante com movimento acima de min_area
+        self.last_update = 0.0
+
+
+class MotionAnalyzer:
+    """Compara frames consecutivos de cada câmera em 160x90 tons de cinza.
+    
+    Roda numa thread própria ao lado das threads de captura, lendo o frame
+    mais recente de cada stream por empréstimo (sem cópia) e só quando a
+    câmera publicou frame novo. A amostragem, a diferença absoluta e a contagem
+    de pixels alterados são operações vetorizadas do OpenCV sobre buffers
+    pré-alocados. A nota de atividade (0.0 a 1.0) sobe na hora com movimento
+    e decai devagar (meia-vida decay_seconds).
+    
+    Orçamento de CPU: se uma passada sobre todas as câmeras custar mais que
+    cpu_budget do intervalo, o intervalo aumenta até caber; volta ao rate
+    configurado quando sobra tempo.
+    """
+    
+    # Tamanho das cópias analisadas
+    WIDTH = 160
+    HEIGHT = 90
+    # Fração de pixels alterados que corresponde à nota máxima
+    FULL_ACTIVITY = 0.05
+    # Menor meia-vida da nota (evita divisão por zero em get_scores)
+    MIN_DECAY_SECONDS = 0.1
+    
+    def __init__(self, stream_manager, config: Dict[str, Any]):
+        self.stream_manager = stream_manager
+        self._cameras: Dict[Any, _CameraMotion] = {}
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self.pass_time_avg = 0.0  # Duração média de uma passada (segundos)
+        self.configure(config)
+        self.interval = 1.0 / self.rate
+    
+    def configure(self, config: Dict[str, Any]) -> None:
+        """Aplica taxa, orçamento e sensibilidade (motion.* na configuração)."""
+        self.rate = max(float(config["rate"]), 0.1)
+        self.cpu_budget = config["cpu_budget"]
+        self.threshold = config["threshold"]
+        self.min_area = config["min_area"]
+        decay_seconds = float(config["decay_seconds"])
+        self.decay_seconds = decay_seconds if decay_seconds >= self.MIN_DECAY_SECONDS else self.MIN_DECAY_SECONDS
+    
+    def start(self) -> None:
+        """Inicia thread de análise."""
+        if self.running:
+            return
+        self.running = True
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def stop(self) -> None:
+        """Para thread de análise."""
+        self.running = False
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+    
+    @property
+    def cpu_load(self) -> float:
+        """Fração de um núcleo usada pela análise (média)."""
+        return self.pass_time_avg / self.interval if self.interval > 0 else 0.0
+    
+    def get_scores(self) -> Dict[int, float]:
+        """Retorna nota de atividade atual (0.0 a 1.0) de cada câmera."""
+        now = time.time()
+        return {camera_index: self._decayed(self._cameras.get(stream), now)
+                for camera_index, stream in self.stream_manager.streams.items()}
+    
+    def get_last_motion_times(self) -> Dict[int, float]:
+        """Retorna o último instante com movimento de cada câmera (0 = nunca)."""
+        result = {}
+        for camera_index, stream in self.stream_manager.streams.items():
+            camera = self._cameras.get(stream)
+            result[camera_index] = camera.last_motion_time if camera is not None else 0.0
+        return result
+    
+    def _decayed(self, camera: Optional[_CameraMotion], now: float) -> float:
+        """Nota da câmera com o decaimento desde a última atualização."""
+        if camera is None:
+            return 0.0
+        return camera.score * 0.5 ** ((now - camera.last_update) / self.decay_seconds)
+    
+    def analyze(self, stream, camera: _CameraMotion, now: float) -> None:
+        """Compara o frame atual do stream com o anterior e atualiza a nota."""
+        seq = stream.frame_seq
+        if seq == camera.seq:
+            return
+        view = stream.borrow_frame()
+        if view is None:
+            return
+        with view:
+            if view.frame.size == 0:
+                return
+            camera.seq = view.seq
+            # Amostra um pixel por bloco: só ~90 linhas do frame são lidas da memória
+            # (INTER_AREA sobre o frame inteiro lê tudo e custa 20x mais)
+            frame = view.frame
+            step = max(min(frame.shape[0] // self.HEIGHT, frame.shape[1] // self.WIDTH), 1)
+            cv2.resize(frame[::step, ::step], (self.WIDTH, self.HEIGHT), dst=camera.small,
+                       interpolation=cv2.INTER_NEAREST)
+        cv2.cvtColor(camera.small, cv2.COLOR_BGR2GRAY, dst=camera.gray)
+        # Suaviza o ruído do sensor que a amostragem não tirou (barato em 160x90)
+        cv2.GaussianBlur(camera.gray, (3, 3), 0, dst=camera.gray)
+        
+        if camera.has_previous:
+            cv2.absdiff(camera.gray, camera.previous, dst=camera.diff)
+            cv2.threshold(camera.diff, self.threshold, 255, cv2.THRESH_BINARY, dst=camera.diff)
+            changed = cv2.countNonZero(camera.diff) / float(self.WIDTH * self.HEIGHT)
+            camera.changed = changed
+            instant = min(changed / self.FULL_ACTIVITY, 1.0) if changed >= self.min_area else 0.0
+            camera.score = max(instant, self._decayed(camera, now))
+            camera.last_update = now
+            if instant > 0:
+                camera.last_motion_time = now
+        
+        camera.gray, camera.previous = camera.previous, camera.gray
+        camera.has_previous = True
+    
+    def _run(self) -> None:
+        """Loop de análise, a rate passadas por segundo dentro do orçamento de CPU."""
+        while self.running:
+            start = time.monotonic()
+            now = time.time()
+            streams = list(self.stream_manager.streams.values())
+            for stream in streams:
+                camera = self._cameras.get(stream)
+                if camera is None:
+                    camera = _CameraMotion(self.WIDTH, self.HEIGHT)
+                    self._cameras[stream] = camera
+                try:
+                    self.analyze(stream, camera, now)
+                except Exception as e:
+                    print(f"Movimento: erro ao analisar stream {stream.stream_id} - {type(e).__name__}: {e}")
+            
+            # Esquece streams removidos por uma recarga
+            if len(self._cameras) > len(streams):
+                current = set(streams)
+                self._cameras = {stream: camera for stream, camera in self._cameras.items() if stream in current}
+            
+            elapsed = time.monotonic() - start
+            self.pass_time_avg += (elapsed - self.pass_time_avg) * 0.1
+            # Intervalo mínimo que mantém a análise dentro do orçamento
+            self.interval = max(1.0 / self.rate, self.pass_time_avg / self.cpu_budget if self.cpu_budget > 0 else 0.0)
+            self._stop_event.wait(max(self.interval - elapsed, 0.0))
@@ -0,0 +1,590 @@
+"""Captura em processos separados: grupos de streams decodificados fora do processo da UI."""
+import multiprocessing
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Dict, List, Tuple, Any
+import cv2
+import numpy as np
+from frame_slots import FrameView
+from backoff import Backoff
+
+# Processos de captura usam spawn: fork de um processo com Tk e threads não é seguro
+_MP_CONTEXT = multiprocessing.get_context("spawn")
+
+
+class SharedFrameRing:
+    """Anel de slots de frame em memória compartilhada, com a interface de FrameSlots.
+    
+    O processo de captura escreve e publica; o processo principal empresta o
+    último frame como vista somente leitura direto da memória compartilhada,
+    sem copiar. Índice mais recente, sequência, empréstimos (pins), tamanho e
+    timestamp de cada slot ficam num cabeçalho protegido por um lock entre
+    processos; os pixels são escritos fora do lock, em slots que ninguém
+    está lendo. Frames maiores que o slot são reduzidos para caber.
+    """
+    
+    def __init__(self, shm: shared_memory.SharedMemory, lock, num_slots: int,
+                 max_width: int, max_height: int):
+        self.shm = shm
+        self._lock = lock
+        self.num_slots = num_slots
+        self.max_width = max_width
+        self.max_height = max_height
+        self.slot_bytes = max_width * max_height * 3
+        # Cabeçalho: [mais recente, sequência, pins[n], alturas[n], larguras[n], sequências[n]]
+        self._header = np.ndarray((2 + 4 * num_slots,), dtype=np.int64, buffer=shm.buf)
+        self._timestamps = np.ndarray((num_slots,), dtype=np.float64, buffer=shm.buf,
+                                      offset=self._header.nbytes)
+        self._data = np.ndarray((num_slots, self.slot_bytes), dtype=np.uint8, buffer=shm.buf,
+                                offset=self._header.nbytes + self._timestamps.nbytes)
+        self._pins = 2
+        self._heights = 2 + num_slots
+        self._widths = 2 + 2 * num_slots
+        self._seqs = 2 + 3 * num_slots
+        self._next_index = 0
+        # Empréstimos vivos neste processo: close() só desmapeia com zero (ler vista desmapeada derruba o Python)
+        self._borrows = 0
+        self._borrows_lock = threading.Lock()
+    
+    @classmethod
+    def create(cls, num_slots: int, max_width: int, max_height: int) -> "SharedFrameRing":
+        """Cria anel novo (processo principal)."""
+        size = (2 + 4 * num_slots) * 8 + num_slots * 8 + num_slots * max_width * max_height * 3
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        ring = cls(shm, _MP_CONTEXT.Lock(), num_slots, max_width, max_height)
+        ring._header[:] = 0
+        ring._header[0] = -1
+        return ring
+    
+    @classmethod
+    def attach(cls, name: str, lock, num_slots: int, max_width: int, max_height: int) -> "SharedFrameRing":
+        """Mapeia anel criado pelo processo principal (processo de captura)."""
+        return cls(shared_memory.SharedMemory(name=name), lock, num_slots, max_width, max_height)
+    
+    def describe(self) -> Tuple:
+        """Argumentos de attach() para o processo filho."""
+        return self.shm.name, self._lock, self.num_slots, self.max_width, self.max_height
+    
+    @property
+    def seq(self) -> int:
+        """Sequência do último frame publicado (0 = nenhum)."""
+        header = self._header
+        return int(header[1]) if header is not None else 0
+    
+    @property
+    def latest_timestamp(self) -> float:
+        """Timestamp do último frame publicado (0 = nenhum)."""
+        header = self._header
+        if header is None or header[0] < 0:
+            return 0.0
+        return float(self._timestamps[header[0]])
+    
+    def _slot_view(self, index: int, height: int, width: int) -> np.ndarray:
+        """Vista (altura, largura, 3) sobre os bytes de um slot."""
+        return self._data[index, :height * width * 3].reshape(height, width, 3)
+    
+    def acquire_write(self) -> Tuple[int, Optional[np.ndarray]]:
+        """Retorna (índice, buffer) livre para o próximo frame.
+        
+        O buffer tem o tamanho do último frame escrito no slot (None no
+        primeiro uso). Se todos os slots livres estão emprestados, retorna
+        (-1, None) e o próximo publish() descarta o frame.
+        """
+        with self._lock:
+            latest_index = int(self._header[0])
+            for offset in range(self.num_slots):
+                index = (self._next_index + offset) % self.num_slots
+                if index != latest_index and self._header[self._pins + index] == 0:
+                    self._next_index = (index + 1) % self.num_slots
+                    height = int(self._header[self._heights + index])
+                    width = int(self._header[self._widths + index])
+                    if height == 0:
+                        return index, None
+                    return index, self._slot_view(index, height, width)
+        return -1, None
+    
+    def publish(self, index: int, frame: np.ndarray, timestamp: float) -> int:
+        """Copia frame para o slot (se não foi escrito nele) e o publica; retorna a sequência."""
+        if index < 0:
+            return self.seq
+        
+        height, width = frame.shape[:2]
+        if width > self.max_width or height > self.max_height:
+            # Maior que o slot: reduz mantendo a proporção
+            scale = min(self.max_width / width, self.max_height / height)
+            size = (max(int(width * scale), 1), max(int(height * scale), 1))
+            height, width = size[1], size[0]
+            cv2.resize(frame, size, dst=self._slot_view(index, height, width), interpolation=cv2.INTER_AREA)
+        else:
+            target = self._slot_view(index, height, width)
+            if frame.ctypes.data != target.ctypes.data:
+                np.copyto(target, frame)
+        
+        with self._lock:
+            header = self._header
+            header[self._heights + index] = height
+            header[self._widths + index] = width
+            self._timestamps[index] = timestamp
+            header[1] += 1
+            header[self._seqs + index] = header[1]
+            header[0] = index
+            return int(header[1])
+    
+    def borrow(self) -> Optional[FrameView]:
+        """Empresta o último frame publicado (somente leitura, sem cópia), ou None."""
+        with self._borrows_lock:
+            header, data = self._header, self._data
+            if header is None:
+                return None
+            # Reserva o mapeamento antes de tocar na memória
+            self._borrows += 1
+        
+        # Timeout: um processo de captura que morreu segurando o lock não trava a UI
+        if not self._lock.acquire(timeout=0.1):
+            self._end_borrow()
+            return None
+        try:
+            index = int(header[0])
+            if index >= 0:
+                height = int(header[self._heights + index])
+                width = int(header[self._widths + index])
+                seq = int(header[self._seqs + index])
+                timestamp = float(self._timestamps[index])
+                header[self._pins + index] += 1
+        finally:
+            self._lock.release()
+        if index < 0:
+            self._end_borrow()
+            return None
+        
+        view = data[index, :height * width * 3].reshape(height, width, 3)
+        view.flags.writeable = False
+        return FrameView(view, seq, timestamp, self, index)
+    
+    def release(self, index: int) -> None:
+        """Libera um slot emprestado."""
+        header = self._header
+        if header is not None and self._lock.acquire(timeout=0.1):
+            try:
+                if header[self._pins + index] > 0:
+                    header[self._pins + index] -= 1
+            finally:
+                self._lock.release()
+        self._end_borrow()
+    
+    def _end_borrow(self) -> None:
+        """Desconta um empréstimo deste processo."""
+        with self._borrows_lock:
+            if self._borrows > 0:
+                self._borrows -= 1
+    
+    def clear(self) -> None:
+        """Descarta o frame publicado (buffers emprestados continuam válidos)."""
+        with self._lock:
+            self._header[0] = -1
+    
+    def close(self, unlink: bool = False) -> bool:
+        """Desmapeia o anel (e remove o nome, se unlink). Retorna False se ainda há vistas em uso.
+        
+        Com frames emprestados (FrameView não liberado) nada é desmapeado: o
+        chamador tenta de novo depois. O nome pode ser removido antes, porque
+        o mapeamento continua válido para quem já o tem.
+        """
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+        with self._borrows_lock:
+            if self._borrows > 0:
+                return False
+            self._header = self._timestamps = self._data = None
+        try:
+            self.shm.close()
+            return True
+        except BufferError:
+            # Algum frame emprestado ainda referencia a memória: tenta de novo depois
+            return False
+
+
+def _worker_main(specs: List[Tuple[int, Dict[str, Any]]], rings: List[Tuple], options: Dict[str, Any],
+                 commands, status) -> None:
+    """Processo de captura de um grupo de streams (roda no processo filho)."""
+    # Importado aqui: stream_manager importa este módulo
+    from stream_manager import StreamCapture, PROFILE_SUB, apply_ffmpeg_capture_options
+    from dvr_host import DVRHost
+    
+    apply_ffmpeg_capture_options(options["transport"])
+    host = DVRHost(*options["host"])
+    streams = []
+    for (stream_id, spec), ring_args in zip(specs, rings):
+        rtsp_url, alt_url = spec["profile_urls"][PROFILE_SUB]
+        streams.append(StreamCapture(rtsp_url, stream_id, alt_url=alt_url,
+                                     profile_urls=spec["profile_urls"], profile=PROFILE_SUB,
+                                     open_timeout_ms=options["open_timeout_ms"],
+                                     read_timeout_ms=options["read_timeout_ms"],
+                                     host=host, decoder=spec["decoder"],
+                                     slots=SharedFrameRing.attach(*ring_args)))
+    
+    host.start()
+    for stream in streams:
+        stream.start()
+    
+    parent = multiprocessing.parent_process()
+    last_status = 0.0
+    while parent is None or parent.is_alive():
+        try:
+            op, index, value = commands.get(timeout=0.5)
+        except queue.Empty:
+            op = None
+        
+        if op == "stop":
+            break
+        elif op == "demand":
+            streams[index].set_demand(value)
+        elif op == "profile":
+            streams[index].set_profile(value)
+        elif op == "output_size":
+            streams[index].set_output_size(value)
+        elif op == "stream_id":
+            streams[index].stream_id = value
+        elif op == "reconnect":
+            streams[index].force_reconnect()
+        
+        now = time.time()
+        if now - last_status >= CaptureWorker.STATUS_INTERVAL:
+            last_status = now
+            try:
+                status.put_nowait([stream.get_connection_stats() for stream in streams])
+            except queue.Full:
+                pass
+    
+    for stream in streams:
+        stream.stop()
+    host.stop()
+
+
+class ProcessStreamProxy:
+    """Stream capturado num processo filho, visto do processo principal.
+    
+    Expõe a interface de StreamCapture usada por StreamManager e
+    DisplayManager: frames vêm do anel em memória compartilhada e
+    demanda/perfil/tamanho de saída viram comandos para o processo.
+    """
+    
+    def __init__(self, worker: "CaptureWorker", index: int, stream_id: int, spec: Dict[str, Any]):
+        self.worker = worker
+        self.index = index
+        self.stream_id = stream_id
+        self.profile_urls = spec["profile_urls"]
+        self.decoder = spec["decoder"]
+        self.history = None  # Histórico de frames não é suportado neste modo
+        self.stats: Dict[str, Any] = {}
+        # Último valor enviado de cada comando (reenviados se o processo reiniciar)
+        self._state: Dict[str, Any] = {}
+    
+    @property
+    def ring(self) -> Optional[SharedFrameRing]:
+        rings = self.worker.rings
+        return rings[self.index] if rings else None
+    
+    def start(self) -> None:
+        """Sem efeito: o processo do grupo controla o ciclo de vida."""
+        pass
+    
+    def stop(self) -> None:
+        """Sem efeito: o processo do grupo controla o ciclo de vida."""
+        pass
+    
+    def get_frame(self) -> Optional[np.ndarray]:
+        """Obtém cópia do frame mais recente."""
+        view = self.borrow_frame()
+        if view is None:
+            return None
+        with view:
+            return view.frame.copy()
+    
+    @property
+    def frame_seq(self) -> int:
+        ring = self.ring
+        return ring.seq if ring is not None else 0
+    
+    @property
+    def last_frame_time(self) -> float:
+        ring = self.ring
+        return ring.latest_timestamp if ring is not None else 0.0
+    
+    @property
+    def connected(self) -> bool:
+        return bool(self.stats.get("connected", False))
+    
+    @property
+    def connection_attempts(self) -> int:
+        return self.stats.get("attempts", 0)
+    
+    def borrow_frame(self) -> Optional[FrameView]:
+        """Empresta o frame mais recente direto da memória compartilhada."""
+        ring = self.ring
+        return ring.borrow() if ring is not None else None
+    
+    def is_connected(self) -> bool:
+        return self.connected
+    
+    def set_demand(self, demand: str) -> None:
+        self._send("demand", demand)
+    
+    def set_profile(self, profile: str) -> None:
+        self._send("profile", profile)
+    
+    def set_output_size(self, size: Optional[Tuple[int, int]]) -> None:
+        self._send("output_size", tuple(size) if size is not None else None)
+    
+    def expected_frame_interval(self) -> float:
+        """Intervalo esperado entre frames, conforme informado pelo processo."""
+        return self.stats.get("expected_interval", 0.0)
+    
+    def force_reconnect(self) -> None:
+        """Pede ao processo para descartar e reabrir a conexão do stream."""
+        self.worker.send("reconnect", self.index, None)
+    
+    def set_stream_id(self, stream_id: int) -> None:
+        """Atualiza índice da câmera (usado nos logs do processo)."""
+        if stream_id != self.stream_id:
+            self.stream_id = stream_id
+            self.worker.send("stream_id", self.index, stream_id)
+    
+    def get_connection_stats(self) -> Dict[str, Any]:
+        """Retorna último estado de conexão informado pelo processo."""
+        stats = {"connected": False, "attempts": 0, "time_to_first_frame": None,
+                 "last_connect_duration": None, "next_retry_in": 0.0,
+                 "host_reachable": None, "decode_path": None, "fps": 0.0, "expected_interval": 0.0}
+        stats.update(self.stats)
+        return stats
+    
+    def replay(self) -> None:
+        """Reenvia demanda, perfil e tamanho de saída a um processo recém-iniciado."""
+        self.worker.send("stream_id", self.index, self.stream_id)
+        for op, value in self._state.items():
+            self.worker.send(op, self.index, value)
+    
+    def _send(self, op: str, value: Any) -> None:
+        """Envia comando ao processo se o valor mudou."""
+        if op in self._state and self._state[op] == value:
+            return
+        self._state[op] = value
+        self.worker.send(op, self.index, value)
+
+
+class CaptureWorker:
+    """Processo filho que captura os streams de um DVR."""
+    
+    # Intervalo entre relatórios de estado do processo (segundos)
+    STATUS_INTERVAL = 0.5
+    # Processo que roda por mais que isso zera o backoff de reinício (segundos)
+    STABLE_TIME = 30.0
+    
+    def __init__(self, streams: List[Tuple[int, Dict[str, Any]]], options: Dict[str, Any], num_slots: int = 3):
+        self.specs = streams
+        self.options = options
+        self.num_slots = num_slots
+        self.rings: List[SharedFrameRing] = []
+        self.process = None
+        self.commands = None
+        self.status = None
+        self.proxies = [ProcessStreamProxy(self, index, stream_id, spec)
+                        for index, (stream_id, spec) in enumerate(streams)]
+        self.backoff = Backoff(initial=1.0, maximum=30.0)
+        self.started_at = 0.0
+        self.next_restart_time = 0.0
+        self.restarts = 0
+    
+    @property
+    def name(self) -> str:
+        ip, port = self.options["host"]
+        return f"{ip}:{port}"
+    
+    def start(self) -> None:
+        """Cria anéis e filas e inicia o processo."""
+        max_width, max_height = self.options["frame_size"]
+        self.rings = [SharedFrameRing.create(self.num_slots, max_width, max_height) for _ in self.specs]
+        self.commands = _MP_CONTEXT.Queue()
+        self.status = _MP_CONTEXT.Queue(maxsize=4)
+        self.process = _MP_CONTEXT.Process(
+            target=_worker_main,
+            args=(self.specs, [ring.describe() for ring in self.rings], self.options, self.commands, self.status),
+            name=f"captura-{self.name}", daemon=True)
+        self.process.start()
+        self.started_at = time.time()
+        for proxy in self.proxies:
+            proxy.stats = {}
+            proxy.replay()
+    
+    def stop(self) -> List[SharedFrameRing]:
+        """Para o processo e retorna os anéis antigos (a fechar quando não houver empréstimos)."""
+        if self.process is not None:
+            self.send("stop", 0, None)
+            self.process.join(timeout=3.0)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(timeout=1.0)
+            self.process = None
+        rings, self.rings = self.rings, []
+        return rings
+    
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+    
+    def send(self, op: str, index: int, value: Any) -> None:
+        """Envia comando ao processo (ignorado se não está rodando)."""
+        if self.commands is not None:
+            self.commands.put((op, index, value))
+    
+    def poll_status(self) -> None:
+        """Lê relatórios de estado pendentes do processo."""
+        if self.status is None:
+            return
+        while True:
+            try:
+                report = self.status.get_nowait()
+            except queue.Empty:
+                return
+            for proxy, stats in zip(self.proxies, report):
+                proxy.stats = stats
+
+
+class ProcessCapturePool:
+    """Mantém um processo de captura por DVR e reinicia os que morrerem.
+    
+    Um supervisor em thread do processo principal lê o estado dos processos
+    e, se um deles cai, recria seus anéis e o reinicia com backoff,
+    reenviando demanda, perfil e tamanho de saída de cada stream.
+    """
+    
+    # Intervalo de verificação do supervisor (segundos)
+    SUPERVISE_INTERVAL = 0.5
+    
+    def __init__(self):
+        self.workers: List[Tuple[Tuple, CaptureWorker]] = []
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self._retired: List[SharedFrameRing] = []
+    
+    @staticmethod
+    def _group_key(streams: List[Tuple[int, Dict[str, Any]]], options: Dict[str, Any]) -> Tuple:
+        """Identidade de um grupo: mesmos canais, URLs, decoder e opções."""
+        channels = tuple((spec["key"], tuple(sorted(spec["profile_urls"].items())),
+                          tuple(sorted(spec["decoder"].items()))) for _, spec in streams)
+        return channels, tuple(sorted((key, tuple(value) if isinstance(value, list) else value)
+                                      for key, value in options.items()))
+    
+    def sync(self, groups: List[Tuple[List[Tuple[int, Dict[str, Any]]], Dict[str, Any]]]
+             ) -> Tuple[Dict[int, ProcessStreamProxy], List[ProcessStreamProxy], List[ProcessStreamProxy]]:
+        """Ajusta os processos aos grupos (streams, opções) da configuração.
+        
+        Grupos inalterados seguem rodando; novos são iniciados (se o pool está
+        rodando) e removidos são parados em segundo plano.
+        
+        Returns:
+            (proxies por índice de câmera, proxies novos, proxies removidos)
+        """
+        with self.lock:
+            available = list(self.workers)
+            workers: List[Tuple[Tuple, CaptureWorker]] = []
+            streams: Dict[int, ProcessStreamProxy] = {}
+            added: List[ProcessStreamProxy] = []
+            
+            for group_streams, options in groups:
+                key = self._group_key(group_streams, options)
+                worker = next((w for k, w in available if k == key), None)
+                if worker is not None:
+                    available = [(k, w) for k, w in available if w is not worker]
+                    for proxy, (stream_id, _) in zip(worker.proxies, group_streams):
+                        proxy.set_stream_id(stream_id)
+                else:
+                    worker = CaptureWorker(group_streams, options)
+                    added.extend(worker.proxies)
+                    if self.running:
+                        worker.start()
+                workers.append((key, worker))
+                for proxy in worker.proxies:
+                    streams[proxy.stream_id] = proxy
+            
+            self.workers = workers
+            removed_workers = [worker for _, worker in available]
+        
+        if removed_workers:
+            threading.Thread(target=self._stop_workers, args=(removed_workers,), daemon=True).start()
+        removed = [proxy for worker in removed_workers for proxy in worker.proxies]
+        return streams, added, removed
+    
+    def start(self) -> None:
+        """Inicia processos e supervisor."""
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            for _, worker in self.workers:
+                worker.start()
+        self.thread = threading.Thread(target=self._supervise, daemon=True)
+        self.thread.start()
+    
+    def stop(self) -> None:
+        """Para supervisor e todos os processos."""
+        with self.lock:
+            self.running = False
+            workers = [worker for _, worker in self.workers]
+        if self.thread:
+            self.thread.join(timeout=2.0)
+        self._stop_workers(workers)
+    
+    def _stop_workers(self, workers: List[CaptureWorker]) -> None:
+        """Para processos e libera seus anéis."""
+        for worker in workers:
+            rings = worker.stop()
+            with self.lock:
+                self._retired.extend(rings)
+        self._close_retired()
+    
+    def _close_retired(self) -> None:
+        """Fecha anéis antigos que não têm mais frames emprestados."""
+        with self.lock:
+            retired, self._retired = self._retired, []
+        still_open = [ring for ring in retired if not ring.close(unlink=True)]
+        if still_open:
+            with self.lock:
+                self._retired.extend(still_open)
+    
+    def _supervise(self) -> None:
+        """Lê estado dos processos e reinicia os que morreram."""
+        while self.running:
+            with self.lock:
+                workers = [worker for _, worker in self.workers]
+            
+            now = time.time()
+            for worker in workers:
+                worker.poll_status()
+                if worker.process is None or worker.is_alive():
+                    if worker.is_alive() and now - worker.started_at > CaptureWorker.STABLE_TIME:
+                        worker.backoff.reset()
+                    continue
+                
+                if worker.next_restart_time == 0.0:
+                    # Acabou de cair: agenda reinício com backoff
+                    worker.next_restart_time = now + worker.backoff.next_delay()
+                    print(f"Captura {worker.name}: processo terminou (código {worker.process.exitcode}), "
+                          f"reiniciando em {worker.next_restart_time - now:.1f}s")
+                elif now >= worker.next_restart_time:
+                    with self.lock:
+                        if not self.running:
+                            break
+                        self._retired.extend(worker.stop())
+                        worker.next_restart_time = 0.0
+                        worker.restarts += 1
+                        worker.start()
+                    print(f"Captura {worker.name}: processo reiniciado ({worker.restarts}x)")
+            
+            self._close_retired()
+            time.sleep(self.SUPERVISE_INTERVAL)
@@ -0,0 +1,465 @@
+"""Gravação contínua em segmentos, sem decodificar: o FFmpeg só remuxa os pacotes RTSP."""
+import csv
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from typing import Optional, Dict, List, Tuple, Any, Set
+from backoff import Backoff
+from segment_catalog import SegmentCatalog, Segment, RecordingReader, probe_keyframes
+
+# Gravação depende do executável do FFmpeg no PATH (opcional)
+FFMPEG_PATH = shutil.which("ffmpeg")
+RECORDING_AVAILABLE = FFMPEG_PATH is not None
+
+# Formato do arquivo ("recording.format" na configuração) -> (muxer do FFmpeg, extensão)
+SEGMENT_FORMATS = {
+    "mkv": ("matroska", ".mkv"),
+    "mp4": ("mp4", ".mp4"),
+}
+# Nome dos segmentos: horário local de início (o FFmpeg preenche com -strftime)
+SEGMENT_TIME_FORMAT = "%Y%m%d-%H%M%S"
+# Lista de segmentos fechados escrita pelo FFmpeg em cada pasta de câmera
+SEGMENT_LIST_NAME = "segments.csv"
+# Catálogo SQLite na raiz da pasta de gravação
+CATALOG_NAME = "catalog.sqlite3"
+
+
+def camera_directory_name(key: Tuple) -> str:
+    """Nome da pasta de gravação de um canal, a partir da chave (ip, porta, usuário, canal)."""
+    ip, port, _, channel = key
+    name = f"{ip}_{port}_ch{channel}"
+    return "".join(c if c.isalnum() or c in "._-" else "_" for c in name)
+
+
+def parse_segment_start(filename: str) -> Optional[float]:
+    """Extrai o início (epoch) do nome de um segmento; None se não for um segmento."""
+    stem, ext = os.path.splitext(filename)
+    if ext not in {ext for _, ext in SEGMENT_FORMATS.values()}:
+        return None
+    try:
+        return time.mktime(time.strptime(stem, SEGMENT_TIME_FORMAT))
+    except ValueError:
+        return None
+
+
+class CameraRecorder:
+    """Processo FFmpeg que grava um canal em segmentos com "-c copy".
+    
+    Os pacotes H.264/H.265 vão do RTSP direto para o arquivo, sem
+    decodificação, então o custo de CPU é só o de I/O. O FFmpeg fecha um
+    segmento a cada segment_seconds (alinhado ao relógio) e o acrescenta à
+    lista CSV da pasta, que poll() lê incrementalmente.
+    """
+    
+    def __init__(self, camera_index: int, key: Tuple, url: str, directory: str, options: Dict[str, Any]):
+        self.camera_index = camera_index
+        self.key = key
+        self.url = url
+        self.directory = directory
+        self.camera = os.path.basename(directory)
+        self.options = options
+        self.process: Optional[subprocess.Popen] = None
+        self.backoff = Backoff(initial=1.0, maximum=60.0)
+        self.next_start_time = 0.0
+        self._list_offset = 0
+        self.closed_segments = 0  # Segmentos fechados desde o último start()
+    
+    @property
+    def list_path(self) -> str:
+        return os.path.join(self.directory, SEGMENT_LIST_NAME)
+    
+    def command(self) -> List[str]:
+        """Linha de comando do FFmpeg para este canal."""
+        muxer, ext = SEGMENT_FORMATS.get(self.options["format"], SEGMENT_FORMATS["mkv"])
+        return [
+            FFMPEG_PATH, "-hide_banner", "-loglevel", "error",
+            "-rtsp_transport", self.options["transport"],
+            "-i", self.url,
+            # Só o vídeo: áudio de DVR (G.711 etc.) nem sempre cabe no contêiner
+            "-map", "0:v:0", "-c", "copy",
+            "-f", "segment", "-segment_format", muxer,
+            "-segment_time", str(self.options["segment_seconds"]), "-segment_atclocktime", "1",
+            "-reset_timestamps", "1", "-strftime", "1",
+            "-segment_list", self.list_path, "-segment_list_type", "csv",
+            # Com -strftime o caminho inteiro passa pelo strftime: "%" da pasta é escapado
+            os.path.join(self.directory.replace("%", "%%"), SEGMENT_TIME_FORMAT + ext),
+        ]
+    
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+    
+    def start(self) -> bool:
+        """Inicia o FFmpeg. Retorna False se não conseguiu (nova tentativa com backoff)."""
+        # O FFmpeg recria a lista a cada execução
+        self._list_offset = 0
+        self.closed_segments = 0
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, "ffmpeg.log"), "wb") as log:
+                self.process = subprocess.Popen(self.command(), stdin=subprocess.PIPE,
+                                                stdout=subprocess.DEVNULL, stderr=log)
+            return True
+        except OSError as e:
+            print(f"Gravação {self.camera}: erro ao iniciar FFmpeg - {e}")
+            self.process = None
+            self.next_start_time = time.time() + self.backoff.next_delay()
+            return False
+    
+    def request_stop(self) -> None:
+        """Pede ao FFmpeg para fechar o segmento atual e sair ("q" no stdin)."""
+        if self.is_running():
+            try:
+                self.process.stdin.write(b"q")
+                self.process.stdin.flush()
+            except OSError:
+                pass
+    
+    def wait_stopped(self, timeout: float = 5.0) -> None:
+        """Espera o FFmpeg sair; força o término se não sair a tempo."""
+        if self.process is None:
+            return
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+    
+    def poll(self) -> List[Segment]:
+        """Lê segmentos fechados desde a última chamada (linhas novas da lista CSV)."""
+        try:
+            with open(self.list_path, "rb") as f:
+                f.seek(self._list_offset)
+                data = f.read()
+        except OSError:
+            return []
+        # Só linhas completas; uma linha pela metade é lida na próxima vez
+        complete = data[:data.rfind(b"\n") + 1]
+        self._list_offset += len(complete)
+        
+        segments = []
+        for row in csv.reader(complete.decode("utf-8", "replace").splitlines()):
+            if len(row) < 3:
+                continue
+            path = os.path.join(self.directory, os.path.basename(row[0]))
+            start = parse_segment_start(os.path.basename(path))
+            if start is None:
+                continue
+            try:
+                size = os.path.getsize(path)
+                duration = float(row[2]) - float(row[1])
+            except (OSError, ValueError):
+                continue
+            segments.append(Segment(self.camera, path, start, start + duration, size))
+        self.closed_segments += len(segments)
+        return segments
+
+
+class RecordingManager:
+    """Grava os canais em segmentos e os cataloga por câmera e horário.
+    
+    Uma thread de fundo inicia e reinicia (com backoff) os processos FFmpeg
+    e apaga os segmentos mais antigos quando a gravação passa de max_gb ou de
+    retention_days. Os segmentos que fecham vão para uma fila, e uma segunda
+    thread lê os keyframes de cada um (ffprobe) e os cataloga, para que um
+    arquivo lento de ler não atrase a supervisão. Segmentos em gravação ou na
+    fila ainda não estão no catálogo, então o uso pode passar um pouco da cota.
+    """
+    
+    # Intervalo da thread de supervisão (segundos)
+    SUPERVISE_INTERVAL = 1.0
+    # Intervalo entre verificações de cota (segundos)
+    EVICT_INTERVAL = 30.0
+    # Segmentos apagados por consulta ao catálogo na verificação de cota
+    EVICT_BATCH = 256
+    # Tempo máximo do ffprobe em um segmento (segundos); estourado, o segmento fica sem keyframes
+    PROBE_TIMEOUT = 30.0
+    
+    def __init__(self, config: Dict[str, Any]):
+        self.recorders: Dict[Tuple, CameraRecorder] = {}
+        self.catalog: Optional[SegmentCatalog] = None
+        self.root: Optional[str] = None
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._retired: List[CameraRecorder] = []
+        self._last_evict = 0.0
+        self._scan_pending = True
+        # Fila do catálogo: (catálogo, segmento fechado); None encerra a thread do catálogo
+        self._catalog_queue: "queue.Queue[Optional[Tuple[SegmentCatalog, Segment]]]" = queue.Queue()
+        self._queued: Set[str] = set()  # Caminhos na fila, ainda não catalogados
+        self._catalog_thread: Optional[threading.Thread] = None
+        self.configure(config)
+    
+    def configure(self, config: Dict[str, Any]) -> None:
+        """Aplica pasta, cota e retenção (as opções do FFmpeg valem a partir do próximo sync)."""
+        root = os.path.abspath(os.path.expanduser(config["path"]))
+        if root != self.root:
+            os.makedirs(root, exist_ok=True)
+            catalog = SegmentCatalog(os.path.join(root, CATALOG_NAME))
+            with self.lock:
+                if self.catalog is not None:
+                    # Pasta trocada: a fila do catálogo antigo é descartada (a varredura acha
+                    # os arquivos se a pasta voltar) e o que está sendo lido é ignorado
+                    self._drain_catalog_queue()
+                    self.catalog.close()
+                self.catalog = catalog
+                self.root = root
+            self._scan_pending = True
+        self.config = config
+        self.max_bytes = int(config["max_gb"] * 1024 ** 3) if config.get("max_gb") else 0
+        self.retention = config["retention_days"] * 86400.0 if config.get("retention_days") else 0.0
+    
+    def sync(self, channels: List[Tuple[int, Tuple, str]], transport: str) -> None:
+        """Ajusta os gravadores aos canais (índice, chave, URL) da configuração.
+        
+        Canais inalterados seguem gravando; gravadores de canais removidos ou
+        alterados são parados pela thread de supervisão.
+        """
+        options = {
+            "format": self.config["format"],
+            "segment_seconds": self.config["segment_seconds"],
+            "transport": transport,
+        }
+        recorders: Dict[Tuple, CameraRecorder] = {}
+        with self.lock:
+            for camera_index, key, url in channels:
+                directory = os.path.join(self.root, camera_directory_name(key))
+                recorder = self.recorders.pop(key, None)
+                if (recorder is not None and recorder.url == url and recorder.options == options
+                        and recorder.directory == directory):
+                    recorder.camera_index = camera_index
+                else:
+                    if recorder is not None:
+                        self._retired.append(recorder)
+                    recorder = CameraRecorder(camera_index, key, url, directory, options)
+                recorders[key] = recorder
+            self._retired.extend(self.recorders.values())
+            self.recorders = recorders
+    
+    def start(self) -> None:
+        """Inicia a thread de supervisão (que inicia os processos FFmpeg)."""
+        if self.running:
+            return
+        self.running = True
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._supervise, daemon=True)
+        self.thread.start()
+        self._catalog_thread = threading.Thread(target=self._run_catalog, daemon=True)
+        self._catalog_thread.start()
+    
+    def stop(self) -> None:
+        """Fecha os segmentos em gravação e para todos os processos."""
+        self.running = False
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=10.0)
+        with self.lock:
+            recorders = list(self.recorders.values()) + self._retired
+            self._retired = []
+        # Pede a todos antes de esperar: cada um leva até um segundo para fechar o arquivo
+        for recorder in recorders:
+            recorder.request_stop()
+        for recorder in recorders:
+            recorder.wait_stopped()
+            self._catalog(recorder.poll())
+        # Termina de catalogar a fila; o que sobrar é encontrado pela varredura da próxima partida
+        self._catalog_queue.put(None)
+        if self._catalog_thread:
+            self._catalog_thread.join(timeout=10.0)
+    
+    def _camera(self, camera_index: int) -> Optional[str]:
+        """Pasta de gravação da câmera com esse índice."""
+        with self.lock:
+            return next((recorder.camera for recorder in self.recorders.values()
+                         if recorder.camera_index == camera_index), None)
+    
+    def get_segments(self, camera_index: int, start: float, end: float) -> List[Segment]:
+        """Retorna segmentos fechados da câmera que cobrem algum instante entre start e end."""
+        camera = self._camera(camera_index)
+        if camera is None:
+            return []
+        return self.catalog.segments(camera, start, end)
+    
+    def open_reader(self, camera_index: int, timestamp: float) -> Optional[RecordingReader]:
+        """Abre a gravação da câmera posicionada em timestamp (None se não há gravação)."""
+        camera = self._camera(camera_index)
+        if camera is None:
+            return None
+        seek = self.catalog.lookup(camera, timestamp)
+        if seek is None:
+            return None
+        return RecordingReader(self.catalog, seek, timestamp)
+    
+    def get_usage(self) -> Tuple[int, int]:
+        """Retorna (número de segmentos, bytes) catalogados."""
+        return self.catalog.usage()
+    
+    def _catalog(self, segments: List[Segment]) -> None:
+        """Põe segmentos recém-fechados na fila do catálogo (ignora os que já estão nela)."""
+        with self.lock:
+            segments = [segment for segment in segments if segment.path not in self._queued]
+            self._queued.update(segment.path for segment in segments)
+            catalog = self.catalog
+        for segment in segments:
+            self._catalog_queue.put((catalog, segment))
+    
+    def _drain_catalog_queue(self) -> None:
+        """Descarta os segmentos na fila do catálogo, mantendo o pedido de parada (chamar com self.lock)."""
+        stop = False
+        while True:
+            try:
+                item = self._catalog_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+            else:
+                self._queued.discard(item[1].path)
+        if stop:
+            self._catalog_queue.put(None)
+    
+    def _run_catalog(self) -> None:
+        """Thread do catálogo: lê os keyframes de cada segmento da fila e o cataloga."""
+        while True:
+            item = self._catalog_queue.get()
+            if item is None:
+                break
+            catalog, segment = item
+            try:
+                keyframes = probe_keyframes(segment.path, self.PROBE_TIMEOUT)
+                with self.lock:
+                    # Catálogo trocado durante a leitura (pasta mudou): já foi fechado
+                    if catalog is self.catalog:
+                        catalog.add(segment, keyframes)
+            except Exception as e:
+                print(f"Gravação: erro ao catalogar {segment.path} - {type(e).__name__}: {e}")
+            finally:
+                with self.lock:
+                    self._queued.discard(segment.path)
+    
+    def _scan_directory(self, directory: str) -> None:
+        """Sincroniza o catálogo com os arquivos de uma pasta de câmera.
+        
+        Usado na partida (gravações feitas sem o app ou arquivos apagados à
+        mão) e quando um FFmpeg termina sem listar o último segmento; o fim
+        dos segmentos encontrados assim vem do mtime.
+        """
+        camera = os.path.basename(directory)
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return
+        known = self.catalog.paths(camera)
+        present = set()
+        found = []
+        for name in names:
+            path = os.path.join(directory, name)
+            start = parse_segment_start(name)
+            if start is None:
+                continue
+            present.add(path)
+            if path in known:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            found.append(Segment(camera, path, start, max(stat.st_mtime, start), stat.st_size))
+        self._catalog(sorted(found, key=lambda s: s.start))
+        if known - present:
+            self.catalog.remove(list(known - present))
+    
+    def _evict(self) -> None:
+        """Apaga os segmentos mais antigos acima da cota ou além da retenção."""
+        cutoff = time.time() - self.retention if self.retention else None
+        total = self.catalog.usage()[1]
+        evicted = 0
+        while True:
+            batch = self.catalog.oldest(self.EVICT_BATCH)
+            removed = []
+            for segment in batch:
+                over_quota = self.max_bytes and total > self.max_bytes
+                expired = cutoff is not None and segment.end < cutoff
+                if not over_quota and not expired:
+                    break
+                try:
+                    os.remove(segment.path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"Gravação: erro ao apagar {segment.path} - {e}")
+                    continue
+                total -= segment.size
+                removed.append(segment.path)
+            self.catalog.remove(removed)
+            evicted += len(removed)
+            if len(removed) < self.EVICT_BATCH:
+                break
+        if evicted:
+            print(f"Gravação: {evicted} segmento(s) antigo(s) apagado(s)")
+    
+    def _supervise(self) -> None:
+        """Thread de fundo: processos FFmpeg, catálogo e cota."""
+        while self.running:
+            try:
+                self._supervise_once()
+            except Exception as e:
+                # Disco desmontado, sem permissão, erro no SQLite...: tenta de novo na próxima volta
+                print(f"Gravação: erro na supervisão - {type(e).__name__}: {e}")
+            self._stop_event.wait(self.SUPERVISE_INTERVAL)
+    
+    def _supervise_once(self) -> None:
+        """Uma volta da supervisão."""
+        if self._scan_pending:
+            # Catálogo novo ou partida: confere com o que está em disco antes de gravar
+            for name in os.listdir(self.root):
+                if os.path.isdir(os.path.join(self.root, name)):
+                    self._scan_directory(os.path.join(self.root, name))
+            self._scan_pending = False
+        
+        with self.lock:
+            recorders = list(self.recorders.values())
+            retired, self._retired = self._retired, []
+        
+        # Para todos os aposentados antes de catalogar: um erro no catálogo não deixa FFmpeg órfão
+        for recorder in retired:
+            recorder.request_stop()
+        for recorder in retired:
+            recorder.wait_stopped()
+        for recorder in retired:
+            try:
+                self._catalog(recorder.poll())
+                self._scan_directory(recorder.directory)
+            except Exception as e:
+                print(f"Gravação {recorder.camera}: erro ao catalogar - {type(e).__name__}: {e}")
+        
+        now = time.time()
+        for recorder in recorders:
+            try:
+                self._supervise_recorder(recorder, now)
+            except Exception as e:
+                print(f"Gravação {recorder.camera}: erro na supervisão - {type(e).__name__}: {e}")
+        
+        if now - self._last_evict >= self.EVICT_INTERVAL:
+            self._last_evict = now
+            self._evict()
+    
+    def _supervise_recorder(self, recorder: CameraRecorder, now: float) -> None:
+        """Cataloga segmentos fechados de um gravador e (re)inicia o FFmpeg dele."""
+        self._catalog(recorder.poll())
+        if recorder.process is not None and not recorder.is_running():
+            # FFmpeg saiu (câmera caiu, DVR reiniciou...): cataloga o que ficou e reinicia
+            print(f"Gravação {recorder.camera}: FFmpeg terminou (código {recorder.process.returncode})")
+            recorder.process = None
+            recorder.next_start_time = now + recorder.backoff.next_delay()
+            self._scan_directory(recorder.directory)
+        elif recorder.process is None and now >= recorder.next_start_time:
+            recorder.start()
+        elif recorder.is_running() and recorder.closed_segments > 0:
+            # Já fechou um segmento: gravação estável
+            recorder.backoff.reset()
@@ -0,0 +1,205 @@
+"""Catálogo em disco (SQLite) dos segmentos gravados, com offsets dos keyframes."""
+import shutil
+import sqlite3
+import subprocess
+import threading
+from typing import Optional, List, Tuple, Set, NamedTuple
+import cv2
+import numpy as np
+
+# ffprobe é opcional: sem ele os segmentos são catalogados sem keyframes (seek por tempo)
+FFPROBE_PATH = shutil.which("ffprobe")
+
+# Keyframes de um segmento, guardados num único BLOB: (segundos desde o início, byte no arquivo)
+KEYFRAME_DTYPE = np.dtype([("time", "<f8"), ("offset", "<i8")])
+
+
+class Segment(NamedTuple):
+    """Segmento gravado e fechado."""
+    camera: str    # Pasta da câmera (estável entre recargas, ao contrário do índice)
+    path: str
+    start: float   # Início (epoch)
+    end: float     # Fim (epoch)
+    size: int      # Bytes
+
+
+class SeekPoint(NamedTuple):
+    """Resultado de uma busca no catálogo: onde começar a ler para chegar a um instante."""
+    segment: Segment
+    keyframe_time: float    # Instante (epoch) do keyframe anterior ao pedido
+    offset: Optional[int]   # Byte do keyframe no arquivo (None = desconhecido)
+
+
+def probe_keyframes(path: str, timeout: float = 30.0) -> np.ndarray:
+    """Lista keyframes do vídeo com ffprobe (só lê pacotes, sem decodificar)."""
+    if FFPROBE_PATH is None:
+        return np.empty(0, dtype=KEYFRAME_DTYPE)
+    try:
+        result = subprocess.run(
+            [FFPROBE_PATH, "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "packet=pts_time,pos,flags", "-of", "csv=p=0", path],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired):
+        return np.empty(0, dtype=KEYFRAME_DTYPE)
+    
+    keyframes = []
+    for line in result.stdout.decode("ascii", "replace").splitlines():
+        fields = line.split(",")
+        if len(fields) < 3 or "K" not in fields[2]:
+            continue
+        try:
+            keyframes.append((float(fields[0]), int(fields[1])))
+        except ValueError:
+            continue  # pts ou posição "N/A"
+    return np.array(sorted(keyframes), dtype=KEYFRAME_DTYPE)
+
+
+class SegmentCatalog:
+    """Índice SQLite de segmentos por câmera e horário.
+    
+    Cada segmento é uma linha (câmera, caminho, início, fim, tamanho) com os
+    keyframes num BLOB compacto, então semanas de gravação cabem em poucos
+    MB e uma busca é uma consulta no índice (câmera, início) mais uma busca
+    binária nos keyframes, sem listar pastas nem abrir arquivos de vídeo.
+    Atualizado incrementalmente conforme os segmentos fecham. A conexão é
+    compartilhada entre threads, protegida por self.lock.
+    """
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                " id INTEGER PRIMARY KEY, camera TEXT NOT NULL, path TEXT NOT NULL UNIQUE,"
+                " start REAL NOT NULL, end REAL NOT NULL, size INTEGER NOT NULL, keyframes BLOB)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS segments_camera_start ON segments (camera, start)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS segments_start ON segments (start)")
+    
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+    
+    def add(self, segment: Segment, keyframes: np.ndarray) -> None:
+        """Cataloga um segmento fechado (substitui se o caminho já existe)."""
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO segments (camera, path, start, end, size, keyframes)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (segment.camera, segment.path, segment.start, segment.end, segment.size,
+                 keyframes.astype(KEYFRAME_DTYPE).tobytes()))
+    
+    def remove(self, paths: List[str]) -> None:
+        """Tira segmentos do catálogo."""
+        with self.lock, self.db:
+            self.db.executemany("DELETE FROM segments WHERE path = ?", [(path,) for path in paths])
+    
+    def paths(self, camera: str) -> Set[str]:
+        """Caminhos catalogados de uma câmera."""
+        with self.lock:
+            return {row[0] for row in self.db.execute("SELECT path FROM segments WHERE camera = ?", (camera,))}
+    
+    def segments(self, camera: str, start: float, end: float) -> List[Segment]:
+        """Segmentos da câmera que cobrem algum instante entre start e end, por início."""
+        with self.lock:
+            # Começa no último segmento iniciado antes de start (pode cobrir start)
+            first = self.db.execute(
+                "SELECT MAX(start) FROM segments WHERE camera = ? AND start <= ?", (camera, start)).fetchone()[0]
+            rows = self.db.execute(
+                "SELECT camera, path, start, end, size FROM segments"
+                " WHERE camera = ? AND start >= ? AND start <= ? ORDER BY start",
+                (camera, first if first is not None else start, end)).fetchall()
+        return [Segment(*row) for row in rows if row[3] >= start]
+    
+    def oldest(self, limit: int) -> List[Segment]:
+        """Segmentos mais antigos de todas as câmeras (para a cota)."""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT camera, path, start, end, size FROM segments ORDER BY start LIMIT ?", (limit,)).fetchall()
+        return [Segment(*row) for row in rows]
+    
+    def usage(self) -> Tuple[int, int]:
+        """Retorna (número de segmentos, bytes) catalogados."""
+        with self.lock:
+            count, total = self.db.execute("SELECT COUNT(*), SUM(size) FROM segments").fetchone()
+        return count, total or 0
+    
+    def lookup(self, camera: str, timestamp: float) -> Optional[SeekPoint]:
+        """Encontra segmento e keyframe para começar a ler a câmera em timestamp.
+        
+        Retorna None se não há gravação cobrindo o instante.
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT camera, path, start, end, size, keyframes FROM segments"
+                " WHERE camera = ? AND start <= ? ORDER BY start DESC LIMIT 1", (camera, timestamp)).fetchone()
+        if row is None or row[3] < timestamp:
+            return None
+        segment = Segment(*row[:5])
+        keyframes = np.frombuffer(row[5] or b"", dtype=KEYFRAME_DTYPE)
+        index = int(np.searchsorted(keyframes["time"], timestamp - segment.start, side="right")) - 1
+        if index < 0:
+            return SeekPoint(segment, segment.start, None)
+        return SeekPoint(segment, segment.start + float(keyframes["time"][index]), int(keyframes["offset"][index]))
+
+
+class RecordingReader:
+    """Leitura de uma gravação a partir de um instante, atravessando segmentos.
+    
+    Abre o segmento do SeekPoint, posiciona no keyframe anterior ao instante
+    pedido e descarta frames até ele; read() devolve (timestamp, frame BGR)
+    e passa sozinho para o segmento seguinte da câmera.
+    """
+    
+    def __init__(self, catalog: SegmentCatalog, seek: SeekPoint, timestamp: float):
+        self.catalog = catalog
+        self.segment = seek.segment
+        self.cap: Optional[cv2.VideoCapture] = None
+        self._open(seek.segment, seek.keyframe_time - seek.segment.start)
+        # Decodifica do keyframe até o instante pedido
+        while True:
+            position = self.position
+            if position is None or position >= timestamp or not self.cap.grab():
+                break
+    
+    @property
+    def position(self) -> Optional[float]:
+        """Instante (epoch) do próximo frame a ser lido."""
+        if self.cap is None:
+            return None
+        return self.segment.start + self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+    
+    def _open(self, segment: Segment, offset_seconds: float) -> bool:
+        """Abre um segmento e posiciona em offset_seconds desde o início."""
+        if self.cap is not None:
+            self.cap.release()
+        self.segment = segment
+        self.cap = cv2.VideoCapture(segment.path, cv2.CAP_FFMPEG)
+        if not self.cap.isOpened():
+            self.cap = None
+            return False
+        if offset_seconds > 0:
+            self.cap.set(cv2.CAP_PROP_POS_MSEC, offset_seconds * 1000.0)
+        return True
+    
+    def read(self) -> Optional[Tuple[float, np.ndarray]]:
+        """Lê o próximo frame (timestamp, frame); None no fim da gravação."""
+        while self.cap is not None:
+            timestamp = self.position
+            ret, frame = self.cap.read()
+            if ret:
+                return timestamp, frame
+            # Fim do segmento: segue para o próximo da mesma câmera
+            following = [segment for segment in self.catalog.segments(self.segment.camera, self.segment.end,
+                                                                      self.segment.end + 3600.0)
+                         if segment.start > self.segment.start]
+            if not following or not self._open(following[0], 0.0):
+                self.close()
+        return None
+    
+    def close(self) -> None:
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
@@ -1,37 +1,134 @@
 """Gerenciamento de streams RTSP com threading e buffer management."""
+import os
 import cv2
 import threading
 import time
-from typing import Optional, Dict, List
-from queue import Queue, Empty
+from typing import Optional, Dict, List, Tuple, Any
 import numpy as np
 from urllib.parse import quote
+from frame_slots import FrameSlots, FrameView
+from frame_history import FrameHistory
+from backoff import Backoff
+from dvr_host import DVRHost
+from process_capture import ProcessCapturePool
+from stream_watchdog import StreamWatchdog
+from recorder import RecordingManager, RECORDING_AVAILABLE
+from segment_catalog import Segment, RecordingReader
+from motion_analyzer import MotionAnalyzer
+
+
+# Níveis de demanda de decodificação, definidos pelo DisplayManager
+DEMAND_VISIBLE = "visible"    # Câmera em exibição: decodificação completa
+DEMAND_UPCOMING = "upcoming"  # Câmera do próximo grid: decodificação completa (pré-aquecimento)
+DEMAND_HIDDEN = "hidden"      # Câmera fora da tela: apenas mantém a sessão RTSP viva
+
+# Perfis de qualidade (substream para células do grid, stream principal em tela cheia)
+PROFILE_SUB = "sub"
+PROFILE_MAIN = "main"
+
+# Modos de captura: threads no processo da UI ou processos separados por DVR
+CAPTURE_THREAD = "thread"
+CAPTURE_PROCESS = "process"
+
+# Aceleração de hardware do decoder ("decoder.hw_accel" na configuração)
+HW_ACCEL_MODES = {
+    "none": cv2.VIDEO_ACCELERATION_NONE,
+    "auto": cv2.VIDEO_ACCELERATION_ANY,    # Usa o que houver, senão software
+    "vaapi": cv2.VIDEO_ACCELERATION_VAAPI,
+    "d3d11": cv2.VIDEO_ACCELERATION_D3D11,
+    "mfx": cv2.VIDEO_ACCELERATION_MFX,
+}
+HW_ACCEL_NAMES = {value: name for name, value in HW_ACCEL_MODES.items() if name != "auto"}
+
+# Opções globais do FFmpeg definidas fora da aplicação têm precedência
+_EXTERNAL_FFMPEG_OPTIONS = os.environ.get("OPENCV_FFMPEG_CAPTURE_OPTIONS")
+
+
+def apply_ffmpeg_capture_options(transport: str) -> None:
+    """Define opções do FFmpeg válidas para todas as aberturas seguintes.
+    
+    OPENCV_FFMPEG_CAPTURE_OPTIONS é uma variável de ambiente do processo,
+    lida a cada abertura de VideoCapture; por isso o transporte RTSP é global
+    e não por stream.
+    """
+    if _EXTERNAL_FFMPEG_OPTIONS is not None:
+        return
+    os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = f"rtsp_transport;{transport}"
 
 
 class StreamCapture:
     """Captura de um único stream RTSP em thread separada."""
     
-    def __init__(self, rtsp_url: str, stream_id: int, buffer_size: int = 2, alt_url: Optional[str] = None):
+    # Intervalo entre frames decodificados quando o stream está oculto (segundos)
+    HIDDEN_REFRESH_INTERVAL = 1.0
+    # Espera antes de tentar novamente uma troca de perfil que falhou (segundos)
+    PROFILE_RETRY_DELAY = 5.0
+    # Espera máxima entre tentativas de reconexão (segundos)
+    MAX_RECONNECT_DELAY = 30.0
+    
+    def __init__(self, rtsp_url: str, stream_id: int, buffer_size: int = 2, alt_url: Optional[str] = None,
+                 profile_urls: Optional[Dict[str, Tuple[str, Optional[str]]]] = None,
+                 profile: str = PROFILE_SUB, history: Optional[FrameHistory] = None,
+                 open_timeout_ms: int = 5000, read_timeout_ms: int = 5000,
+                 host: Optional[DVRHost] = None, decoder: Optional[Dict[str, Any]] = None,
+                 slots: Optional[FrameSlots] = None):
         self.rtsp_url = rtsp_url
         self.alt_url = alt_url  # URL alternativa (sem codificação, por exemplo)
         self.stream_id = stream_id
         self.buffer_size = buffer_size
-        self.frame_queue: Queue = Queue(maxsize=buffer_size)
-        self.current_frame: Optional[np.ndarray] = None
+        # Anel de buffers: capture decodifica direto nele, renderizador empresta sem copiar
+        # (no modo de processos, um anel em memória compartilhada com a mesma interface)
+        self.slots = slots if slots is not None else FrameSlots(num_slots=buffer_size + 1)
         self.running = False
         self.thread: Optional[threading.Thread] = None
         self.cap: Optional[cv2.VideoCapture] = None
         self.last_frame_time = 0
+        self.frame_interval = 0.0  # Média móvel do intervalo entre frames publicados (segundos)
+        self._reconnect_requested = False
         self.connected = False
         self.lock = threading.Lock()
         self.connection_attempts = 0
         self.current_url = rtsp_url  # URL atual sendo usada
+        self.demand = DEMAND_VISIBLE
+        self.last_retrieve_time = 0
+        # URLs (principal, alternativa) de cada perfil de qualidade
+        self.profile_urls = profile_urls or {profile: (rtsp_url, alt_url)}
+        self.profile = profile
+        self.requested_profile = profile
+        # (perfil, VideoCapture, URL, primeiro frame, hw_accel, decode_path) aberto pela thread de troca
+        self._pending_switch: Optional[Tuple[str, cv2.VideoCapture, str, np.ndarray, str, Optional[str]]] = None
+        self._switch_thread: Optional[threading.Thread] = None
+        self._switch_retry_time = 0
+        # Histórico opcional de frames (None = desativado, sem custo no loop)
+        self.history = history
+        # Timeouts do FFmpeg: abertura e leitura nunca bloqueiam mais que isso
+        self.open_timeout_ms = open_timeout_ms
+        self.read_timeout_ms = read_timeout_ms
+        self.backoff = Backoff(initial=0.5, maximum=self.MAX_RECONNECT_DELAY)
+        self.next_connect_time = 0.0
+        # DVR ao qual o canal pertence (alcançabilidade compartilhada entre canais)
+        self.host = host
+        # Opções do decoder (aceleração de hardware e threads)
+        self.decoder = decoder or {}
+        self.hw_accel = self.decoder.get("hw_accel", "auto")
+        self.decoder_threads = self.decoder.get("threads", 0)
+        self.decode_path: Optional[str] = None  # Caminho efetivo ("vaapi", "none" = software...)
+        # Tamanho (largura, altura) em que os frames são publicados; None = resolução do decoder
+        self.output_size: Optional[Tuple[int, int]] = None
+        self._decode_buffer: Optional[np.ndarray] = None  # Frame decodificado antes do resize
+        self._host_was_down = False
+        # Medições de conexão
+        self.start_time = 0.0
+        self.time_to_first_frame: Optional[float] = None  # Desde start() até o 1º frame
+        self.last_connect_duration: Optional[float] = None  # Duração da última conexão bem-sucedida
     
     def start(self) -> None:
         """Inicia thread de captura."""
         if self.running:
             return
         self.running = True
+        self.start_time = time.time()
+        self.next_connect_time = 0.0
         self.thread = threading.Thread(target=self._capture_loop, daemon=True)
         self.thread.start()
     
@@ -42,72 +139,334 @@ class StreamCapture:
             self.thread.join(timeout=2.0)
         if self.cap:
             self.cap.release()
+        with self.lock:
+            pending, self._pending_switch = self._pending_switch, None
+        if pending:
+            pending[1].release()
     
     def get_frame(self) -> Optional[np.ndarray]:
-        """Obtém frame mais recente."""
-        with self.lock:
-            return self.current_frame.copy() if self.current_frame is not None else None
+        """Obtém cópia do frame mais recente (use borrow_frame() para evitar a cópia)."""
+        view = self.slots.borrow()
+        if view is None:
+            return None
+        with view:
+            return view.frame.copy()
+    
+    @property
+    def frame_seq(self) -> int:
+        """Número de sequência do último frame publicado (cresce a cada frame, 0 = nenhum)."""
+        return self.slots.seq
+    
+    def borrow_frame(self) -> Optional[FrameView]:
+        """Empresta o frame mais recente, somente leitura e sem cópia.
+        
+        O chamador deve liberar o empréstimo (context manager ou release())
+        assim que terminar de usar o frame.
+        """
+        return self.slots.borrow()
     
     def is_connected(self) -> bool:
         """Verifica se stream está conectado."""
         return self.connected
     
+    def set_demand(self, demand: str) -> None:
+        """Define nível de demanda (DEMAND_VISIBLE, DEMAND_UPCOMING ou DEMAND_HIDDEN)."""
+        self.demand = demand
+    
+    def expected_frame_interval(self) -> float:
+        """Intervalo esperado entre frames: o medido, ou o refresh lento se oculto."""
+        if self.demand == DEMAND_HIDDEN:
+            return max(self.frame_interval, self.HIDDEN_REFRESH_INTERVAL)
+        return self.frame_interval
+    
+    def force_reconnect(self) -> None:
+        """Descarta a conexão atual (decoder travado); o loop de captura reconecta na hora."""
+        self.connected = False
+        self._reconnect_requested = True
+    
+    def get_connection_stats(self) -> Dict[str, Optional[float]]:
+        """Retorna estado e tempos de conexão do stream."""
+        return {
+            "connected": self.connected,
+            "attempts": self.connection_attempts,
+            "time_to_first_frame": self.time_to_first_frame,
+            "last_connect_duration": self.last_connect_duration,
+            "next_retry_in": max(self.next_connect_time - time.time(), 0.0) if not self.connected else 0.0,
+            "host_reachable": self.host.reachable if self.host is not None else None,
+            "decode_path": self.decode_path,
+            "fps": 1.0 / self.frame_interval if self.frame_interval > 0 else 0.0,
+            "expected_interval": self.expected_frame_interval(),
+        }
+    
+    def _open_capture(self, url: str) -> Tuple[cv2.VideoCapture, str, Optional[str]]:
+        """Abre VideoCapture FFmpeg com timeouts de abertura e leitura (sem esperas fixas).
+        
+        Aplica aceleração de hardware e número de threads do decoder. Se um
+        modo de hardware explícito falha e o software abre, o modo retornado
+        é "none" (software daí em diante). Retorna (cap, hw_accel, decode_path);
+        não altera o stream, porque também roda na thread de troca de perfil:
+        quem usa o cap aplica os dois com _set_decode_mode() na thread de captura.
+        """
+        hw_accel = self.hw_accel
+        params = [
+            cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, self.open_timeout_ms,
+            cv2.CAP_PROP_READ_TIMEOUT_MSEC, self.read_timeout_ms,
+        ]
+        if self.decoder_threads > 0:
+            params += [cv2.CAP_PROP_N_THREADS, self.decoder_threads]
+        
+        accel = HW_ACCEL_MODES.get(hw_accel, cv2.VIDEO_ACCELERATION_ANY)
+        cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG, params + [cv2.CAP_PROP_HW_ACCELERATION, accel])
+        
+        if not cap.isOpened() and accel not in (cv2.VIDEO_ACCELERATION_NONE, cv2.VIDEO_ACCELERATION_ANY):
+            # Falha pode ser do decoder de hardware: tenta em software
+            cap.release()
+            cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG,
+                                   params + [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_NONE])
+            if cap.isOpened():
+                print(f"Stream {self.stream_id}: aceleração '{hw_accel}' indisponível, usando software")
+                hw_accel = "none"
+        
+        decode_path = None
+        if cap.isOpened():
+            decode_path = HW_ACCEL_NAMES.get(int(cap.get(cv2.CAP_PROP_HW_ACCELERATION)), "none")
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Buffer mínimo
+        return cap, hw_accel, decode_path
+    
+    def _set_decode_mode(self, hw_accel: str, decode_path: Optional[str]) -> None:
+        """Registra modo de aceleração e caminho de decodificação efetivo (mostra só quando muda)."""
+        self.hw_accel = hw_accel
+        if decode_path is not None and decode_path != self.decode_path:
+            self.decode_path = decode_path
+            label = "software" if decode_path == "none" else f"hardware ({decode_path})"
+            threads = self.decoder_threads or "auto"
+            print(f"Stream {self.stream_id}: decodificação {label}, threads {threads}")
+    
+    def set_output_size(self, size: Optional[Tuple[int, int]]) -> None:
+        """Define tamanho (largura, altura) dos frames publicados, ou None para resolução completa.
+        
+        O resize é feito uma vez na thread de captura, logo após a decodificação,
+        então cópias, cache e fade seguintes trabalham com frames do tamanho da
+        célula. Vale a partir do próximo frame.
+        """
+        self.output_size = tuple(size) if size is not None else None
+    
+    def _scale_to_output(self, frame: np.ndarray, buffer: Optional[np.ndarray],
+                         output_size: Optional[Tuple[int, int]]) -> np.ndarray:
+        """Redimensiona frame decodificado para output_size dentro de buffer do slot.
+        
+        Com output_size definido o resultado nunca é o próprio frame, que pode
+        ser o buffer de decodificação reutilizado no próximo read().
+        """
+        if output_size is None:
+            return frame
+        width, height = output_size
+        if buffer is None or buffer is frame or buffer.shape != (height, width, 3):
+            buffer = np.empty((height, width, 3), dtype=np.uint8)
+        if frame.shape[:2] == (height, width):
+            np.copyto(buffer, frame)
+            return buffer
+        return cv2.resize(frame, output_size, dst=buffer, interpolation=cv2.INTER_AREA)
+    
+    def set_profile(self, profile: str) -> None:
+        """Solicita troca de perfil de qualidade (PROFILE_SUB ou PROFILE_MAIN).
+        
+        A troca é feita pela thread de captura sem interromper a imagem: o
+        stream atual continua sendo exibido até o novo entregar o primeiro frame.
+        """
+        if profile not in self.profile_urls:
+            return
+        self.requested_profile = profile
+        if self.profile_urls[profile] == self.profile_urls[self.profile]:
+            # Mesmas URLs (perfis iguais no config): nada a reabrir
+            self.profile = profile
+    
+    def _use_profile_urls(self, profile: str) -> None:
+        """Passa a usar as URLs do perfil informado."""
+        self.profile = profile
+        self.rtsp_url, self.alt_url = self.profile_urls[profile]
+        self.current_url = self.rtsp_url
+        self.connection_attempts = 0
+    
+    def _begin_profile_switch(self) -> None:
+        """Abre o stream do perfil solicitado em segundo plano."""
+        if self._switch_thread and self._switch_thread.is_alive():
+            return
+        if time.time() < self._switch_retry_time:
+            return
+        self._switch_thread = threading.Thread(target=self._open_profile,
+                                               args=(self.requested_profile,), daemon=True)
+        self._switch_thread.start()
+    
+    def _open_profile(self, profile: str) -> None:
+        """Abre stream de outro perfil até obter o primeiro frame (roda em thread própria)."""
+        url, alt_url = self.profile_urls[profile]
+        for candidate in (url, alt_url):
+            if candidate is None or not self.running:
+                continue
+            cap, hw_accel, decode_path = self._open_capture(candidate)
+            ret, frame = cap.read() if cap.isOpened() else (False, None)
+            if ret and frame is not None and self.running:
+                with self.lock:
+                    self._pending_switch = (profile, cap, candidate, frame, hw_accel, decode_path)
+                return
+            cap.release()
+        
+        print(f"Stream {self.stream_id}: falha ao abrir perfil '{profile}', mantendo '{self.profile}'")
+        self._switch_retry_time = time.time() + self.PROFILE_RETRY_DELAY
+    
+    def _apply_profile_switch(self) -> None:
+        """Substitui o VideoCapture atual pelo do novo perfil, já com frame pronto."""
+        with self.lock:
+            pending, self._pending_switch = self._pending_switch, None
+        if pending is None:
+            return
+        
+        profile, cap, url, frame, hw_accel, decode_path = pending
+        if profile != self.requested_profile:
+            # Pedido mudou enquanto abria: descarta
+            cap.release()
+            return
+        
+        old_cap = self.cap
+        self.cap = cap
+        self._set_decode_mode(hw_accel, decode_path)
+        self._use_profile_urls(profile)
+        self.current_url = url
+        self.connected = True
+        self.last_frame_time = time.time()
+        index, buffer = self.slots.acquire_write()
+        self.slots.publish(index, self._scale_to_output(frame, buffer, self.output_size), self.last_frame_time)
+        if old_cap:
+            old_cap.release()
+        print(f"Stream {self.stream_id}: perfil '{profile}' ativo")
+    
+    def _read_frame(self, buffer: Optional[np.ndarray]):
+        """Lê próximo frame conforme a demanda atual, decodificando direto em buffer.
+        
+        Streams ocultos só fazem grab() (mantém a sessão RTSP e o decoder em dia,
+        sem conversão de cor nem cópia) e recuperam um frame a cada
+        HIDDEN_REFRESH_INTERVAL, para que o último frame não fique muito antigo.
+        Retorna (ret, frame); frame é None quando apenas grab() foi feito.
+        """
+        if self.demand != DEMAND_HIDDEN:
+            return self.cap.read(buffer)
+        
+        if not self.cap.grab():
+            return False, None
+        
+        current_time = time.time()
+        if current_time - self.last_retrieve_time < self.HIDDEN_REFRESH_INTERVAL:
+            return True, None
+        self.last_retrieve_time = current_time
+        return self.cap.retrieve(buffer)
+    
     def _capture_loop(self) -> None:
         """Loop principal de captura em thread separada."""
-        reconnect_delay = 5.0
-        last_reconnect_attempt = 0
-        
         while self.running:
             try:
-                # Tenta conectar/reconectar
+                if self._reconnect_requested:
+                    # Pedido do watchdog: fecha o decoder e reconecta sem esperar backoff
+                    self._reconnect_requested = False
+                    self.connected = False
+                    if self.cap:
+                        self.cap.release()
+                        self.cap = None
+                    self.next_connect_time = 0.0
+                
+                # Troca de perfil de qualidade sem derrubar a imagem atual
+                if self._pending_switch is not None:
+                    self._apply_profile_switch()
+                elif self.connected and self.requested_profile != self.profile:
+                    self._begin_profile_switch()
+                
+                # Tenta conectar/reconectar (espera com backoff exponencial entre falhas)
                 if not self.connected or self.cap is None or not self.cap.isOpened():
-                    current_time = time.time()
-                    if current_time - last_reconnect_attempt >= reconnect_delay:
-                        last_reconnect_attempt = current_time
-                        self._connect()
-                    else:
-                        time.sleep(0.1)
+                    if self.host is not None and not self.host.wait_reachable(0.5):
+                        # DVR inteiro fora do ar: nenhum decoder é aberto até o host responder
+                        self.connected = False
+                        self._host_was_down = True
+                        continue
+                    if self._host_was_down:
+                        # Host voltou: canais reconectam juntos, sem esperar o próprio backoff
+                        self._host_was_down = False
+                        self.backoff.reset()
+                        self.next_connect_time = 0.0
+                    
+                    wait = self.next_connect_time - time.time()
+                    if wait > 0:
+                        time.sleep(min(wait, 0.5))
+                        continue
+                    if not self._connect():
+                        self._schedule_reconnect()
                         continue
                 
-                # Captura frame
-                ret, frame = self.cap.read()
+                # Captura frame (decodificação completa ou só grab, conforme demanda)
+                # direto no próximo slot livre do anel, sem cópia. Com tamanho de
+                # saída definido, decodifica num buffer próprio e redimensiona no slot
+                slot_index, buffer = self.slots.acquire_write()
+                output_size = self.output_size
+                ret, frame = self._read_frame(buffer if output_size is None else self._decode_buffer)
                 
-                if ret and frame is not None:
+                if ret and frame is None:
+                    # Stream oculto: sessão viva, mas sem frame novo para exibir
                     self.connected = True
-                    self.last_frame_time = time.time()
+                elif ret:
+                    self.connected = True
+                    now = time.time()
+                    # fps medido (média móvel), usado pelo watchdog para detectar imagem congelada
+                    interval = now - self.last_frame_time
+                    if self.frame_interval:
+                        self.frame_interval += (interval - self.frame_interval) * 0.1
+                    else:
+                        self.frame_interval = interval
+                    self.last_frame_time = now
                     
-                    # Atualiza frame atual (thread-safe)
-                    with self.lock:
-                        self.current_frame = frame.copy()
+                    if output_size is not None:
+                        self._decode_buffer = frame
                     
-                    # Tenta adicionar ao buffer (descarta se cheio)
-                    try:
-                        self.frame_queue.put_nowait(frame)
-                    except:
-                        # Buffer cheio, descarta frame mais antigo
-                        try:
-                            self.frame_queue.get_nowait()
-                            self.frame_queue.put_nowait(frame)
-                        except:
-                            pass
+                    # Publica o slot (troca atômica do índice mais recente)
+                    output = self._scale_to_output(frame, buffer, output_size)
+                    self.slots.publish(slot_index, output, self.last_frame_time)
+                    
+                    # Histórico guarda a resolução do decoder
+                    if self.history is not None:
+                        self.history.append(frame, self.last_frame_time)
                 else:
-                    # Frame inválido, marca como desconectado
+                    # Frame inválido ou timeout de leitura: reconecta
+                    print(f"Stream {self.stream_id}: leitura falhou, reconectando")
                     self.connected = False
-                    time.sleep(0.1)
-                    
+                    self._schedule_reconnect()
+            
             except Exception as e:
                 print(f"Erro no stream {self.stream_id}: {e}")
                 self.connected = False
                 if self.cap:
                     self.cap.release()
                     self.cap = None
-                time.sleep(1.0)
+                self._schedule_reconnect()
+    
+    def _schedule_reconnect(self) -> None:
+        """Agenda próxima tentativa de conexão com backoff exponencial e jitter."""
+        self.next_connect_time = time.time() + self.backoff.next_delay()
+        if self.host is not None:
+            # Pode ser o DVR inteiro: o host testa de novo e avisa os outros canais
+            self.host.report_failure()
     
-    def _connect(self) -> None:
-        """Conecta ao stream RTSP."""
+    def _connect(self) -> bool:
+        """Conecta ao stream RTSP. Retorna True se recebeu o primeiro frame.
+        
+        Não há esperas fixas: a abertura e a primeira leitura são limitadas
+        pelos timeouts do FFmpeg (open_timeout_ms e read_timeout_ms).
+        """
         try:
             if self.cap:
                 self.cap.release()
+                self.cap = None
+            
+            # Reconexão já usa o perfil solicitado
+            if self.requested_profile != self.profile:
+                self._use_profile_urls(self.requested_profile)
             
             # Tenta URL alternativa se a principal falhou várias vezes
             url_to_try = self.current_url
@@ -120,41 +479,27 @@ class StreamCapture:
             safe_url = url_to_try.split('@')[0] + '@[REDACTED]' if '@' in url_to_try else url_to_try
             print(f"Stream {self.stream_id}: Tentando conectar a {safe_url} (tentativa {self.connection_attempts + 1})")
             
-            # Configurações para melhor performance e autenticação RTSP
-            # Usa backend FFMPEG com opções RTSP
-            self.cap = cv2.VideoCapture(url_to_try, cv2.CAP_FFMPEG)
-            
-            # Verifica se VideoCapture foi criado
-            if self.cap is None:
-                print(f"Stream {self.stream_id}: ERRO - VideoCapture retornou None")
-                self.connected = False
-                return
-            
-            # Configurações de buffer e FPS
-            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Buffer mínimo
-            self.cap.set(cv2.CAP_PROP_FPS, 15)  # Limita FPS
+            connect_start = time.time()
+            self.cap, hw_accel, decode_path = self._open_capture(url_to_try)
+            self._set_decode_mode(hw_accel, decode_path)
             
-            # Aguarda um pouco para conexão RTSP se estabelecer
-            # RTSP pode demorar alguns segundos para conectar
-            time.sleep(2)
-            
-            # Verifica se VideoCapture foi aberto
-            # Nota: isOpened() pode retornar True mesmo que ainda não tenha conectado
-            # Por isso tentamos ler frames diretamente
-            
-            # Tenta ler primeiro frame para verificar conexão
-            # Dá várias tentativas para streams RTSP que podem demorar
-            max_attempts = 5
-            for attempt in range(max_attempts):
+            # Lê primeiro frame para confirmar conexão (isOpened() sozinho não garante)
+            if self.cap.isOpened():
+                slot_index, buffer = self.slots.acquire_write()
                 ret, frame = self.cap.read()
                 if ret and frame is not None:
+                    now = time.time()
                     self.connected = True
                     self.connection_attempts = 0  # Reset contador em caso de sucesso
+                    self.backoff.reset()
+                    self.last_connect_duration = now - connect_start
+                    if self.time_to_first_frame is None:
+                        self.time_to_first_frame = now - self.start_time
+                    self.last_frame_time = now
+                    self.slots.publish(slot_index, self._scale_to_output(frame, buffer, self.output_size), now)
                     # Não imprime URL completa por segurança (pode conter senha)
-                    print(f"Stream {self.stream_id} conectado com sucesso")
-                    return
-                # Aguarda um pouco mais entre tentativas
-                time.sleep(1)
+                    print(f"Stream {self.stream_id} conectado com sucesso em {self.last_connect_duration:.2f}s")
+                    return True
             
             # Se chegou aqui, não conseguiu conectar
             self.connection_attempts += 1
@@ -164,7 +509,8 @@ class StreamCapture:
                 self.cap = None
             if self.connection_attempts <= 3:
                 print(f"Stream {self.stream_id} falhou ao conectar (tentativa {self.connection_attempts})")
-                    
+            return False
+        
         except Exception as e:
             self.connection_attempts += 1
             print(f"Stream {self.stream_id}: ERRO ao conectar - {type(e).__name__}: {e}")
@@ -174,6 +520,7 @@ class StreamCapture:
             if self.cap:
                 self.cap.release()
                 self.cap = None
+            return False
 
 
 class StreamManager:
@@ -182,69 +529,390 @@ class StreamManager:
     def __init__(self, config_manager):
         self.config_manager = config_manager
         self.streams: Dict[int, StreamCapture] = {}
+        self._stream_keys: Dict[int, Tuple] = {}
+        self.hosts: Dict[Tuple[str, int], DVRHost] = {}
+        self._history_config: Dict[str, Any] = {}
+        self.capture_mode = config_manager.get_capture_mode()
+        self.process_pool: Optional[ProcessCapturePool] = None
+        # Detecta imagens congeladas e força reconexão (estado lido pelo DisplayManager)
+        self.watchdog = StreamWatchdog(self, config_manager.get_stale_threshold())
+        # Gravação em segmentos (FFmpeg sem decodificar), independente da captura
+        self.recorder: Optional[RecordingManager] = None
+        # Notas de atividade por câmera (diferença entre frames em 160x90)
+        self.motion = MotionAnalyzer(self, config_manager.get_motion_config())
         self._build_streams()
+        self._build_recording()
         
         # Debug: mostra quantos streams foram criados
         print(f"StreamManager: {len(self.streams)} stream(s) criado(s)")
     
-    def _build_streams(self) -> None:
-        """Constrói streams a partir da configuração."""
-        # Para todos os streams existentes
-        for stream in self.streams.values():
-            stream.stop()
-        self.streams.clear()
-        
-        # Cria novos streams
-        dvr_servers = self.config_manager.get_dvr_servers()
-        stream_id = 0
-        
-        for server in dvr_servers:
+    def _stream_specs(self) -> List[Dict[str, Any]]:
+        """Lista canais da configuração, na ordem dos índices de câmera."""
+        specs = []
+        decoder_config = self.config_manager.get_decoder_config()
+        for server in self.config_manager.get_dvr_servers():
             ip = server.get("ip")
             port = server.get("port", 554)
             username = server.get("username", "")
             password = server.get("password", "")
             channels = server.get("channels", [])
             
+            # Substream (subtype=1) nas células do grid, stream principal em tela cheia
+            grid_subtype = server.get("grid_subtype", 1)
+            fullscreen_subtype = server.get("fullscreen_subtype", 0)
+            
+            # Opções do decoder: padrão global, sobrescrito por DVR
+            decoder = {key: decoder_config[key] for key in ("hw_accel", "threads")}
+            decoder.update(server.get("decoder", {}))
+            
             for channel in channels:
-                # Para RTSP, testamos primeiro sem codificação (funcionou no VLC)
-                # Se falhar, tentamos com codificação como fallback
-                if '@' in password:
-                    # Abordagem 1: Sem codificação (testado e funcionou no VLC)
-                    rtsp_url = f"rtsp://{username}:{password}@{ip}:{port}/cam/realmonitor?channel={channel}&subtype=0"
-                    
-                    # Abordagem 2: Com @ codificado como %40 (fallback)
-                    password_encoded = password.replace('@', '%40')
-                    alt_url = f"rtsp://{username}:{password_encoded}@{ip}:{port}/cam/realmonitor?channel={channel}&subtype=0"
-                else:
-                    # Senha sem caracteres especiais, usa direto
-                    rtsp_url = f"rtsp://{username}:{password}@{ip}:{port}/cam/realmonitor?channel={channel}&subtype=0"
-                    alt_url = None
-                
-                stream = StreamCapture(rtsp_url, stream_id, buffer_size=2, alt_url=alt_url)
-                self.streams[stream_id] = stream
-                stream_id += 1
+                specs.append({
+                    "key": (ip, port, username, channel),
+                    "host": (ip, port),
+                    "decoder": decoder,
+                    "profile_urls": {
+                        PROFILE_SUB: self._build_urls(ip, port, username, password, channel, grid_subtype),
+                        PROFILE_MAIN: self._build_urls(ip, port, username, password, channel, fullscreen_subtype),
+                    },
+                })
+        return specs
+    
+    def _build_streams(self) -> Tuple[List[StreamCapture], List[StreamCapture], List[DVRHost]]:
+        """Constrói streams a partir da configuração, reaproveitando os que não mudaram.
+        
+        Canais são identificados por (ip, porta, usuário, canal). Um stream que
+        continua na configuração com as mesmas URLs é mantido (conectado) e só
+        recebe o novo índice, que segue a posição do canal na configuração.
+        
+        Returns:
+            (streams novos, streams removidos, hosts removidos); nada é
+            iniciado ou parado aqui.
+        """
+        if self.capture_mode == CAPTURE_PROCESS:
+            return self._build_process_streams()
+        
+        # Chave -> streams atuais (lista, caso o mesmo canal apareça duas vezes)
+        old_streams: Dict[Tuple, List[StreamCapture]] = {}
+        for camera_index, stream in self.streams.items():
+            old_streams.setdefault(self._stream_keys[camera_index], []).append(stream)
+        old_hosts = self.hosts
+        history_changed = self.config_manager.get_history_config() != self._history_config
+        self._history_config = dict(self.config_manager.get_history_config())
+        # Transporte RTSP vale para as próximas aberturas (streams mantidos não reconectam)
+        apply_ffmpeg_capture_options(self.config_manager.get_decoder_config()["transport"])
+        
+        streams: Dict[int, StreamCapture] = {}
+        stream_keys: Dict[int, Tuple] = {}
+        hosts: Dict[Tuple[str, int], DVRHost] = {}
+        added: List[StreamCapture] = []
+        
+        for stream_id, spec in enumerate(self._stream_specs()):
+            # Um DVRHost por endereço, compartilhado por todos os canais
+            host = hosts.get(spec["host"]) or old_hosts.get(spec["host"]) or DVRHost(*spec["host"])
+            hosts[spec["host"]] = host
+            
+            candidates = old_streams.get(spec["key"])
+            stream = candidates.pop(0) if candidates else None
+            if (stream is not None and stream.profile_urls == spec["profile_urls"]
+                    and stream.decoder == spec["decoder"]):
+                # Canal inalterado: segue rodando, só atualiza índice e parâmetros
+                stream.stream_id = stream_id
+                stream.open_timeout_ms = self.config_manager.get_open_timeout_ms()
+                stream.read_timeout_ms = self.config_manager.get_read_timeout_ms()
+                if history_changed:
+                    stream.history = self._build_history()
+            else:
+                if stream is not None:
+                    # Mesmo canal com URLs ou decoder diferentes: recria
+                    old_streams[spec["key"]].append(stream)
+                rtsp_url, alt_url = spec["profile_urls"][PROFILE_SUB]
+                stream = StreamCapture(rtsp_url, stream_id, buffer_size=2, alt_url=alt_url,
+                                       profile_urls=spec["profile_urls"], profile=PROFILE_SUB,
+                                       history=self._build_history(),
+                                       open_timeout_ms=self.config_manager.get_open_timeout_ms(),
+                                       read_timeout_ms=self.config_manager.get_read_timeout_ms(),
+                                       host=host, decoder=spec["decoder"])
+                added.append(stream)
+            streams[stream_id] = stream
+            stream_keys[stream_id] = spec["key"]
+        
+        removed_hosts = [host for key, host in old_hosts.items() if key not in hosts]
+        self.streams = streams
+        self._stream_keys = stream_keys
+        self.hosts = hosts
+        removed = [stream for candidates in old_streams.values() for stream in candidates]
+        return added, removed, removed_hosts
+    
+    def _build_process_streams(self) -> Tuple[List, List, List]:
+        """Distribui os canais em processos de captura, um por DVR.
+        
+        Processos cujos canais e opções não mudaram seguem rodando; o pool
+        inicia os novos e para os removidos.
+        """
+        if self.process_pool is None:
+            self.process_pool = ProcessCapturePool()
+            if self.config_manager.get_history_config().get("seconds", 0) > 0:
+                print("StreamManager: histórico de frames não é suportado no modo de captura em processos")
+        
+        decoder_config = self.config_manager.get_decoder_config()
+        groups: Dict[Tuple[str, int], List[Tuple[int, Dict[str, Any]]]] = {}
+        specs = self._stream_specs()
+        for stream_id, spec in enumerate(specs):
+            groups.setdefault(spec["host"], []).append((stream_id, spec))
+        
+        options = {
+            "open_timeout_ms": self.config_manager.get_open_timeout_ms(),
+            "read_timeout_ms": self.config_manager.get_read_timeout_ms(),
+            "transport": decoder_config["transport"],
+            "frame_size": tuple(self.config_manager.get_process_frame_size()),
+        }
+        streams, added, removed = self.process_pool.sync(
+            [(group, dict(options, host=host)) for host, group in groups.items()])
+        self.streams = streams
+        self._stream_keys = {stream_id: spec["key"] for stream_id, spec in enumerate(specs)}
+        return added, removed, []
+    
+    def _build_recording(self) -> None:
+        """Cria, ajusta ou desliga a gravação conforme a configuração.
+        
+        Só cria/atualiza os gravadores; os processos FFmpeg são iniciados
+        pela thread do RecordingManager depois de start().
+        """
+        config = self.config_manager.get_recording_config()
+        if not config["enabled"] or not RECORDING_AVAILABLE:
+            if config["enabled"]:
+                print("StreamManager: gravação ativada, mas o FFmpeg não foi encontrado no PATH")
+            if self.recorder is not None:
+                # Fecha os segmentos em gravação sem travar a UI
+                threading.Thread(target=self.recorder.stop, daemon=True).start()
+                self.recorder = None
+            return
+        
+        if self.recorder is None:
+            self.recorder = RecordingManager(config)
+        else:
+            self.recorder.configure(config)
+        profile = config["profile"] if config["profile"] in (PROFILE_SUB, PROFILE_MAIN) else PROFILE_MAIN
+        channels = [(stream_id, spec["key"], spec["profile_urls"][profile][0])
+                    for stream_id, spec in enumerate(self._stream_specs())]
+        self.recorder.sync(channels, self.config_manager.get_decoder_config()["transport"])
+    
+    def _build_history(self) -> Optional[FrameHistory]:
+        """Cria histórico de frames conforme config (None se desativado)."""
+        history_config = self.config_manager.get_history_config()
+        seconds = history_config.get("seconds", 0)
+        if not seconds or seconds <= 0:
+            return None
+        return FrameHistory(seconds,
+                            fps=history_config.get("fps", 5.0),
+                            fmt=history_config.get("format", FrameHistory.FORMAT_RAW),
+                            jpeg_quality=history_config.get("jpeg_quality", 80))
+    
+    @staticmethod
+    def _build_urls(ip: str, port: int, username: str, password: str,
+                    channel: int, subtype: int) -> Tuple[str, Optional[str]]:
+        """Monta URL RTSP (e alternativa) de um canal Dahua."""
+        path = f"{ip}:{port}/cam/realmonitor?channel={channel}&subtype={subtype}"
+        # Para RTSP, testamos primeiro sem codificação (funcionou no VLC)
+        # Se falhar, tentamos com codificação como fallback
+        if '@' in password:
+            # Abordagem 1: Sem codificação (testado e funcionou no VLC)
+            rtsp_url = f"rtsp://{username}:{password}@{path}"
+            
+            # Abordagem 2: Com @ codificado como %40 (fallback)
+            password_encoded = password.replace('@', '%40')
+            alt_url = f"rtsp://{username}:{password_encoded}@{path}"
+        else:
+            # Senha sem caracteres especiais, usa direto
+            rtsp_url = f"rtsp://{username}:{password}@{path}"
+            alt_url = None
+        return rtsp_url, alt_url
     
     def start_all(self) -> None:
         """Inicia todos os streams."""
+        if self.process_pool is not None:
+            self.process_pool.start()
+        for host in self.hosts.values():
+            host.start()
         for stream in self.streams.values():
             stream.start()
+        self.watchdog.start()
+        if self.config_manager.get_motion_config()["enabled"]:
+            self.motion.start()
+        if self.recorder is not None:
+            self.recorder.start()
     
     def stop_all(self) -> None:
         """Para todos os streams."""
+        self.watchdog.stop()
+        self.motion.stop()
+        if self.recorder is not None:
+            self.recorder.stop()
+        if self.process_pool is not None:
+            self.process_pool.stop()
+        for host in self.hosts.values():
+            host.stop()
         for stream in self.streams.values():
             stream.stop()
     
+    def set_demand(self, visible: List[int], upcoming: List[int]) -> None:
+        """Define quais câmeras estão visíveis, quais entram em breve e quais estão ocultas.
+        
+        Câmeras fora das duas listas passam a apenas manter a sessão RTSP viva.
+        """
+        visible_set = set(visible)
+        upcoming_set = set(upcoming)
+        for camera_index, stream in self.streams.items():
+            if camera_index in visible_set:
+                stream.set_demand(DEMAND_VISIBLE)
+            elif camera_index in upcoming_set:
+                stream.set_demand(DEMAND_UPCOMING)
+            else:
+                stream.set_demand(DEMAND_HIDDEN)
+    
+    def set_profile(self, camera_index: int, profile: str) -> None:
+        """Troca perfil de qualidade de uma câmera (PROFILE_SUB ou PROFILE_MAIN)."""
+        if camera_index in self.streams:
+            self.streams[camera_index].set_profile(profile)
+    
     def get_frame(self, camera_index: int) -> Optional[np.ndarray]:
-        """Obtém frame de uma câmera específica."""
+        """Obtém cópia do frame de uma câmera específica."""
         if camera_index in self.streams:
             return self.streams[camera_index].get_frame()
         return None
     
+    def borrow_frame(self, camera_index: int) -> Optional[FrameView]:
+        """Empresta frame de uma câmera sem cópia (liberar após o uso)."""
+        if camera_index in self.streams:
+            return self.streams[camera_index].borrow_frame()
+        return None
+    
+    def set_output_size(self, camera_index: int, size: Optional[Tuple[int, int]]) -> None:
+        """Define tamanho dos frames publicados por uma câmera (None = resolução completa)."""
+        if camera_index in self.streams:
+            self.streams[camera_index].set_output_size(size)
+    
+    def get_frame_seq(self, camera_index: int) -> int:
+        """Retorna número de sequência do último frame da câmera (0 se não houver)."""
+        if camera_index in self.streams:
+            return self.streams[camera_index].frame_seq
+        return 0
+    
+    def get_history_frame(self, camera_index: int, timestamp: float) -> Optional[Tuple[float, np.ndarray]]:
+        """Retorna (timestamp, frame) do histórico mais próximo antes de timestamp.
+        
+        Retorna None se a câmera não existe, o histórico está desativado ou
+        não há frame tão antigo guardado.
+        """
+        stream = self.streams.get(camera_index)
+        if stream is None or stream.history is None:
+            return None
+        return stream.history.get(timestamp)
+    
+    def get_history_range(self, camera_index: int, start: float, end: float) -> List[Tuple[float, np.ndarray]]:
+        """Retorna frames do histórico de uma câmera entre start e end."""
+        stream = self.streams.get(camera_index)
+        if stream is None or stream.history is None:
+            return []
+        return stream.history.get_range(start, end)
+    
+    def get_recorded_segments(self, camera_index: int, start: float, end: float) -> List[Segment]:
+        """Retorna segmentos gravados da câmera entre start e end (vazio sem gravação)."""
+        if self.recorder is None:
+            return []
+        return self.recorder.get_segments(camera_index, start, end)
+    
+    def open_recording(self, camera_index: int, timestamp: float) -> Optional[RecordingReader]:
+        """Abre a gravação da câmera a partir de timestamp, para leitura com read().
+        
+        A busca usa o catálogo (consulta indexada mais keyframe), sem listar
+        pastas. Retorna None sem gravação cobrindo o instante; o chamador
+        fecha o leitor com close().
+        """
+        if self.recorder is None:
+            return None
+        return self.recorder.open_reader(camera_index, timestamp)
+    
     def reload(self) -> None:
-        """Recarrega streams com nova configuração."""
-        self.stop_all()
-        self._build_streams()
-        self.start_all()
+        """Recarrega configuração reiniciando só os streams que mudaram.
+        
+        Streams inalterados continuam conectados. Os removidos são parados em
+        thread separada, para não travar a UI esperando as threads de captura.
+        Trocar capture_mode reinicia todos os streams (os antigos também são
+        parados em thread separada; watchdog, movimento e gravação seguem).
+        """
+        self.watchdog.stale_threshold = self.config_manager.get_stale_threshold()
+        motion_config = self.config_manager.get_motion_config()
+        self.motion.configure(motion_config)
+        if motion_config["enabled"]:
+            self.motion.start()  # Sem efeito se já está rodando
+        else:
+            self.motion.stop()
+        capture_mode = self.config_manager.get_capture_mode()
+        if capture_mode != self.capture_mode:
+            print(f"StreamManager: modo de captura '{self.capture_mode}' -> '{capture_mode}', reiniciando streams")
+            threading.Thread(target=self._stop_removed,
+                             args=(list(self.streams.values()), list(self.hosts.values()), self.process_pool),
+                             daemon=True).start()
+            self.streams, self._stream_keys, self.hosts = {}, {}, {}
+            self.process_pool = None
+            self.capture_mode = capture_mode
+            self._build_streams()
+            self._build_recording()
+            if self.process_pool is not None:
+                self.process_pool.start()
+            for host in self.hosts.values():
+                host.start()
+            for stream in self.streams.values():
+                stream.start()
+            if self.recorder is not None:
+                self.recorder.start()  # Sem efeito se já está gravando
+            return
+        
+        added, removed, removed_hosts = self._build_streams()
+        self._build_recording()
+        if self.recorder is not None:
+            self.recorder.start()  # Sem efeito se já está gravando
+        
+        for host in self.hosts.values():
+            host.start()  # Sem efeito em hosts já rodando
+        for stream in added:
+            stream.start()
+        
+        if removed or removed_hosts:
+            threading.Thread(target=self._stop_removed, args=(removed, removed_hosts), daemon=True).start()
+        
+        kept = len(self.streams) - len(added)
+        print(f"StreamManager: {kept} stream(s) mantido(s), {len(added)} iniciado(s), {len(removed)} parado(s)")
+    
+    @staticmethod
+    def _stop_removed(streams: List[StreamCapture], hosts: List[DVRHost],
+                      process_pool: Optional[ProcessCapturePool] = None) -> None:
+        """Para streams e hosts que saíram da configuração (e o pool de processos descartado)."""
+        if process_pool is not None:
+            process_pool.stop()
+        for stream in streams:
+            stream.stop()
+        for host in hosts:
+            host.stop()
+    
+    def get_activity_scores(self) -> Dict[int, float]:
+        """Retorna nota de atividade (0.0 a 1.0) de cada câmera; zero sem detecção de movimento."""
+        if not self.motion.running:
+            return {camera_index: 0.0 for camera_index in self.streams}
+        return self.motion.get_scores()
+    
+    def get_last_motion_times(self) -> Dict[int, float]:
+        """Retorna o último instante com movimento de cada câmera (0 = nunca)."""
+        return self.motion.get_last_motion_times()
+    
+    def get_stream_state(self, camera_index: int) -> str:
+        """Retorna frescor da câmera: STREAM_LIVE, STREAM_STALE ou STREAM_DISCONNECTED."""
+        return self.watchdog.get_state(camera_index)
+    
+    def get_connection_stats(self) -> Dict[int, Dict[str, Optional[float]]]:
+        """Retorna estado e tempo até o primeiro frame de cada câmera."""
+        return {camera_index: stream.get_connection_stats() for camera_index, stream in self.streams.items()}
     
     def get_stream_count(self) -> int:
         """Retorna número total de streams."""
@@ -0,0 +1,102 @@
+"""Watchdog de frescor dos streams: detecta imagens congeladas e força reconexão."""
+import threading
+import time
+from typing import Optional, Dict, Any
+
+# Estados de frescor de cada câmera
+STREAM_LIVE = "live"                  # Frames chegando no ritmo esperado
+STREAM_STALE = "stale"                # Conectado, mas sem frame novo há muito tempo (imagem congelada)
+STREAM_DISCONNECTED = "disconnected"  # Sem conexão ou sem nenhum frame ainda
+
+
+class StreamWatchdog:
+    """Classifica periodicamente cada stream do StreamManager como live, stale ou disconnected.
+    
+    A idade do último frame é comparada com o intervalo entre frames que o
+    próprio stream espera (fps medido, ou o refresh lento de streams ocultos).
+    Um stream parado há mais de stale_threshold segundos tem a conexão
+    descartada com force_reconnect(): um decoder travado não se recupera
+    sozinho e is_connected() continuaria True.
+    """
+    
+    # Intervalo entre verificações (segundos)
+    CHECK_INTERVAL = 0.5
+    # Quantos intervalos esperados sem frame até a imagem ser considerada congelada
+    STALE_INTERVALS = 5
+    # Idade mínima para considerar congelada (evita falso alarme em streams rápidos)
+    MIN_STALE_AGE = 1.0
+    
+    def __init__(self, stream_manager, stale_threshold: float = 10.0):
+        self.stream_manager = stream_manager
+        self.stale_threshold = stale_threshold
+        self.states: Dict[int, str] = {}
+        self.forced_reconnects = 0
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        # Instante da última reconexão forçada de cada stream (evita repetir a cada verificação)
+        self._forced: Dict[Any, float] = {}
+    
+    def start(self) -> None:
+        """Inicia thread do watchdog."""
+        if self.running:
+            return
+        self.running = True
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def stop(self) -> None:
+        """Para thread do watchdog."""
+        self.running = False
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+    
+    def get_state(self, camera_index: int) -> str:
+        """Retorna estado de frescor da câmera (live até a primeira verificação)."""
+        return self.states.get(camera_index, STREAM_LIVE)
+    
+    @classmethod
+    def classify(cls, stream, now: float) -> str:
+        """Classifica um stream pela conexão e pela idade do último frame."""
+        last_frame_time = stream.last_frame_time
+        if not stream.is_connected() or not last_frame_time:
+            return STREAM_DISCONNECTED
+        age = now - last_frame_time
+        if age > max(stream.expected_frame_interval() * cls.STALE_INTERVALS, cls.MIN_STALE_AGE):
+            return STREAM_STALE
+        return STREAM_LIVE
+    
+    def check(self) -> None:
+        """Atualiza o estado de todas as câmeras e reconecta as congeladas há muito tempo."""
+        now = time.time()
+        streams = dict(self.stream_manager.streams)
+        states = {}
+        for camera_index, stream in streams.items():
+            state = self.classify(stream, now)
+            states[camera_index] = state
+            if state != self.states.get(camera_index, STREAM_LIVE) and state == STREAM_STALE:
+                print(f"Stream {camera_index}: imagem congelada (último frame há {now - stream.last_frame_time:.1f}s)")
+            
+            if state == STREAM_STALE and now - stream.last_frame_time >= self.stale_threshold:
+                if now - self._forced.get(stream, 0.0) >= self.stale_threshold:
+                    print(f"Stream {camera_index}: sem frames há {now - stream.last_frame_time:.1f}s, forçando reconexão")
+                    self._forced[stream] = now
+                    self.forced_reconnects += 1
+                    stream.force_reconnect()
+        self.states = states
+        
+        # Esquece streams removidos por uma recarga
+        current = set(streams.values())
+        for stream in [stream for stream in self._forced if stream not in current]:
+            del self._forced[stream]
+    
+    def _run(self) -> None:
+        """Loop do watchdog."""
+        while self.running:
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Watchdog: erro ao verificar streams - {type(e).__name__}: {e}")
+            self._stop_event.wait(self.CHECK_INTERVAL)
@@ -0,0 +1,53 @@
+"""Testes da nota de atividade do MotionAnalyzer."""
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_manager import ConfigManager, MIN_DECAY_SECONDS
+from motion_analyzer import MotionAnalyzer, _CameraMotion
+
+
+class _FakeStreamManager:
+    """Só o dicionário de streams que o analisador consulta."""
+    
+    def __init__(self, streams):
+        self.streams = streams
+
+
+def _config(decay_seconds):
+    return {"enabled": True, "rate": 5, "cpu_budget": 0.03, "threshold": 25,
+            "min_area": 0.002, "decay_seconds": decay_seconds}
+
+
+class DecaySecondsTest(unittest.TestCase):
+    
+    def test_zero_decay_is_clamped(self):
+        stream = object()
+        analyzer = MotionAnalyzer(_FakeStreamManager({0: stream}), _config(0))
+        self.assertEqual(analyzer.decay_seconds, MotionAnalyzer.MIN_DECAY_SECONDS)
+        
+        camera = _CameraMotion(MotionAnalyzer.WIDTH, MotionAnalyzer.HEIGHT)
+        camera.score = 1.0
+        camera.last_update = time.time() - 1.0
+        analyzer._cameras[stream] = camera
+        scores = analyzer.get_scores()
+        self.assertGreaterEqual(scores[0], 0.0)
+        self.assertLess(scores[0], 1.0)
+    
+    def test_nan_and_negative_decay_are_clamped(self):
+        for value in (float("nan"), -5):
+            analyzer = MotionAnalyzer(_FakeStreamManager({}), _config(value))
+            self.assertEqual(analyzer.decay_seconds, MotionAnalyzer.MIN_DECAY_SECONDS)
+    
+    def test_config_manager_clamps_decay(self):
+        manager = ConfigManager(os.devnull)
+        for value, expected in ((0, MIN_DECAY_SECONDS), ("10", 10), (30, 30)):
+            manager.config = {"motion": {"decay_seconds": value}}
+            self.assertEqual(manager.get_motion_config()["decay_seconds"], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
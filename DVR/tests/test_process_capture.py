@@ -0,0 +1,42 @@
+"""Testes do anel de frames em memória compartilhada."""
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from process_capture import SharedFrameRing
+
+
+class SharedFrameRingCloseTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.ring = SharedFrameRing.create(2, 64, 48)
+        index, _ = self.ring.acquire_write()
+        self.ring.publish(index, np.full((48, 64, 3), 7, dtype=np.uint8), 1.0)
+    
+    def tearDown(self):
+        self.ring.close(unlink=True)
+    
+    def test_close_waits_for_borrowed_frame(self):
+        view = self.ring.borrow()
+        self.assertIsNotNone(view)
+        self.assertFalse(self.ring.close(unlink=True))
+        # A vista continua legível depois da tentativa de fechar
+        self.assertEqual(int(view.frame[0, 0, 0]), 7)
+        view.release()
+        self.assertTrue(self.ring.close(unlink=True))
+    
+    def test_borrow_after_close_returns_none(self):
+        self.assertTrue(self.ring.close(unlink=True))
+        self.assertIsNone(self.ring.borrow())
+    
+    def test_failed_borrow_does_not_hold_close(self):
+        self.ring.clear()
+        self.assertIsNone(self.ring.borrow())
+        self.assertTrue(self.ring.close(unlink=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
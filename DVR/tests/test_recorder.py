@@ -0,0 +1,52 @@
+"""Testes da troca de pasta do RecordingManager."""
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recorder import RecordingManager
+from segment_catalog import Segment
+
+
+def _config(path):
+    return {"enabled": True, "path": path, "format": "mkv", "segment_seconds": 60,
+            "profile": "main", "max_gb": 50, "retention_days": 7}
+
+
+class RecordingRootChangeTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manager = RecordingManager(_config(os.path.join(self.tmp.name, "a")))
+    
+    def tearDown(self):
+        self.manager.catalog.close()
+        self.tmp.cleanup()
+    
+    def test_root_change_closes_old_catalog(self):
+        old = self.manager.catalog
+        segment = Segment("cam", os.path.join(self.tmp.name, "a", "cam", "x.mkv"), 0.0, 60.0, 1)
+        self.manager._catalog([segment])
+        self.manager._catalog_queue.put(None)
+        
+        self.manager.configure(_config(os.path.join(self.tmp.name, "b")))
+        
+        self.assertIsNot(self.manager.catalog, old)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            old.usage()
+        # Fila do catálogo antigo descartada, pedido de parada mantido
+        self.assertEqual(self.manager._queued, set())
+        self.assertIsNone(self.manager._catalog_queue.get_nowait())
+        self.assertTrue(self.manager._catalog_queue.empty())
+    
+    def test_same_root_keeps_catalog(self):
+        catalog = self.manager.catalog
+        self.manager.configure(_config(os.path.join(self.tmp.name, "a")))
+        self.assertIs(self.manager.catalog, catalog)
+
+
+if __name__ == "__main__":
+    unittest.main()